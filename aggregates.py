@@ -0,0 +1,78 @@
+from income_rollups import IncomeRollups
+
+
+class PortfolioAggregates:
+    """Running portfolio totals adjusted by the change of one position at a time.
+
+    Each position's contribution is remembered, so an update subtracts the old
+    contribution and adds the new one instead of walking every position.
+    rebuild() recomputes everything from scratch (and clears any rounding
+    drift) whenever the whole portfolio is refreshed. Projected income is
+    rolled up in self.income.
+    """
+
+    def __init__(self):
+        self._contributions = {}  # ticker -> (value, cost, profit_loss, dg_3y * value, dg_5y * value)
+        self._totals = [0.0] * 5
+        self.shares = {}  # ticker -> shares held, for the dividend forecast
+        self.income = IncomeRollups()
+
+    def rebuild(self, portfolio):
+        self._contributions = {}
+        self._totals = [0.0] * 5
+        self.shares = {}
+        self.income.clear_projected()
+        for position in portfolio.positions.values():
+            self.update_position(position)
+
+    def update_position(self, position, metrics=None):
+        """Apply the change in one position's contribution to the totals"""
+        metrics = metrics or position.calculate_metrics()
+        if metrics['shares'] > 0:
+            value = position.current_price * metrics['shares']
+            new = (value, metrics['total_cost'], metrics['profit_loss'],
+                   position.dividend_growth_3y * value, position.dividend_growth_5y * value)
+            old = self._contributions.get(position.ticker)
+            self._contributions[position.ticker] = new
+            self.shares[position.ticker] = metrics['shares']
+            self.income.set_projected(position.ticker, metrics['annual_income'])
+        else:
+            new = (0.0,) * 5
+            old = self._contributions.pop(position.ticker, None)
+            self.shares.pop(position.ticker, None)
+            self.income.remove_projected(position.ticker)
+
+        old = old or (0.0,) * 5
+        for i in range(5):
+            self._totals[i] += new[i] - old[i]
+
+    def remove_position(self, ticker):
+        old = self._contributions.pop(ticker, None)
+        self.shares.pop(ticker, None)
+        self.income.remove_projected(ticker)
+        if old:
+            for i in range(5):
+                self._totals[i] -= old[i]
+
+    def holdings(self):
+        """[(ticker, shares, projected annual income)] of the open positions"""
+        return [(ticker, shares, self.income.projected(ticker)) for ticker, shares in self.shares.items()]
+
+    @property
+    def total_value(self):
+        return self._totals[0]
+
+    def metrics(self):
+        """Same totals as Portfolio.calculate_portfolio_metrics()"""
+        total_value, total_cost, total_profit_loss, dg_3y_sum, dg_5y_sum = self._totals
+        total_income = self.income.projected_annual
+        return {
+            'total_cost': total_cost,
+            'total_value': total_value,
+            'total_annual_income': total_income,
+            'portfolio_yield': (total_income / total_value) * 100 if total_value > 0 else 0,
+            'portfolio_yield_on_cost': (total_income / total_cost) * 100 if total_cost > 0 else 0,
+            'total_profit_loss': total_profit_loss,
+            'weighted_dg_3y': dg_3y_sum / total_value if total_value > 0 else 0,
+            'weighted_dg_5y': dg_5y_sum / total_value if total_value > 0 else 0
+        }
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+# Key of the aggregated series in PortfolioAnalyticsDialog.historical_data
+PORTFOLIO_KEY = 'PORTFOLIO'
+
+# Effect of each transaction type on the number of shares held
+SHARE_SIGNS = {'BUY': 1.0, 'NO_COST': 1.0, 'SELL': -1.0}
+
+
+def day_index(index):
+    """Timezone-free DatetimeIndex at midnight, so yfinance dates match by day"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def to_days(index):
+    return np.asarray(index, dtype='datetime64[D]')
+
+
+def dividends_on(dates, dividends):
+    """Dividend per share paid on each of dates, 0.0 on the other days.
+
+    dividends is a yfinance dividends Series; it is joined onto dates in a
+    single reindex instead of being searched day by day.
+    """
+    if dividends is None or dividends.empty:
+        return np.zeros(len(dates))
+    per_day = dividends.groupby(day_index(dividends.index)).sum()
+    return per_day.reindex(pd.DatetimeIndex(dates), fill_value=0.0).to_numpy(dtype=float)
+
+
+def ticker_history(hist, dividends):
+    """Daily close and dividend per share of one ticker from yfinance data"""
+    dates = to_days(day_index(hist.index))
+    return {
+        'dates': dates,
+        'price': hist['Close'].to_numpy(dtype=float),
+        'dividend': dividends_on(dates, dividends),
+    }
+
+
+def history_from_rows(rows):
+    """Daily close and dividend arrays from [(date, close, dividend)] rows of the price cache"""
+    return {
+        'dates': np.array([day for day, _, _ in rows], dtype='datetime64[D]'),
+        'price': np.array([close for _, close, _ in rows], dtype=float),
+        'dividend': np.array([dividend for _, _, dividend in rows], dtype=float),
+    }
+
+
+def simulated_history(start_date, end_date, current_price, current_yield):
+    """Made-up daily history for tickers without market data.
+
+    Prices trend up to today's price (15% lower three years ago) with 2% of
+    daily noise, and the yield is paid monthly on the 15th. The result is
+    marked 'simulated' so risk figures can leave it out.
+    """
+    dates = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+    days_ago = (np.datetime64(end_date, 'D') - dates).astype(float)
+    price_factor = 1 - (days_ago / (3*365)) * 0.15
+    prices = current_price * price_factor * (1 + np.random.normal(0, 0.02, len(dates)))
+    day_of_month = (dates - dates.astype('datetime64[M]')).astype(int) + 1
+    dividends = np.where(day_of_month == 15, prices * (current_yield / 12 / 100), 0.0)
+    return {'dates': dates, 'price': prices, 'dividend': dividends, 'simulated': True}
+
+
+def shares_held(ledgers, tickers, dates):
+    """Shares of each ticker held at the close of each date, from the ledgers.
+
+    ledgers maps a ticker to its transaction records (dicts with 'date',
+    'type' and 'shares'). Every transaction of every ticker is dropped into
+    a (tickers x dates) grid at the first date on or after it, and a
+    cumulative sum along the dates turns those changes into holdings.
+    Transactions before the first date count from the start of the grid.
+    """
+    codes, days, changes = [], [], []
+    for code, ticker in enumerate(tickers):
+        for record in ledgers.get(ticker, ()):
+            codes.append(code)
+            days.append(str(record['date'])[:10])
+            changes.append(SHARE_SIGNS.get(record['type'], 0.0) * float(record['shares']))
+
+    # One extra column collects transactions after the last date
+    held = np.zeros((len(tickers), len(dates) + 1))
+    if codes:
+        columns = np.searchsorted(dates, np.array(days, dtype='datetime64[D]'), side='left')
+        np.add.at(held, (np.array(codes), columns), changes)
+    # Selling more than is held leaves nothing, not a short position
+    return np.clip(np.cumsum(held, axis=1)[:, :-1], 0.0, None)
+
+
+def ticker_income(ticker, history, ledgers):
+    """Dividend income of one ticker on each of its history dates, from the shares held"""
+    return history['dividend'] * shares_held(ledgers, [ticker], history['dates'])[0]
+
+
+def history_frame(historical_data, key):
+    """One column per ticker with its historical_data[ticker][key] array.
+
+    Rows are the union of every ticker's dates, so all tickers line up on a
+    shared axis; a ticker has NaN on the days it has no point.
+    """
+    columns = {}
+    for ticker, data in historical_data.items():
+        if ticker == PORTFOLIO_KEY or not len(data.get('dates', ())):
+            continue
+        columns[ticker] = pd.Series(data[key], index=pd.DatetimeIndex(data['dates']), dtype=float)
+    if not columns:
+        return pd.DataFrame(dtype=float)
+    return pd.DataFrame(columns).sort_index()
+
+
+def portfolio_totals(historical_data, ledgers):
+    """Portfolio dates, value, income and daily return from the shares actually held each day.
+
+    Prices and dividends of every ticker are aligned on the union of their
+    dates (a ticker keeps its last close on days it didn't trade) and
+    multiplied by the shares_held() grid, so the totals are row sums of
+    (tickers x dates) arrays. The return of a day is the price change of the
+    shares held the day before, so buying and selling don't count as gains
+    (a time-weighted return that can be compared with a benchmark).
+    """
+    prices = history_frame(historical_data, 'price')
+    if prices.empty:
+        return {'dates': np.empty(0, dtype='datetime64[D]'), 'value': np.empty(0), 'income': np.empty(0),
+                'return': np.empty(0)}
+    prices = prices.ffill()
+    dividends = history_frame(historical_data, 'dividend').reindex(index=prices.index, columns=prices.columns).fillna(0.0)
+
+    dates = to_days(prices.index)
+    held = shares_held(ledgers, list(prices.columns), dates).T  # dates x tickers, like the frames
+    values = np.nan_to_num(prices.to_numpy() * held)
+    incomes = dividends.to_numpy() * held
+
+    # Value today of yesterday's shares, against their value yesterday; a ticker
+    # only counts from the day after its first price, so its start isn't a gain
+    priced = prices.notna().to_numpy()
+    carried = np.where(priced[:-1], np.nan_to_num(prices.to_numpy()[1:] * held[:-1]), 0.0).sum(axis=1)
+    invested = values[:-1].sum(axis=1) if len(values) else np.empty(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(invested > 0, carried / invested - 1.0, 0.0)
+    return {
+        'dates': dates,
+        'value': values.sum(axis=1),
+        'income': incomes.sum(axis=1),
+        'return': np.concatenate([[0.0], returns]),
+    }
+
+
+def merge_recorded(totals, recorded_dates, recorded_values):
+    """Portfolio totals with the recorded daily values taking precedence"""
+    recorded = pd.Series(recorded_values, index=pd.DatetimeIndex(recorded_dates), dtype=float)
+    values = recorded.combine_first(pd.Series(totals['value'], index=pd.DatetimeIndex(totals['dates'])))
+    incomes = pd.Series(totals['income'], index=pd.DatetimeIndex(totals['dates'])).reindex(values.index, fill_value=0.0)
+    # Recorded days only move the values; returns still come from the held shares
+    returns = pd.Series(totals['return'], index=pd.DatetimeIndex(totals['dates'])).reindex(values.index, fill_value=0.0)
+    return {
+        'dates': to_days(values.index),
+        'value': values.to_numpy(),
+        'income': incomes.to_numpy(),
+        'return': returns.to_numpy(),
+    }
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points are always kept; the others are split into
+    threshold - 2 buckets and each bucket keeps the point that forms the
+    largest triangle with the point kept before it and the average of the
+    next bucket. Peaks and dips survive, so a line drawn through about one
+    point per pixel looks like the full series.
+    """
+    n = len(x)
+    if threshold < 3 or threshold >= n:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket i holds the points edges[i]:edges[i + 1]; the last point is a bucket of its own
+    edges = np.append(np.linspace(1, n - 1, threshold - 1).astype(np.int64), n)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2]
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        # Twice the triangle area, for every candidate of the bucket at once
+        areas = np.abs((x[selected] - next_x) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (next_y - y[selected]))
+        selected = start + int(areas.argmax())
+        indices[bucket + 1] = selected
+    return indices
+
+
+def downsample(dates, values, threshold):
+    """(dates, values) reduced to about threshold points with lttb_indices()"""
+    keep = lttb_indices(np.asarray(dates, dtype='datetime64[D]').astype(np.int64), values, threshold)
+    return dates[keep], values[keep]
@@ -1,4 +1,6 @@
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, date as datetime_date
 import numpy as np
 import yfinance as yf
@@ -7,11 +9,37 @@ matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.dates as mdates
+from analytics_engine import (portfolio_totals, ticker_history, simulated_history, merge_recorded, downsample,
+                              ticker_income, history_from_rows)
+from income_rollups import IncomeRollups
+from risk_engine import (risk_report, benchmark_baskets, basket_name, basket_history,
+                         compare_to_benchmark)
+from dividend_calendar import portfolio_forecast, month_label
+from workspace import DEFAULT_BENCHMARK
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QComboBox,
                            QLabel, QPushButton, QTabWidget, QWidget, 
-                           QApplication, QDateEdit, QGroupBox, QMessageBox)
-from PyQt5.QtCore import Qt, QDate, QTimer
+                           QApplication, QDateEdit, QGroupBox, QMessageBox, QCheckBox,
+                           QTableWidget, QTableWidgetItem, QHeaderView)
+from PyQt5.QtCore import Qt, QDate, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor
+from update_coalescer import UpdateCoalescer
+
+# Tickers downloaded at the same time by HistoryLoader
+HISTORY_WORKERS = 8
+
+# Loaded tickers are drawn together at most this often while loading
+CHART_REFRESH_MS = 300
+
+# Lines are downsampled to about one point per pixel, but never below this
+MIN_CHART_POINTS = 200
+
+# Benchmarks offered in the filter bar; any other ticker or basket can be typed in
+BENCHMARKS = ["VNQ", "SCHH", "XLRE", "IYR", "USRT", "VNQ, SCHH"]
+
+RISK_COLUMNS = ["Ticker", "Weight", "Volatility", "Beta", "Max Drawdown"]
+
+# Tickers stacked on their own in the dividend calendar chart; the rest are grouped as "Others"
+CALENDAR_CHART_TICKERS = 9
 
 class MplCanvas(FigureCanvas):
     def __init__(self, width=5, height=4, dpi=100):
@@ -19,12 +47,187 @@ class MplCanvas(FigureCanvas):
         self.axes = self.fig.add_subplot(111)
         super(MplCanvas, self).__init__(self.fig)
         
+def download_history(ticker, start_date, end_date):
+    """Daily close and dividend arrays of one ticker from Yahoo Finance, None when it has no data"""
+    stock = yf.Ticker(ticker)
+    hist = stock.history(start=start_date, end=end_date)
+    if hist.empty:
+        return None
+    try:
+        dividends = stock.dividends
+    except:
+        # Se não conseguir obter os dividendos, segue sem renda
+        dividends = None
+    # Os dividendos são alinhados às datas de preço num único reindex
+    return ticker_history(hist, dividends)
+
+
+def cached_history(ticker, start_date, end_date, price_cache):
+    """History of a ticker from the price cache, downloading only the days it doesn't have"""
+    rows = price_cache.history(ticker, start_date, end_date)
+    fetch_from = start_date
+    if rows:
+        # Yahoo's daily bars stop the business day before end_date
+        last_bar = np.busday_offset(np.datetime64(end_date, 'D'), -1, roll='forward')
+        if np.datetime64(rows[-1][0], 'D') >= last_bar:
+            return history_from_rows(rows)
+        if rows[0][0] <= start_date + timedelta(days=7):
+            fetch_from = rows[-1][0] + timedelta(days=1)
+    
+    downloaded = download_history(ticker, fetch_from, end_date)
+    if downloaded is not None:
+        price_cache.store_history(ticker, downloaded['dates'], downloaded['price'], downloaded['dividend'])
+        rows = price_cache.history(ticker, start_date, end_date)
+    return history_from_rows(rows) if rows else None
+
+
+def load_ticker_history(ticker, current_price, current_yield, start_date, end_date, price_cache=None):
+    """Daily close and dividend arrays of one ticker, simulated when Yahoo Finance has none"""
+    try:
+        # Tente obter dados históricos reais, do cache local quando houver
+        if price_cache is not None:
+            history = cached_history(ticker, start_date, end_date, price_cache)
+        else:
+            history = download_history(ticker, start_date, end_date)
+        
+        if history is not None:
+            print(f"Dados históricos obtidos com sucesso para {ticker} ({len(history['dates'])} pontos)")
+            return history
+        print(f"Sem dados históricos para {ticker}, gerando dados simulados")
+    except Exception as e:
+        print(f"Erro ao obter dados históricos para {ticker}: {str(e)}")
+        # Continua para geração de dados simulados abaixo
+    
+    # Fallback: gerar dados simulados se não conseguir dados reais
+    history = simulated_history(start_date, end_date, current_price, current_yield)
+    print(f"Dados históricos simulados gerados para {ticker} ({len(history['dates'])} pontos)")
+    return history
+
+
+def load_histories(jobs, start_date, end_date, price_cache=None, max_workers=HISTORY_WORKERS):
+    """{ticker: history} of several tickers loaded concurrently, for callers that can wait (reports)"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(load_ticker_history, ticker, price, dividend_yield,
+                            start_date, end_date, price_cache): ticker
+            for ticker, price, dividend_yield in jobs
+        }
+        return {futures[future]: future.result() for future in as_completed(futures)}
+
+
+# Loaders that were stopped while a download was still in flight. They are kept
+# referenced until they end, so closing the dialog never waits for yfinance
+_retired_loaders = set()
+
+
+def retire_loader(loader):
+    """Stop a loader without blocking: its signals are disconnected and it finishes in the background"""
+    global _retired_loaders
+    loader.stop()
+    for signal in (loader.ticker_loaded, loader.error_occurred, loader.finished):
+        try:
+            signal.disconnect()
+        except TypeError:
+            pass  # Nada conectado
+    _retired_loaders = {old for old in _retired_loaders if not old.isFinished()}
+    if not loader.isFinished():
+        _retired_loaders.add(loader)
+
+
+def wait_for_retired_loaders(timeout=30000):
+    """Wait up to timeout ms for the retired loaders to end; True when none is left running.
+
+    Called when the application closes, before the shared price cache is
+    closed under them.
+    """
+    global _retired_loaders
+    deadline = time.monotonic() + timeout / 1000
+    for loader in list(_retired_loaders):
+        loader.wait(max(0, int((deadline - time.monotonic()) * 1000)))
+    _retired_loaders = {old for old in _retired_loaders if not old.isFinished()}
+    return not _retired_loaders
+
+
+class HistoryLoader(QThread):
+    """Downloads the history of several tickers concurrently.
+
+    Each ticker is emitted through ticker_loaded as soon as it is ready, so
+    the charts can be drawn while the others are still downloading.
+    """
+    ticker_loaded = pyqtSignal(str, object)
+    error_occurred = pyqtSignal(str)
+    
+    def __init__(self, jobs, start_date, end_date, price_cache=None, max_workers=HISTORY_WORKERS):
+        super().__init__()
+        self.jobs = jobs  # [(ticker, current_price, current_yield)]
+        self.start_date = start_date
+        self.end_date = end_date
+        self.price_cache = price_cache
+        self.max_workers = max_workers
+        self.running = True
+    
+    def run(self):
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {
+                executor.submit(load_ticker_history, ticker, price, dividend_yield,
+                                self.start_date, self.end_date, self.price_cache): ticker
+                for ticker, price, dividend_yield in self.jobs
+            }
+            for future in as_completed(futures):
+                if not self.running:
+                    break
+                ticker = futures[future]
+                try:
+                    self.ticker_loaded.emit(ticker, future.result())
+                except Exception as e:
+                    self.error_occurred.emit(f"Erro ao gerar dados históricos para {ticker}: {str(e)}")
+        finally:
+            # Downloads that haven't started are dropped when loading is cancelled. The ones
+            # in flight are waited for here, off the GUI thread, so a finished loader no
+            # longer touches the price cache
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    def stop(self):
+        self.running = False
+
+
 class PortfolioAnalyticsDialog(QDialog):
-    def __init__(self, parent=None, portfolio=None):
+    def __init__(self, parent=None, portfolio=None, history_store=None, price_cache=None,
+                 benchmark=DEFAULT_BENCHMARK):
         super().__init__(parent)
         self.setWindowTitle("Portfolio Analytics")
         self.setMinimumSize(900, 600)
         self.portfolio = portfolio
+        self.history_store = history_store
+        self.price_cache = price_cache  # Daily prices already downloaded, shared with the report
+        self.benchmark = benchmark  # Spec like "VNQ, SCHH, O+PLD+SPG" (see benchmark_baskets)
+        self.benchmark_histories = {}  # ticker -> history of every benchmark ticker
+        self.benchmark_history = None  # First benchmark, the one betas are measured against
+        self.benchmark_loader = None
+        self.position_values = {}  # ticker -> current value, the weights of the risk figures
+        self.risk = None  # Last risk_report() shown in the Risk tab
+        self.historical_data = {}
+        self.ledgers = {}  # ticker -> transaction records, for the shares held each day
+        self.income_rollups = IncomeRollups()  # Monthly/annual income, updated as tickers load
+        self.holdings = []  # (ticker, shares, annual income) of the open positions
+        self.income_forecast = None  # Next 12 months of dividends (see dividend_calendar)
+        self.history_loader = None
+        self.tickers_to_load = 0
+        self.tickers_loaded = 0
+        # Tickers that arrive together are added to the charts in one redraw
+        self.chart_coalescer = UpdateCoalescer(self.add_loaded_histories, CHART_REFRESH_MS, self)
+        # Charts are only rebuilt when the data or the view changes; a new period
+        # just moves the existing artists (see update_chart_ranges)
+        self.data_version = 0
+        self.chart_key = None
+        self.allocation_drawn = False
+        self.value_line = None
+        self.trend_line = None
+        self.r2_text = None
+        self.income_months = None
+        self.income_totals = None
+        self.income_summary = None
         
         # Initialize UI
         self.init_ui()
@@ -42,12 +245,14 @@ class PortfolioAnalyticsDialog(QDialog):
                            horizontalalignment='center', verticalalignment='center',
                            transform=canvas.axes.transAxes)
                 canvas.draw()
-                
-            # Generate sample data for visualization
+            self.chart_key = None
+            self.allocation_drawn = False
+
+            # Mostrar primeiro o histórico gravado localmente, enquanto o resto é baixado
+            self.show_recorded_history()
+
+            # Download history in the background; charts fill in as tickers arrive
             self.generate_sample_data()
-            
-            # Update visualizations
-            self.update_charts()
         except Exception as e:
             print(f"Erro ao carregar dados: {str(e)}")
             QMessageBox.warning(self, "Erro", f"Falha ao carregar dados: {str(e)}")
@@ -70,7 +275,9 @@ class PortfolioAnalyticsDialog(QDialog):
             "All REITs", 
             "Yield Comparison", 
             "Annual Income", 
-            "Value Over Time"
+            "Value Over Time",
+            "Benchmark Comparison",
+            "Dividend Calendar"
         ])
         self.view_combo.currentTextChanged.connect(self.update_charts)
         filter_layout.addWidget(self.view_combo)
@@ -106,6 +313,22 @@ class PortfolioAnalyticsDialog(QDialog):
         self.end_date.dateChanged.connect(self.update_charts)
         filter_layout.addWidget(self.end_date)
         
+        # Long periods are downsampled to the width of the chart unless this is checked
+        self.full_resolution_check = QCheckBox("Full resolution")
+        self.full_resolution_check.toggled.connect(self.update_charts)
+        filter_layout.addWidget(self.full_resolution_check)
+        
+        filter_layout.addWidget(QLabel("Benchmark:"))
+        self.benchmark_combo = QComboBox()
+        self.benchmark_combo.setEditable(True)
+        self.benchmark_combo.addItems(BENCHMARKS)
+        self.benchmark_combo.setCurrentText(self.benchmark)
+        self.benchmark_combo.setToolTip("Tickers to compare with, separated by commas.\n"
+                                        "Join tickers with + for an equal-weight basket, e.g. VNQ, O+PLD+SPG.\n"
+                                        "Betas use the first one.")
+        self.benchmark_combo.activated.connect(self.change_benchmark)
+        filter_layout.addWidget(self.benchmark_combo)
+        
         filter_layout.addStretch()
         
         layout.addLayout(filter_layout)
@@ -133,6 +356,22 @@ class PortfolioAnalyticsDialog(QDialog):
         income_tab.setLayout(income_layout)
         self.tabs.addTab(income_tab, "Income")
         
+        # Dividend calendar tab: expected dividends of each position in the next 12 months
+        calendar_tab = QWidget()
+        calendar_layout = QVBoxLayout()
+        
+        self.calendar_status_label = QLabel("Dividends expected in the next 12 months")
+        calendar_layout.addWidget(self.calendar_status_label)
+        
+        self.calendar_table = QTableWidget(0, 0)
+        self.calendar_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.calendar_table.verticalHeader().setVisible(False)
+        self.calendar_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        calendar_layout.addWidget(self.calendar_table)
+        
+        calendar_tab.setLayout(calendar_layout)
+        self.tabs.addTab(calendar_tab, "Calendar")
+        
         # Sector Allocation tab
         allocation_tab = QWidget()
         allocation_layout = QVBoxLayout()
@@ -143,12 +382,43 @@ class PortfolioAnalyticsDialog(QDialog):
         allocation_tab.setLayout(allocation_layout)
         self.tabs.addTab(allocation_tab, "Allocation")
         
+        # Risk tab
+        risk_tab = QWidget()
+        risk_layout = QVBoxLayout()
+        
+        self.risk_status_label = QLabel("Risk figures are computed when the history is loaded")
+        risk_layout.addWidget(self.risk_status_label)
+        
+        risk_content = QHBoxLayout()
+        self.risk_table = QTableWidget(0, len(RISK_COLUMNS))
+        self.risk_table.setHorizontalHeaderLabels(RISK_COLUMNS)
+        self.risk_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.risk_table.verticalHeader().setVisible(False)
+        self.risk_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.risk_table.horizontalHeader().setStretchLastSection(True)
+        risk_content.addWidget(self.risk_table, 1)
+        
+        self.correlation_canvas = MplCanvas(width=5, height=4, dpi=100)
+        risk_content.addWidget(self.correlation_canvas, 1)
+        risk_layout.addLayout(risk_content)
+        
+        risk_tab.setLayout(risk_layout)
+        self.tabs.addTab(risk_tab, "Risk")
+        
         layout.addWidget(self.tabs)
         
         # Bottom controls
         button_layout = QHBoxLayout()
+        
+        self.loading_label = QLabel()
+        button_layout.addWidget(self.loading_label)
         button_layout.addStretch()
         
+        self.cancel_loading_button = QPushButton("Cancel Loading")
+        self.cancel_loading_button.clicked.connect(self.cancel_loading)
+        self.cancel_loading_button.setVisible(False)
+        button_layout.addWidget(self.cancel_loading_button)
+        
         self.close_button = QPushButton("Close")
         self.close_button.clicked.connect(self.accept)
         button_layout.addWidget(self.close_button)
@@ -158,260 +428,348 @@ class PortfolioAnalyticsDialog(QDialog):
         self.setLayout(layout)
     
     def generate_sample_data(self):
-        """Gera dados históricos para o portfólio"""
+        """Start downloading the historical data of the portfolio in the background"""
         if not self.portfolio or not self.portfolio.positions:
             QMessageBox.warning(self, "Sem Dados", "Nenhuma posição encontrada no portfólio!")
             return
-            
-        self.historical_data = {}
         
         # Define o intervalo de datas (últimos 3 anos)
-        end_date = datetime.now().date()  # Usar date em vez de datetime
-        start_date = end_date - timedelta(days=3*365)
-        
-        # Configurar barra de status ou indicador de progresso
-        print("Gerando dados históricos para visualização...")
-        print(f"Período: {start_date} a {end_date}")
+        self.history_end = datetime.now().date()  # Usar date em vez de datetime
+        self.history_start = self.history_end - timedelta(days=3*365)
         
+        # Values come from the shares held on each day, so the ledgers are needed,
+        # and positions sold during the period are charted too
+        jobs = []
+        self.ledgers = {}
+        self.position_values = {}
+        self.income_rollups = IncomeRollups()
+        self.holdings = []
         for ticker, position in self.portfolio.positions.items():
+            records = position.ledger_records()
             metrics = position.calculate_metrics()
-            current_shares = metrics['shares']
-            current_price = position.current_price
-            current_yield = position.dividend_yield
-            
-            # Pule posições sem ações
-            if current_shares <= 0:
+            shares = metrics['shares']
+            if shares > 0:
+                self.income_rollups.set_projected(ticker, metrics['annual_income'])
+                self.position_values[ticker] = position.current_price * shares
+                self.holdings.append((ticker, shares, metrics['annual_income']))
+            if not records and shares > 0:
+                # Sem histórico de transações: assume as ações atuais durante todo o período
+                records = [{'date': self.history_start.isoformat(), 'type': 'BUY', 'shares': shares}]
+            # Pule posições vendidas antes do período
+            if shares <= 0 and max((str(r['date'])[:10] for r in records), default="") < self.history_start.isoformat():
                 continue
-                
-            print(f"Processando dados históricos para {ticker}...")
-            
-            try:
-                # Tente obter dados históricos reais do Yahoo Finance
-                stock = yf.Ticker(ticker)
-                hist = stock.history(start=start_date, end=end_date)
-                
-                if not hist.empty:
-                    # Usar dados reais se disponíveis
-                    price_history = []
-                    value_history = []
-                    income_history = []
-                    
-                    # Simular histórico de dividendos
-                    try:
-                        dividends = stock.dividends
-                    except:
-                        # Se não conseguir obter os dividendos, cria um DataFrame vazio
-                        import pandas as pd
-                        dividends = pd.Series(dtype=float)
-                    
-                    for date_index, row in hist.iterrows():
-                        # Use o mesmo tipo de data para tudo - date em vez de datetime
-                        date_point = date_index.date()  # Converter datetime para date
-                        price = row['Close']
-                        
-                        # Simular número de ações (simplificado - assume ações constantes)
-                        # Em um caso real, você calcularia isso com base nas transações reais
-                        shares = current_shares
-                        
-                        # Calcular valor
-                        value = shares * price
-                        
-                        # Calcular renda (dividendos)
-                        income = 0.0
-                        if not dividends.empty:
-                            # Converter os índices de dividendos para date
-                            div_dates = [d.date() for d in dividends.index]
-                            if date_point in div_dates:
-                                div_idx = div_dates.index(date_point)
-                                income = dividends.iloc[div_idx] * shares
-                        
-                        price_history.append((date_point, price))
-                        value_history.append((date_point, value))
-                        income_history.append((date_point, income))
-                    
-                    # Adicionar dados ao dicionário
-                    if price_history and value_history and income_history:
-                        self.historical_data[ticker] = {
-                            'price_history': price_history,
-                            'value_history': value_history,
-                            'income_history': income_history
-                        }
-                        print(f"Dados históricos obtidos com sucesso para {ticker} ({len(price_history)} pontos)")
-                        continue  # Pule a geração de dados aleatórios
-                    else:
-                        print(f"Dados históricos vazios para {ticker}, gerando dados simulados")
-                else:
-                    print(f"Sem dados históricos para {ticker}, gerando dados simulados")
-            except Exception as e:
-                print(f"Erro ao obter dados históricos para {ticker}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                # Continua para geração de dados simulados abaixo
-            
-            # Fallback: gerar dados simulados se não conseguir dados reais
-            try:
-                price_history = []
-                value_history = []
-                income_history = []
-                
-                # Simular o intervalo de datas
-                date_range = []
-                current_date = start_date
-                while current_date <= end_date:
-                    date_range.append(current_date)
-                    current_date += timedelta(days=1)
-                
-                for date_point in date_range:
-                    # Simular volatilidade de preço
-                    days_ago = (end_date - date_point).days
-                    # Preços tendem a subir ao longo do tempo com alguma volatilidade
-                    price_factor = 1 - (days_ago / (3*365)) * 0.15  # 15% mais baixo há 3 anos
-                    noise = np.random.normal(0, 0.02)  # 2% de volatilidade diária
-                    price = current_price * price_factor * (1 + noise)
-                    
-                    # Simular ações possuídas (simplificado - assume ações constantes)
-                    shares = current_shares
-                    
-                    # Calcular valor
-                    value = shares * price
-                    
-                    # Calcular renda (simplificado - assume rendimento constante)
-                    # Pagamentos de dividendos mensais
-                    if date_point.day == 15:  # Pagamento de dividendos no dia 15 de cada mês
-                        monthly_yield = current_yield / 12
-                        income = value * (monthly_yield / 100)
-                    else:
-                        income = 0
-                    
-                    price_history.append((date_point, price))
-                    value_history.append((date_point, value))
-                    income_history.append((date_point, income))
-                
-                self.historical_data[ticker] = {
-                    'price_history': price_history,
-                    'value_history': value_history,
-                    'income_history': income_history
-                }
-                print(f"Dados históricos simulados gerados para {ticker} ({len(price_history)} pontos)")
-            except Exception as e:
-                print(f"Erro ao gerar dados simulados para {ticker}: {str(e)}")
-                import traceback
-                traceback.print_exc()
+            self.ledgers[ticker] = records
+            jobs.append((ticker, position.current_price, position.dividend_yield))
+        
+        print("Gerando dados históricos para visualização...")
+        print(f"Período: {self.history_start} a {self.history_end}")
         
-        # Calcular totais do portfólio
+        # Calendário com os dividendos já em cache; refeito quando o histórico chegar
+        self.update_income_forecast()
+        
+        self.stop_loading()
+        self.tickers_to_load = len(jobs)
+        self.tickers_loaded = 0
+        self.history_loader = HistoryLoader(jobs, self.history_start, self.history_end, self.price_cache)
+        self.history_loader.ticker_loaded.connect(self.on_ticker_loaded)
+        self.history_loader.error_occurred.connect(self.on_history_error)
+        self.history_loader.finished.connect(self.on_history_loaded)
+        self.cancel_loading_button.setEnabled(True)
+        self.cancel_loading_button.setVisible(True)
+        self.update_loading_label()
+        self.history_loader.start()
+        self.load_benchmark()
+    
+    def on_ticker_loaded(self, ticker, history):
+        if self.sender() is not self.history_loader:
+            return  # Left over from a load that was replaced
+        self.tickers_loaded += 1
+        self.update_loading_label()
+        self.chart_coalescer.add(ticker, history)
+    
+    def on_history_error(self, message):
+        self.tickers_loaded += 1
+        print(message)
+    
+    def add_loaded_histories(self, histories):
+        """Add a batch of downloaded tickers and redraw the charts once"""
+        if 'PORTFOLIO' in self.historical_data and len(self.historical_data) == 1:
+            # Só o histórico gravado estava na tela; os totais agora saem dos tickers
+            self.historical_data = {}
+        self.historical_data.update(histories)
+        # Só os tickers novos entram nos agregados de renda
+        for ticker, history in histories.items():
+            self.income_rollups.set_received(ticker, history['dates'], ticker_income(ticker, history, self.ledgers))
         try:
-            print("Calculando totais do portfólio...")
-            self.calculate_portfolio_totals(start_date, end_date)
-            print("Visualização de dados pronta.")
+            self.calculate_portfolio_totals(self.history_start, self.history_end)
         except Exception as e:
             print(f"Erro ao calcular totais do portfólio: {str(e)}")
             import traceback
             traceback.print_exc()
-            QMessageBox.warning(self, "Erro", f"Falha ao calcular dados do portfólio: {str(e)}")
-            
+        self.update_charts()
+    
+    def on_history_loaded(self):
+        """Loader thread ended, after loading every ticker or being cancelled"""
+        if self.history_loader is None or self.sender() is not self.history_loader:
+            return
+        cancelled = not self.history_loader.running
+        self.chart_coalescer.flush()
+        self.cancel_loading_button.setVisible(False)
+        self.update_risk()
+        # O histórico baixado completa os dividendos em cache dos tickers sem ledger
+        self.update_income_forecast()
+        if cancelled:
+            self.loading_label.setText(f"Loading cancelled ({self.tickers_loaded} of {self.tickers_to_load} tickers)")
+            return
+        self.loading_label.setText("")
+        print("Visualização de dados pronta.")
+        
         # Verificar se conseguimos dados para pelo menos um ticker
-        if not self.historical_data:
+        if not any(ticker != 'PORTFOLIO' for ticker in self.historical_data):
             QMessageBox.warning(self, "Sem Dados", "Não foi possível obter ou gerar dados históricos.")
+    
+    def update_income_forecast(self):
+        """Recompute the dividend calendar and show it in the Calendar tab and the calendar chart"""
+        try:
+            self.income_forecast = portfolio_forecast(self.holdings, self.price_cache)
+        except Exception as e:
+            print(f"Erro ao calcular a previsão de dividendos: {str(e)}")
+            self.income_forecast = None
+        self.update_calendar_table()
+        if self.view_combo.currentText() == "Dividend Calendar":
+            self.chart_key = None
+            self.update_charts()
+    
+    def update_calendar_table(self):
+        """Fill the Calendar tab with one row per position and one column per month"""
+        forecast = self.income_forecast
+        self.calendar_table.setRowCount(0)
+        if forecast is None or not forecast['tickers']:
+            self.calendar_status_label.setText("No open positions to forecast")
             return
-
+        
+        months = [month_label(month) for month in forecast['months']]
+        self.calendar_table.setColumnCount(len(months) + 2)
+        self.calendar_table.setHorizontalHeaderLabels(["Ticker"] + months + ["Total"])
+        
+        income = forecast['income']
+        order = np.argsort(income.sum(axis=1))[::-1]
+        rows = [(forecast['tickers'][i], income[i], forecast['estimated'][i]) for i in order]
+        rows.append(("TOTAL", forecast['total'], False))
+        self.calendar_table.setRowCount(len(rows))
+        for row, (ticker, values, estimated) in enumerate(rows):
+            label = QTableWidgetItem(f"{ticker}*" if estimated else ticker)
+            if estimated:
+                label.setToolTip("No dividend history yet; the annual dividend is spread over every month")
+            self.calendar_table.setItem(row, 0, label)
+            for column, value in enumerate(values, start=1):
+                item = QTableWidgetItem(f"${value:,.2f}" if value else "")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.calendar_table.setItem(row, column, item)
+            total = QTableWidgetItem(f"${values.sum():,.2f}")
+            total.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.calendar_table.setItem(row, len(values) + 1, total)
+        
+        status = f"Dividends expected from {months[0]} to {months[-1]}: ${forecast['annual']:,.2f}"
+        if forecast['estimated'].any():
+            status += " (* no dividend history yet, spread evenly)"
+        self.calendar_status_label.setText(status)
+    
+    def update_loading_label(self):
+        self.loading_label.setText(f"Loading history... {self.tickers_loaded} of {self.tickers_to_load} tickers")
+    
+    def cancel_loading(self):
+        """Stop downloading; the charts keep the tickers already loaded"""
+        if self.history_loader is not None:
+            self.history_loader.stop()
+        self.cancel_loading_button.setEnabled(False)
+    
+    def stop_loading(self):
+        """Drop the loaders in flight; their late results never reach the dialog"""
+        for loader in (self.history_loader, self.benchmark_loader):
+            if loader is not None:
+                retire_loader(loader)
+        self.history_loader = None
+        self.benchmark_loader = None
+    
+    def done(self, result):
+        # Close, Esc and the window button all end up here
+        self.stop_loading()
+        super().done(result)
+    
+    def load_benchmark(self):
+        """Load the history of every benchmark ticker; the price cache saves downloads after the first"""
+        if self.benchmark_loader is not None:
+            retire_loader(self.benchmark_loader)
+        self.benchmark_histories = {}
+        self.benchmark_history = None
+        tickers = dict.fromkeys(ticker for basket in benchmark_baskets(self.benchmark) for ticker in basket)
+        self.benchmark_loader = HistoryLoader([(ticker, 0.0, 0.0) for ticker in tickers], self.history_start,
+                                              self.history_end, self.price_cache)
+        self.benchmark_loader.ticker_loaded.connect(self.on_benchmark_loaded)
+        self.benchmark_loader.error_occurred.connect(self.on_history_error)
+        self.benchmark_loader.finished.connect(self.on_benchmarks_loaded)
+        self.benchmark_loader.start()
+    
+    def on_benchmark_loaded(self, ticker, history):
+        if self.sender() is not self.benchmark_loader:
+            return
+        # Um benchmark sem dados reais não serve para comparação nem beta
+        if not history.get('simulated'):
+            self.benchmark_histories[ticker] = history
+    
+    def on_benchmarks_loaded(self):
+        if self.sender() is not self.benchmark_loader:
+            return
+        baskets = benchmark_baskets(self.benchmark)
+        self.benchmark_history = basket_history(self.benchmark_histories, baskets[0]) if baskets else None
+        if self.view_combo.currentText() == "Benchmark Comparison":
+            self.chart_key = None
+            self.update_charts()
+        if self.history_loader is None or not self.history_loader.isRunning():
+            self.update_risk()
+    
+    def change_benchmark(self):
+        baskets = benchmark_baskets(self.benchmark_combo.currentText())
+        benchmark = ", ".join(basket_name(basket) for basket in baskets)
+        self.benchmark_combo.setCurrentText(benchmark)
+        if not benchmark or benchmark == self.benchmark:
+            return
+        self.benchmark = benchmark
+        if hasattr(self, 'history_start'):
+            self.risk_status_label.setText(f"Loading {benchmark}...")
+            self.load_benchmark()
+    
+    def update_risk(self):
+        """Compute the risk figures of the loaded holdings and show them in the Risk tab"""
+        # Históricos simulados não têm risco de verdade
+        histories = {ticker: history for ticker, history in self.historical_data.items()
+                     if ticker != 'PORTFOLIO' and not history.get('simulated')}
+        try:
+            self.risk = risk_report(histories, self.position_values, self.benchmark_history)
+        except Exception as e:
+            print(f"Erro ao calcular métricas de risco: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            self.risk = None
+        
+        if self.risk is None:
+            self.risk_status_label.setText("No market history available for the holdings")
+            self.risk_table.setRowCount(0)
+            self.correlation_canvas.axes.clear()
+            self.correlation_canvas.draw()
+            return
+        
+        risk = self.risk
+        baskets = benchmark_baskets(self.benchmark)
+        primary = basket_name(baskets[0]) if baskets else "-"
+        status = f"{risk['start']} to {risk['end']}"
+        if self.benchmark_history is None:
+            status += f" (no history for {primary}, betas unavailable)"
+        self.risk_status_label.setText(status)
+        self.risk_table.horizontalHeaderItem(3).setText(f"Beta ({primary})")
+        
+        # Portfolio first, then holdings by weight
+        order = np.argsort(risk['weights'])[::-1]
+        portfolio = risk['portfolio']
+        rows = [("PORTFOLIO", 1.0, portfolio['volatility'], portfolio['beta'], portfolio['max_drawdown'])]
+        rows += [(risk['tickers'][i], risk['weights'][i], risk['volatility'][i], risk['beta'][i],
+                  risk['max_drawdown'][i]) for i in order]
+        self.risk_table.setRowCount(len(rows))
+        for row, (ticker, weight, volatility, beta, drawdown) in enumerate(rows):
+            texts = [ticker, f"{weight * 100:.1f}%", f"{volatility * 100:.1f}%",
+                     "n/a" if np.isnan(beta) else f"{beta:.2f}", f"-{drawdown * 100:.1f}%"]
+            for column, text in enumerate(texts):
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignCenter if column == 0 else Qt.AlignRight | Qt.AlignVCenter)
+                if row == 0:
+                    font = item.font()
+                    font.setBold(True)
+                    item.setFont(font)
+                self.risk_table.setItem(row, column, item)
+        
+        self.update_correlation_chart()
+    
+    def update_correlation_chart(self):
+        """Heatmap of the correlation matrix of the holdings"""
+        fig = self.correlation_canvas.fig
+        fig.clear()
+        ax = self.correlation_canvas.axes = fig.add_subplot(111)
+        tickers = self.risk['tickers']
+        if len(tickers) < 2:
+            ax.text(0.5, 0.5, 'Correlations need at least two holdings', 
+                   horizontalalignment='center', verticalalignment='center', transform=ax.transAxes)
+            ax.axis('off')
+            self.correlation_canvas.draw()
+            return
+        
+        image = ax.imshow(self.risk['correlation'], cmap='RdYlGn_r', vmin=-1, vmax=1)
+        fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04)
+        # Com muitos REITs os nomes não cabem
+        if len(tickers) <= 30:
+            ax.set_xticks(range(len(tickers)))
+            ax.set_yticks(range(len(tickers)))
+            ax.set_xticklabels(tickers, rotation=90, fontsize=8)
+            ax.set_yticklabels(tickers, fontsize=8)
+        else:
+            ax.set_xticks([])
+            ax.set_yticks([])
+        ax.set_title('Correlation of Daily Returns', fontsize=12)
+        self.correlation_canvas.draw()
+    
     def calculate_portfolio_totals(self, start_date, end_date):
         """Calcula os totais do portfólio para cada data no intervalo histórico"""
         if not self.historical_data:
             print("Sem dados históricos para calcular totais do portfólio")
             return
-            
-        # Criar lista de todas as datas únicas nos dados históricos
-        all_dates = set()
-        for ticker in self.historical_data:
-            try:
-                dates = [date_point for date_point, _ in self.historical_data[ticker]['value_history']]
-                all_dates.update(dates)
-            except Exception as e:
-                print(f"Erro ao extrair datas para {ticker}: {str(e)}")
-                continue
         
-        if not all_dates:
+        # Todos os tickers alinhados num eixo de datas comum; os totais saem de uma soma por linha
+        totals = portfolio_totals(self.historical_data, self.ledgers)
+        if not len(totals['dates']):
             print("Não foi possível encontrar datas válidas nos dados históricos")
             return
-            
-        # Standardize date types (convert all dates to datetime)
-        standardized_dates = []
-        for date_point in all_dates:
-            if isinstance(date_point, datetime_date) and not isinstance(date_point, datetime):
-                standardized_dates.append(datetime.combine(date_point, datetime.min.time()))
-            else:
-                standardized_dates.append(date_point)
-                
-        all_dates = sorted(standardized_dates)
-        print(f"Calculando totais do portfólio para {len(all_dates)} datas únicas")
-        
-        # Calcular totais do portfólio para cada data
-        portfolio_value_history = []
-        portfolio_income_history = []
-        
-        for date_point in all_dates:
-            total_value = 0.0
-            total_income = 0.0
-            
-            for ticker in self.historical_data:
-                try:
-                    # Encontrar o valor para esta data ou datas equivalentes
-                    value_history = self.historical_data[ticker]['value_history']
-                    
-                    # Procurar correspondência de data exata ou por dia
-                    value_entries = []
-                    for hist_date, value in value_history:
-                        # Converter ambas as datas para o mesmo tipo se necessário
-                        if isinstance(hist_date, datetime_date) and not isinstance(hist_date, datetime):
-                            hist_date = datetime.combine(hist_date, datetime.min.time())
-                        if isinstance(date_point, datetime_date) and not isinstance(date_point, datetime):
-                            date_dt = datetime.combine(date_point, datetime.min.time())
-                        else:
-                            date_dt = date_point
-                            
-                        # Verificar se é a mesma data (ignorando hora/minuto/segundo)
-                        if (hist_date.year == date_dt.year and 
-                            hist_date.month == date_dt.month and 
-                            hist_date.day == date_dt.day):
-                            value_entries.append(value)
-                    
-                    value_on_date = value_entries[0] if value_entries else 0.0
-                    total_value += value_on_date
-                    
-                    # Repetir para o histórico de renda
-                    income_history = self.historical_data[ticker]['income_history']
-                    income_entries = []
-                    for hist_date, income in income_history:
-                        # Converter ambas as datas para o mesmo tipo se necessário
-                        if isinstance(hist_date, datetime_date) and not isinstance(hist_date, datetime):
-                            hist_date = datetime.combine(hist_date, datetime.min.time())
-                        if isinstance(date_point, datetime_date) and not isinstance(date_point, datetime):
-                            date_dt = datetime.combine(date_point, datetime.min.time())
-                        else:
-                            date_dt = date_point
-                            
-                        # Verificar se é a mesma data (ignorando hora/minuto/segundo)
-                        if (hist_date.year == date_dt.year and 
-                            hist_date.month == date_dt.month and 
-                            hist_date.day == date_dt.day):
-                            income_entries.append(income)
-                    
-                    income_on_date = income_entries[0] if income_entries else 0.0
-                    total_income += income_on_date
-                    
-                except Exception as e:
-                    print(f"Erro ao calcular valor para {ticker} na data {date_point}: {str(e)}")
-                    continue
-            
-            portfolio_value_history.append((date_point, total_value))
-            portfolio_income_history.append((date_point, total_income))
         
-        self.historical_data['PORTFOLIO'] = {
-            'value_history': portfolio_value_history,
-            'income_history': portfolio_income_history
+        self.historical_data['PORTFOLIO'] = totals
+        print(f"Totais do portfólio calculados para {len(totals['dates'])} datas")
+
+        self.merge_recorded_history()
+        self.data_version += 1
+
+    def recorded_value_history(self):
+        """Return (dates, total_values) arrays from the daily snapshots, if any"""
+        empty = (np.empty(0, dtype='datetime64[D]'), np.empty(0))
+        if self.history_store is None:
+            return empty
+        try:
+            history = self.history_store.portfolio_history()
+        except Exception as e:
+            print(f"Erro ao ler histórico gravado: {str(e)}")
+            return empty
+        if not history:
+            return empty
+        return (np.array([day for day, _, _, _ in history], dtype='datetime64[D]'),
+                np.array([value for _, value, _, _ in history], dtype=float))
+
+    def show_recorded_history(self):
+        """Draw the performance chart from the snapshot store alone"""
+        dates, values = self.recorded_value_history()
+        if len(dates) < 2:
+            return False
+        self.historical_data = {
+            'PORTFOLIO': {'dates': dates, 'value': values, 'income': np.zeros(len(dates))}
         }
-        
-        print(f"Totais do portfólio calculados: {len(portfolio_value_history)} pontos de valor, {len(portfolio_income_history)} pontos de renda")
+        self.data_version += 1
+        self.update_charts()
+        return True
+
+    def merge_recorded_history(self):
+        """Replace reconstructed values by the recorded ones on the days we have"""
+        dates, values = self.recorded_value_history()
+        if not len(dates):
+            return
+        # Os snapshots têm o valor real do dia, com os preços daquele momento
+        self.historical_data['PORTFOLIO'] = merge_recorded(self.historical_data['PORTFOLIO'], dates, values)
+        print(f"{len(dates)} dias do histórico gravado aplicados ao gráfico de desempenho")
         
     def update_charts(self):
         """Atualiza todos os gráficos com base nas seleções atuais"""
@@ -438,26 +796,135 @@ class PortfolioAnalyticsDialog(QDialog):
             else:  # All Time
                 start_date = datetime_date(2010, 1, 1)  # Arbitrary start date as date object
             
-            # Update start date widget
+            # Update start date widget (sem disparar outra atualização pelo dateChanged)
+            self.start_date.blockSignals(True)
             self.start_date.setDate(QDate(start_date.year, start_date.month, start_date.day))
+            self.start_date.blockSignals(False)
             
             # O tipo de start_date e end_date aqui deve ser date, não datetime
             print(f"Intervalo de datas: {start_date} a {end_date}")
             print(f"Tipos: {type(start_date)}, {type(end_date)}")
             
+            # Only the date range changed: move the existing artists instead of redrawing
+            key = (view, self.data_version, self.full_resolution_check.isChecked())
+            if key == self.chart_key and self.update_chart_ranges(start_date, end_date, view):
+                return
+            
             # Update the charts
             self.update_performance_chart(start_date, end_date, view)
             self.update_income_chart(start_date, end_date, view)
-            self.update_allocation_chart()
+            self.chart_key = key
+            # A alocação não depende do período
+            if not self.allocation_drawn:
+                self.update_allocation_chart()
         except Exception as e:
             print(f"Erro ao atualizar gráficos: {str(e)}")
             import traceback
             traceback.print_exc()
     
+    def update_chart_ranges(self, start_date, end_date, view):
+        """Show another date range on the charts already drawn.
+
+        Returns False when a chart has no artists to update (it shows a
+        message, or the range has no data), so it must be rebuilt instead.
+        """
+        if view == "Benchmark Comparison":
+            return False  # Every line is rebased on the first day of the period
+        if view == "Dividend Calendar":
+            return True  # The forecast doesn't depend on the period
+        if view == "All REITs" or view == "Value Over Time":
+            if self.value_line is None:
+                return False
+            dates, values = self.portfolio_series('value', start_date, end_date)
+            if not values.any():
+                return False
+        if view == "All REITs" or view == "Annual Income":
+            if self.income_months is None or not self.set_income_range(start_date, end_date):
+                return False
+        
+        if view == "All REITs" or view == "Value Over Time":
+            self.set_performance_data(dates, values)
+            self.performance_canvas.draw_idle()
+        if view == "All REITs" or view == "Annual Income":
+            self.income_canvas.draw_idle()
+        return True
+    
+    def set_performance_data(self, dates, values):
+        """Put a period of the portfolio value on the existing line, trend line and R² label"""
+        plot_dates, plot_values = self.chart_points(self.performance_canvas, dates, values)
+        self.value_line.set_data(mdates.date2num(plot_dates), plot_values)
+        
+        # Linha de tendência ajustada aos dados completos do período, não aos reduzidos
+        self.trend_line.set_data([], [])
+        self.r2_text.set_visible(False)
+        if len(dates) > 1:
+            try:
+                from scipy import stats
+                
+                # Converter datas para números para regressão linear
+                x = mdates.date2num(dates)
+                slope, intercept, r_value, p_value, std_err = stats.linregress(x, values)
+                
+                x_line = np.array([x.min(), x.max()])
+                self.trend_line.set_data(x_line, intercept + slope * x_line)
+                
+                # Adicionar R² para mostrar a qualidade do ajuste
+                self.r2_text.set_text(f"R² = {r_value**2:.3f}")
+                self.r2_text.set_visible(True)
+            except Exception as e:
+                print(f"Erro ao calcular linha de tendência: {str(e)}")
+        
+        ax = self.performance_canvas.axes
+        ax.relim()
+        ax.autoscale_view()
+    
+    def set_income_range(self, start_date, end_date):
+        """Zoom the monthly income bars to the months of a period and update the totals.
+
+        Returns False when no month of the period had income.
+        """
+        months = self.income_months
+        in_range = ((months >= np.datetime64(start_date, 'M')) & (months <= np.datetime64(end_date, 'M')))
+        if not in_range.any():
+            return False
+        incomes = self.income_totals[in_range]
+        first, last = months[in_range][[0, -1]].astype('datetime64[D]')
+        
+        ax = self.income_canvas.axes
+        ax.set_xlim(mdates.date2num(first - np.timedelta64(2, 'D')),
+                    mdates.date2num(last + np.timedelta64(30, 'D')))
+        # Espaço acima da barra mais alta para os rótulos
+        ax.set_ylim(0, incomes.max() * 1.25)
+        if len(incomes) > 12:
+            ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
+        else:
+            ax.xaxis.set_major_locator(mdates.MonthLocator(interval=1))
+        
+        # Calcular e mostrar receita anual total
+        annual_income = incomes.sum()
+        monthly_avg = annual_income / len(incomes)
+        period_text = f"{len(incomes)} months"
+        self.income_summary.set_text(f"Total Income: ${annual_income:.2f}\nMonthly Avg: ${monthly_avg:.2f}\nPeriod: {period_text}")
+        return True
+    
+    def portfolio_series(self, key, start_date, end_date):
+        """(dates, values) of a portfolio series between two dates, inclusive"""
+        data = self.historical_data['PORTFOLIO']
+        dates = data['dates']
+        in_range = (dates >= np.datetime64(start_date, 'D')) & (dates <= np.datetime64(end_date, 'D'))
+        return dates[in_range], data[key][in_range]
+    
+    def chart_points(self, canvas, dates, values):
+        """Points of a line to plot: downsampled to the canvas width unless full resolution is on"""
+        if self.full_resolution_check.isChecked():
+            return dates, values
+        return downsample(dates, values, max(canvas.width(), MIN_CHART_POINTS))
+    
     def update_performance_chart(self, start_date, end_date, view):
         """Atualiza o gráfico de desempenho do portfólio"""
         if not hasattr(self, 'historical_data') or not self.historical_data:
             self.performance_canvas.axes.clear()
+            self.value_line = None
             self.performance_canvas.axes.text(0.5, 0.5, 'Dados históricos não disponíveis', 
                        horizontalalignment='center', verticalalignment='center', 
                        transform=self.performance_canvas.axes.transAxes)
@@ -466,12 +933,7 @@ class PortfolioAnalyticsDialog(QDialog):
             
         ax = self.performance_canvas.axes
         ax.clear()
-        
-        # Converter start_date e end_date para datetime se forem date
-        if isinstance(start_date, type(datetime_date(2020, 1, 1))) and not isinstance(start_date, datetime):
-            start_date = datetime.combine(start_date, datetime.min.time())
-        if isinstance(end_date, type(datetime_date(2020, 1, 1))) and not isinstance(end_date, datetime):
-            end_date = datetime.combine(end_date, datetime.max.time())
+        self.value_line = None
         
         if view == "All REITs" or view == "Value Over Time":
             try:
@@ -484,39 +946,31 @@ class PortfolioAnalyticsDialog(QDialog):
                     return
                 
                 # Filtrar dados do portfólio para o intervalo de datas selecionado
-                portfolio_data = []
-                for date_point, value in self.historical_data['PORTFOLIO']['value_history']:
-                    # Converter date para datetime se for date
-                    if isinstance(date_point, type(datetime_date(2020, 1, 1))) and not isinstance(date_point, datetime):
-                        date_point = datetime.combine(date_point, datetime.min.time())
-                    
-                    if start_date <= date_point <= end_date:
-                        portfolio_data.append((date_point, value))
+                dates, values = self.portfolio_series('value', start_date, end_date)
                 
-                if not portfolio_data:
+                if not len(dates):
                     ax.text(0.5, 0.5, 'Sem dados disponíveis para o período selecionado', 
                            horizontalalignment='center', verticalalignment='center', 
                            transform=ax.transAxes)
                     self.performance_canvas.draw()
                     return
                 
-                # Ordenar por data
-                portfolio_data.sort(key=lambda x: x[0])
-                
-                dates = [date_point for date_point, _ in portfolio_data]
-                values = [value for _, value in portfolio_data]
-                
-                if dates and values:
+                if len(dates) and len(values):
                     # Verificar se há valores não zero
-                    if all(value == 0 for value in values):
+                    if not values.any():
                         ax.text(0.5, 0.5, 'Todos os valores são zero no período selecionado', 
                                horizontalalignment='center', verticalalignment='center', 
                                transform=ax.transAxes)
                         self.performance_canvas.draw()
                         return
                     
-                    # Plotar o valor do portfólio ao longo do tempo
-                    ax.plot(dates, values, 'b-', linewidth=2, label='Portfolio Value')
+                    # Artistas vazios; set_performance_data() põe os pontos do período
+                    self.value_line, = ax.plot([], [], 'b-', linewidth=2, label='Portfolio Value')
+                    self.trend_line, = ax.plot([], [], 'r--', linewidth=1, label='Trend Line')
+                    self.r2_text = ax.text(0.02, 0.95, "", transform=ax.transAxes,
+                                           fontsize=9, verticalalignment='top',
+                                           bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
+                    self.set_performance_data(dates, values)
                     
                     # Formatar o gráfico
                     ax.set_title('Portfolio Value Over Time', fontsize=14)
@@ -529,36 +983,7 @@ class PortfolioAnalyticsDialog(QDialog):
                     ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
                     plt = self.performance_canvas.fig
                     plt.autofmt_xdate()
-                    
-                    # Adicionar linha de tendência
-                    if len(dates) > 1:
-                        try:
-                            import numpy as np
-                            from scipy import stats
-                            
-                            # Converter datas para números para regressão linear
-                            x = mdates.date2num(dates)
-                            y = values
-                            
-                            slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
-                            
-                            # Plotar linha de tendência
-                            x_line = np.array([min(x), max(x)])
-                            y_line = intercept + slope * x_line
-                            
-                            # Converter x_line de volta para datas
-                            x_line_dates = mdates.num2date(x_line)
-                            
-                            ax.plot(x_line_dates, y_line, 'r--', linewidth=1, label='Trend Line')
-                            
-                            # Adicionar R² para mostrar a qualidade do ajuste
-                            ax.text(0.02, 0.95, f"R² = {r_value**2:.3f}", transform=ax.transAxes,
-                                   fontsize=9, verticalalignment='top',
-                                   bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
-                            
-                            ax.legend()
-                        except Exception as e:
-                            print(f"Erro ao calcular linha de tendência: {str(e)}")
+                    ax.legend()
                 else:
                     ax.text(0.5, 0.5, 'No data available for selected period', 
                            horizontalalignment='center', verticalalignment='center', 
@@ -571,6 +996,17 @@ class PortfolioAnalyticsDialog(QDialog):
                        horizontalalignment='center', verticalalignment='center', 
                        transform=ax.transAxes)
             
+        elif view == "Benchmark Comparison":
+            try:
+                self.draw_benchmark_comparison(ax, start_date, end_date)
+            except Exception as e:
+                print(f"Erro ao comparar com o benchmark: {str(e)}")
+                import traceback
+                traceback.print_exc()
+                ax.text(0.5, 0.5, f'Erro ao gerar gráfico: {str(e)}', 
+                       horizontalalignment='center', verticalalignment='center', 
+                       transform=ax.transAxes)
+            
         elif view == "Yield Comparison":
             try:
                 # Comparar rendimentos entre REITs
@@ -625,10 +1061,57 @@ class PortfolioAnalyticsDialog(QDialog):
         
         self.performance_canvas.draw()
     
+    def draw_benchmark_comparison(self, ax, start_date, end_date):
+        """Cumulative return of the portfolio and of each benchmark over the period"""
+        data = self.historical_data.get('PORTFOLIO', {})
+        if 'return' not in data:
+            ax.text(0.5, 0.5, 'Benchmark comparison needs the history of the holdings', 
+                   horizontalalignment='center', verticalalignment='center', transform=ax.transAxes)
+            return
+        dates, returns = self.portfolio_series('return', start_date, end_date)
+        if len(dates) < 2:
+            ax.text(0.5, 0.5, 'Sem dados disponíveis para o período selecionado', 
+                   horizontalalignment='center', verticalalignment='center', transform=ax.transAxes)
+            return
+        
+        # Retorno ponderado no tempo: compras e vendas não contam como ganho
+        growth = np.concatenate([[0.0], np.cumprod(1.0 + returns[1:]) - 1.0])
+        plot_dates, plot_growth = self.chart_points(self.performance_canvas, dates, growth * 100)
+        ax.plot(plot_dates, plot_growth, 'b-', linewidth=2, label='Portfolio')
+        
+        summary = [f"Portfolio: {growth[-1] * 100:+.1f}%"]
+        for i, basket in enumerate(benchmark_baskets(self.benchmark)):
+            name = basket_name(basket)
+            history = basket_history(self.benchmark_histories, basket)
+            if history is None:
+                summary.append(f"{name}: no history")
+                continue
+            # O benchmark é levado para as mesmas datas do portfólio
+            comparison = compare_to_benchmark(dates, returns, history)
+            plot_dates, plot_growth = self.chart_points(self.performance_canvas, dates, comparison['benchmark'] * 100)
+            ax.plot(plot_dates, plot_growth, color=f"C{i + 1}", linewidth=1.5, label=name)
+            summary.append(f"{name}: {comparison['benchmark'][-1] * 100:+.1f}% "
+                           f"(relative {comparison['relative'] * 100:+.1f}%, "
+                           f"tracking error {comparison['tracking_error'] * 100:.1f}%)")
+        
+        ax.axhline(0, color='gray', linewidth=0.8)
+        ax.text(0.02, 0.95, "\n".join(summary), transform=ax.transAxes,
+               fontsize=9, verticalalignment='top',
+               bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+        
+        ax.set_title('Portfolio vs Benchmarks', fontsize=14)
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Cumulative Return (%)', fontsize=12)
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m/%d/%Y'))
+        self.performance_canvas.fig.autofmt_xdate()
+        ax.legend(loc='lower right')
+    
     def update_income_chart(self, start_date, end_date, view):
         """Atualiza o gráfico de receita de dividendos"""
         if not hasattr(self, 'historical_data') or not self.historical_data:
             self.income_canvas.axes.clear()
+            self.income_months = None
             self.income_canvas.axes.text(0.5, 0.5, 'Dados históricos não disponíveis', 
                        horizontalalignment='center', verticalalignment='center', 
                        transform=self.income_canvas.axes.transAxes)
@@ -637,12 +1120,7 @@ class PortfolioAnalyticsDialog(QDialog):
             
         ax = self.income_canvas.axes
         ax.clear()
-        
-        # Converter start_date e end_date para datetime se forem date
-        if isinstance(start_date, type(datetime_date(2020, 1, 1))) and not isinstance(start_date, datetime):
-            start_date = datetime.combine(start_date, datetime.min.time())
-        if isinstance(end_date, type(datetime_date(2020, 1, 1))) and not isinstance(end_date, datetime):
-            end_date = datetime.combine(end_date, datetime.max.time())
+        self.income_months = None
         
         if view == "All REITs" or view == "Annual Income":
             try:
@@ -654,47 +1132,26 @@ class PortfolioAnalyticsDialog(QDialog):
                     self.income_canvas.draw()
                     return
 					
-                # Filtrar dados de renda para o intervalo de datas selecionado
-                portfolio_data = []
-                for date, income in self.historical_data['PORTFOLIO']['income_history']:
-                    # Converter date para datetime se for date
-                    if isinstance(date, type(datetime_date(2020, 1, 1))) and not isinstance(date, datetime):
-                        date = datetime.combine(date, datetime.min.time())
-                    
-                    if start_date <= date <= end_date:
-                        portfolio_data.append((date, income))
-                
-                # Agregar renda mensal
-                monthly_income = {}
+                # Renda mensal de todo o histórico, já agregada à medida que os tickers chegam;
+                # o período escolhido só muda os limites dos eixos
+                month_keys, monthly_income = self.income_rollups.monthly()
                 
-                for date, income in portfolio_data:
-                    if income > 0:  # Apenas incluir datas com dividendos
-                        month_key = (date.year, date.month)
-                        if month_key not in monthly_income:
-                            monthly_income[month_key] = 0
-                        monthly_income[month_key] += income
-                
-                if monthly_income:
-                    # Ordenar por data
-                    month_keys = sorted(monthly_income.keys())
-                    months = [datetime(year, month, 15) for year, month in month_keys]  # Usar dia 15 para representar o mês
-                    incomes = [monthly_income[key] for key in month_keys]
+                if len(monthly_income):
+                    # Usar dia 15 para representar o mês
+                    months = month_keys.astype('datetime64[D]') + np.timedelta64(14, 'D')
+                    incomes = monthly_income
                     
                     # Criar gráfico de barras para renda mensal
                     bars = ax.bar(months, incomes, width=20, color='green')
                     
-                    # Adicionar rótulos de valor acima das barras
+                    # Adicionar rótulos de valor acima das barras (cortados fora do período)
+                    label_offset = incomes.max() * 0.02
                     for i, (month, income) in enumerate(zip(months, incomes)):
-                        ax.text(month, income + max(incomes) * 0.02, f"${income:.2f}", 
-                               ha='center', va='bottom', fontsize=8, rotation=45)
-                    
-                    # Calcular e mostrar receita anual total
-                    annual_income = sum(incomes)
-                    monthly_avg = annual_income / len(incomes) if incomes else 0
-                    period_text = f"{len(months)} months"
+                        ax.text(month, income + label_offset, f"${income:.2f}", 
+                               ha='center', va='bottom', fontsize=8, rotation=45, clip_on=True)
                     
-                    # Adicionar texto informativo
-                    ax.text(0.02, 0.95, f"Total Income: ${annual_income:.2f}\nMonthly Avg: ${monthly_avg:.2f}\nPeriod: {period_text}", 
+                    # Texto informativo, preenchido por set_income_range()
+                    self.income_summary = ax.text(0.02, 0.95, "", 
                            transform=ax.transAxes, verticalalignment='top',
                            bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
                     
@@ -706,12 +1163,17 @@ class PortfolioAnalyticsDialog(QDialog):
                     
                     # Formatar datas no eixo x
                     ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %Y'))
-                    if len(months) > 12:
-                        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-                    else:
-                        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=1))
                     plt = self.income_canvas.fig
                     plt.autofmt_xdate(rotation=45)
+                    
+                    self.income_months = month_keys
+                    self.income_totals = monthly_income
+                    if not self.set_income_range(start_date, end_date):
+                        self.income_months = None
+                        ax.clear()
+                        ax.text(0.5, 0.5, 'No dividend income data for selected period', 
+                               horizontalalignment='center', verticalalignment='center', 
+                               transform=ax.transAxes)
                 else:
                     ax.text(0.5, 0.5, 'No dividend income data for selected period', 
                            horizontalalignment='center', verticalalignment='center', 
@@ -722,19 +1184,20 @@ class PortfolioAnalyticsDialog(QDialog):
                        horizontalalignment='center', verticalalignment='center', 
                        transform=ax.transAxes)
             
+        elif view == "Dividend Calendar":
+            try:
+                self.draw_dividend_calendar(ax)
+            except Exception as e:
+                print(f"Erro ao desenhar o calendário de dividendos: {str(e)}")
+                ax.text(0.5, 0.5, f'Erro ao gerar gráfico: {str(e)}', 
+                       horizontalalignment='center', verticalalignment='center', 
+                       transform=ax.transAxes)
+            
         elif view == "Yield Comparison":
             try:
                 # Comparar receita anual entre REITs
                 tickers = [ticker for ticker in self.historical_data.keys() if ticker != 'PORTFOLIO']
-                annual_incomes = []
-                
-                for ticker in tickers:
-                    if ticker in self.portfolio.positions:
-                        position = self.portfolio.positions[ticker]
-                        metrics = position.calculate_metrics()
-                        annual_incomes.append(metrics['annual_income'])
-                    else:
-                        annual_incomes.append(0)  # Fallback
+                annual_incomes = [self.income_rollups.projected(ticker) for ticker in tickers]
                 
                 # Ordenar por receita (do maior para o menor)
                 ticker_income_pairs = sorted(zip(tickers, annual_incomes), key=lambda x: x[1], reverse=True)
@@ -769,6 +1232,47 @@ class PortfolioAnalyticsDialog(QDialog):
             
         self.income_canvas.draw()
     
+    def draw_dividend_calendar(self, ax):
+        """Expected dividends of the next 12 months, stacked by position"""
+        forecast = self.income_forecast
+        if forecast is None or not forecast['annual']:
+            ax.text(0.5, 0.5, 'No dividends expected in the next 12 months', 
+                   horizontalalignment='center', verticalalignment='center', transform=ax.transAxes)
+            return
+        
+        income = forecast['income']
+        order = np.argsort(income.sum(axis=1))[::-1]
+        stacks = [(forecast['tickers'][i], income[i]) for i in order[:CALENDAR_CHART_TICKERS]]
+        if len(order) > CALENDAR_CHART_TICKERS:
+            stacks.append(("Others", income[order[CALENDAR_CHART_TICKERS:]].sum(axis=0)))
+        
+        x = np.arange(len(forecast['months']))
+        bottom = np.zeros(len(x))
+        for i, (label, values) in enumerate(stacks):
+            if values.any():
+                ax.bar(x, values, bottom=bottom, width=0.7, color=f"C{i}", label=label)
+                bottom += values
+        
+        # Total do mês acima de cada barra
+        total = forecast['total']
+        for position, value in zip(x, total):
+            if value:
+                ax.text(position, value + total.max() * 0.02, f"${value:,.0f}", ha='center', va='bottom', fontsize=8)
+        # Espaço acima das barras para os rótulos e o resumo
+        ax.set_ylim(0, total.max() * 1.4)
+        
+        ax.text(0.02, 0.95, f"Next 12 months: ${forecast['annual']:,.2f}\nMonthly Avg: ${forecast['annual'] / len(x):,.2f}",
+               transform=ax.transAxes, verticalalignment='top',
+               bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+        
+        ax.set_xticks(x)
+        ax.set_xticklabels([month_label(month) for month in forecast['months']], rotation=45, ha='right')
+        ax.set_title('Dividend Calendar (next 12 months)', fontsize=14)
+        ax.set_xlabel('Month', fontsize=12)
+        ax.set_ylabel('Expected Income ($)', fontsize=12)
+        ax.grid(True, linestyle='--', alpha=0.7, axis='y')
+        ax.legend(loc='upper right', fontsize=8, ncol=2)
+    
     def update_allocation_chart(self):
         if not self.portfolio or not self.portfolio.positions:
             return
@@ -812,8 +1316,7 @@ class PortfolioAnalyticsDialog(QDialog):
             
             # Garantir que temos cores suficientes
             if len(costs) > len(colors):
-                from matplotlib.cm import get_cmap
-                colors = get_cmap('tab20').colors
+                colors = matplotlib.colormaps['tab20'].colors
             
             # Criar o gráfico de pizza
             wedges, _, autotexts = ax.pie(costs, 
@@ -842,12 +1345,14 @@ class PortfolioAnalyticsDialog(QDialog):
                    transform=ax.transAxes)
         
         self.allocation_canvas.draw()
+        self.allocation_drawn = True
         
     def closeEvent(self, event):
         # Properly close matplotlib figures to avoid memory leaks
         self.performance_canvas.fig.clear()
         self.income_canvas.fig.clear()
         self.allocation_canvas.fig.clear()
+        self.correlation_canvas.fig.clear()
         event.accept()
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+# Months covered by the forecast, starting with the next one
+FORECAST_MONTHS = 12
+
+# Dividends older than this say little about a ticker's current schedule
+LEDGER_DAYS = 2 * 365
+
+# Payments per year a ticker can have; the one closest to its ledger's spacing is used
+FREQUENCIES = (12, 4, 2, 1)
+
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def ledger_start(today=None):
+    """First day of the dividend ledger the forecast looks at"""
+    return (today or date.today()) - timedelta(days=LEDGER_DAYS)
+
+
+def dividend_schedule(payments):
+    """Frequency, pay months and last amount of a ticker from its dividend ledger.
+
+    payments is [(date, amount)] ordered by date. The frequency comes from
+    the median number of days between payments. The pay months are the
+    months paid in the year up to the last payment, or, when that year
+    doesn't have one payment per period, the months one period apart from
+    the last payment. Returns None without payments.
+    """
+    if not payments:
+        return None
+    last_day, amount = payments[-1]
+    if len(payments) > 1:
+        days = np.array([day for day, _ in payments], dtype='datetime64[D]')
+        gap = np.median(np.diff(days).astype(float))
+        frequency = min(FREQUENCIES, key=lambda f: abs(365.25 / f - gap))
+    else:
+        frequency = 1
+
+    # Meio período de folga para pagamentos que mudam alguns dias de data
+    year_start = last_day - timedelta(days=365 - 365 // frequency // 2)
+    months = sorted({day.month - 1 for day, _ in payments if day > year_start})
+    if len(months) != frequency:
+        step = 12 // frequency
+        months = sorted((last_day.month - 1 + step * k) % 12 for k in range(frequency))
+    return {'frequency': frequency, 'months': months, 'amount': float(amount),
+            'last_paid': last_day, 'estimated': False}
+
+
+def estimated_schedule(annual_dividend):
+    """Schedule of a ticker without a ledger: its annual dividend spread over every month"""
+    return {'frequency': 12, 'months': list(range(12)), 'amount': annual_dividend / 12,
+            'last_paid': None, 'estimated': True}
+
+
+def income_forecast(holdings, ledgers, start_month=None):
+    """Cash income of every holding in each of the next FORECAST_MONTHS months.
+
+    holdings is [(ticker, shares, annual_income)] and ledgers maps a ticker
+    to its [(date, amount)] dividends. Holdings without a ledger are spread
+    evenly from their annual income and flagged as estimated. Every
+    schedule becomes a row of a (holdings x 12) pay-month grid, so the
+    whole forecast is one product with the amounts paid per payment.
+    """
+    if start_month is None:
+        start_month = np.datetime64(date.today(), 'M') + 1
+    months = np.datetime64(start_month, 'M') + np.arange(FORECAST_MONTHS)
+
+    tickers, shares, schedules = [], [], []
+    for ticker, ticker_shares, annual_income in holdings:
+        schedule = dividend_schedule(ledgers.get(ticker))
+        if schedule is None:
+            schedule = estimated_schedule(annual_income / ticker_shares if ticker_shares else 0.0)
+        tickers.append(ticker)
+        shares.append(ticker_shares)
+        schedules.append(schedule)
+
+    # Linha i, coluna m: 1 quando a posição i paga no mês m do ano (0 = janeiro)
+    pays = np.zeros((len(schedules), 12))
+    rows = np.repeat(np.arange(len(schedules)), [len(s['months']) for s in schedules])
+    columns = np.array([month for s in schedules for month in s['months']], dtype=np.int64)
+    pays[rows, columns] = 1.0
+
+    per_payment = np.array(shares, dtype=float) * np.array([s['amount'] for s in schedules], dtype=float)
+    # datetime64[M] counts months since January 1970, so % 12 is the month of the year
+    income = per_payment[:, None] * pays[:, months.astype(np.int64) % 12]
+    total = income.sum(axis=0)
+    return {
+        'tickers': tickers,
+        'months': months,
+        'income': income,
+        'total': total,
+        'annual': float(total.sum()),
+        'schedules': schedules,
+        'estimated': np.array([s['estimated'] for s in schedules], dtype=bool),
+    }
+
+
+def portfolio_holdings(portfolio):
+    """[(ticker, shares, annual_income)] of the open positions of a portfolio"""
+    holdings = []
+    for ticker, position in portfolio.positions.items():
+        metrics = position.calculate_metrics()
+        if metrics['shares'] > 0:
+            holdings.append((ticker, metrics['shares'], metrics['annual_income']))
+    return holdings
+
+
+def portfolio_forecast(holdings, price_cache, today=None):
+    """income_forecast() of holdings with the dividend ledgers kept in the price cache"""
+    today = today or date.today()
+    ledgers = price_cache.dividends(ledger_start(today)) if price_cache is not None else {}
+    return income_forecast(holdings, ledgers, np.datetime64(today, 'M') + 1)
+
+
+def month_label(month):
+    """'Jan 2027' for a datetime64[M]"""
+    month = int(np.datetime64(month, 'M').astype(np.int64))
+    return f"{MONTH_NAMES[month % 12]} {1970 + month // 12}"
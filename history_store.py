@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import threading
+from datetime import date
+
+
+class SnapshotStore:
+    """Daily valuation history of a portfolio kept in a local SQLite database.
+
+    One row per day is stored for the portfolio totals and one per ticker,
+    so charts can read the real history instead of rebuilding it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._create_tables()
+
+    @classmethod
+    def for_portfolio(cls, portfolio_file):
+        """Open the history database that sits next to a portfolio file"""
+        return cls(f"{os.path.splitext(portfolio_file)[0]}_history.db")
+
+    def _create_tables(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS portfolio_snapshots (
+                    day TEXT PRIMARY KEY,
+                    total_value REAL NOT NULL,
+                    total_cost REAL NOT NULL,
+                    annual_income REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS position_snapshots (
+                    day TEXT NOT NULL,
+                    ticker TEXT NOT NULL,
+                    shares REAL NOT NULL,
+                    price REAL NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (day, ticker)
+                ) WITHOUT ROWID
+            """)
+
+    def record_snapshot(self, portfolio, snapshot_date=None):
+        """Store today's valuation, replacing an earlier snapshot of the same day"""
+        day = (snapshot_date or date.today()).isoformat()
+        position_rows = []
+        total_value = 0.0
+        total_cost = 0.0
+        annual_income = 0.0
+
+        for ticker, position in portfolio.positions.items():
+            metrics = position.calculate_metrics()
+            if metrics['shares'] <= 0:
+                continue
+            position_rows.append((day, ticker, metrics['shares'], position.current_price,
+                                  metrics['position_value']))
+            total_value += metrics['position_value']
+            total_cost += metrics['total_cost']
+            annual_income += metrics['annual_income']
+
+        if total_value <= 0:
+            return False
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO portfolio_snapshots VALUES (?, ?, ?, ?)",
+                (day, total_value, total_cost, annual_income)
+            )
+            # Tickers sold during the day must not linger in today's rows
+            self._conn.execute("DELETE FROM position_snapshots WHERE day = ?", (day,))
+            self._conn.executemany(
+                "INSERT INTO position_snapshots VALUES (?, ?, ?, ?, ?)", position_rows
+            )
+        return True
+
+    def portfolio_history(self, start_date=None, end_date=None):
+        """Return [(date, total_value, total_cost, annual_income)] ordered by date"""
+        query = "SELECT day, total_value, total_cost, annual_income FROM portfolio_snapshots"
+        query, params = self._date_filter(query, start_date, end_date)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY day", params).fetchall()
+        return [(date.fromisoformat(day), value, cost, income) for day, value, cost, income in rows]
+
+    def ticker_history(self, ticker, start_date=None, end_date=None):
+        """Return [(date, shares, price, value)] for one ticker ordered by date"""
+        query = "SELECT day, shares, price, value FROM position_snapshots WHERE ticker = ?"
+        query, params = self._date_filter(query, start_date, end_date, [ticker])
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY day", params).fetchall()
+        return [(date.fromisoformat(day), shares, price, value) for day, shares, price, value in rows]
+
+    def _date_filter(self, query, start_date, end_date, params=None):
+        params = list(params or [])
+        clauses = []
+        if start_date is not None:
+            clauses.append("day >= ?")
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            clauses.append("day <= ?")
+            params.append(end_date.isoformat())
+        if clauses:
+            joiner = " AND " if " WHERE " in query else " WHERE "
+            query += joiner + " AND ".join(clauses)
+        return query, params
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PriceHistoryCache:
+    """Daily closes and dividends of every ticker, kept in a local SQLite database.
+
+    Market data is the same for every account, so the workspace keeps a
+    single cache. Charts and risk figures read it and only download the days
+    it doesn't have yet. The dividend ledgers fetched with the quotes are
+    kept here too, for the dividend forecast.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS price_history (
+                    ticker TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    close REAL NOT NULL,
+                    dividend REAL NOT NULL,
+                    PRIMARY KEY (ticker, day)
+                ) WITHOUT ROWID
+            """)
+            # Every dividend a ticker paid, as fetched with its quote
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS dividend_ledger (
+                    ticker TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    amount REAL NOT NULL,
+                    PRIMARY KEY (ticker, day)
+                ) WITHOUT ROWID
+            """)
+
+    def store_history(self, ticker, dates, closes, dividends):
+        """Insert or replace the given days of a ticker"""
+        rows = [(ticker, str(day), float(close), float(dividend))
+                for day, close, dividend in zip(dates, closes, dividends)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO price_history VALUES (?, ?, ?, ?)", rows)
+
+    def history(self, ticker, start_date=None, end_date=None):
+        """Return [(date, close, dividend)] for one ticker ordered by date"""
+        query = "SELECT day, close, dividend FROM price_history WHERE ticker = ?"
+        params = [ticker]
+        if start_date is not None:
+            query += " AND day >= ?"
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            query += " AND day <= ?"
+            params.append(end_date.isoformat())
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY day", params).fetchall()
+        return [(date.fromisoformat(day), close, dividend) for day, close, dividend in rows]
+
+    def store_dividends(self, ticker, payments):
+        """Insert or replace dividends of a ticker, given as [(date or ISO day, amount)]"""
+        rows = [(ticker, str(day)[:10], float(amount)) for day, amount in payments]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO dividend_ledger VALUES (?, ?, ?)", rows)
+
+    def dividends(self, start_date):
+        """Return {ticker: [(date, amount)]} of the dividends paid since start_date.
+
+        The ledger fetched with the quotes is completed with the dividends of
+        the daily histories; the ledger wins when both have the same day.
+        """
+        with self._lock:
+            history_rows = self._conn.execute(
+                "SELECT ticker, day, dividend FROM price_history WHERE dividend > 0 AND day >= ?",
+                (start_date.isoformat(),)).fetchall()
+            ledger_rows = self._conn.execute(
+                "SELECT ticker, day, amount FROM dividend_ledger WHERE day >= ?",
+                (start_date.isoformat(),)).fetchall()
+        paid = {}
+        for ticker, day, amount in history_rows + ledger_rows:
+            paid.setdefault(ticker, {})[day] = amount
+        return {ticker: [(date.fromisoformat(day), amount) for day, amount in sorted(days.items())]
+                for ticker, days in paid.items()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,226 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QVariant
+from PyQt5.QtGui import QColor, QFont, QPalette
+from PyQt5.QtWidgets import QStyledItemDelegate
+from theme import Theme
+from table_filters import ticker_matches
+
+HOLDINGS_COLUMNS = [
+    "Ticker", "Shares", "Price", "Position Value", "Average Cost",
+    "Profit/Loss", "Dividend Yield", "Yield on Cost",
+    "Annual Income", "Percentage (%)", "DG 3y CAGR", "DG 5y CAGR", "Score by alreits"
+]
+
+(TICKER_COLUMN, SHARES_COLUMN, PRICE_COLUMN, VALUE_COLUMN, AVG_COST_COLUMN,
+ PROFIT_LOSS_COLUMN, YIELD_COLUMN, YOC_COLUMN, INCOME_COLUMN, PERCENTAGE_COLUMN,
+ DG_3Y_COLUMN, DG_5Y_COLUMN, SCORE_COLUMN) = range(len(HOLDINGS_COLUMNS))
+
+# Colors and fonts are created once and shared by every cell
+SUCCESS_COLOR = QColor(Theme.SUCCESS)
+DANGER_COLOR = QColor(Theme.DANGER)
+ACCENT_COLOR = QColor(Theme.ACCENT)
+TICKER_FONT = QFont("Segoe UI", 9, QFont.Bold)
+
+
+def format_cell(column, value):
+    """Text shown for a raw cell value"""
+    if column == TICKER_COLUMN:
+        return value
+    if column == SHARES_COLUMN:
+        return f"{int(value) if float(value).is_integer() else value}"
+    if column == SCORE_COLUMN:
+        return f"{value}"
+    if column in (YIELD_COLUMN, YOC_COLUMN, PERCENTAGE_COLUMN, DG_3Y_COLUMN, DG_5Y_COLUMN):
+        return f"{value:.2f}%"
+    return f"${value:.2f}"
+
+
+def cell_color(column, value):
+    """Foreground color for a raw cell value, or None for the default"""
+    if column == PROFIT_LOSS_COLUMN:
+        return DANGER_COLOR if value < 0 else SUCCESS_COLOR
+    if column in (DG_3Y_COLUMN, DG_5Y_COLUMN):
+        # Verde acima de 5%, laranja entre 0 e 5%, vermelho para zero ou negativo
+        if value > 5:
+            return SUCCESS_COLOR
+        if value <= 0:
+            return DANGER_COLOR
+        return ACCENT_COLOR
+    if column == SCORE_COLUMN:
+        if value >= 80:
+            return SUCCESS_COLOR
+        if value >= 50:
+            return ACCENT_COLOR
+        return DANGER_COLOR
+    return None
+
+
+class HoldingsTableModel(QAbstractTableModel):
+    """Holdings rows built from each position's metrics.
+
+    Each row keeps the raw values of its columns; the text is formatted on
+    demand, so the view only formats the cells it actually paints. Rows stay
+    in insertion order: sorting and filtering belong to HoldingsFilterProxy.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []  # One list of raw column values per holding
+        self._row_index = {}  # ticker -> row, kept in step with self._rows
+        self._total_value = 0.0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HOLDINGS_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HOLDINGS_COLUMNS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        value = self._rows[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            return format_cell(index.column(), value)
+        if role == Qt.UserRole:
+            return value
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.FontRole and index.column() == TICKER_COLUMN:
+            return TICKER_FONT
+        return QVariant()
+
+    def ticker_at(self, row):
+        return self._rows[row][TICKER_COLUMN]
+
+    def row_of(self, ticker):
+        """Row of a ticker, or -1 when it isn't shown"""
+        return self._row_index.get(ticker, -1)
+
+    def _reindex(self, start=0):
+        for row in range(start, len(self._rows)):
+            self._row_index[self._rows[row][TICKER_COLUMN]] = row
+
+    def _row_values(self, position, metrics):
+        percentage = (metrics['position_value'] / self._total_value * 100) if self._total_value > 0 else 0
+        return [
+            position.ticker,
+            metrics['shares'],
+            position.current_price,
+            metrics['position_value'],
+            metrics['average_cost'],
+            metrics['profit_loss'],
+            position.dividend_yield,
+            metrics['yield_on_cost'],
+            metrics['annual_income'],
+            percentage,
+            position.dividend_growth_3y,
+            position.dividend_growth_5y,
+            position.alreits_score,
+        ]
+
+    def sync_portfolio(self, portfolio):
+        """Bring the rows in line with a portfolio.
+
+        Holdings that were sold are removed, new ones are inserted and the
+        others are updated in place, so the view keeps its selection and
+        scroll position.
+        """
+        holdings = {}
+        for ticker, position in portfolio.positions.items():
+            metrics = position.calculate_metrics()
+            if metrics['shares'] > 0:
+                holdings[ticker] = (position, metrics)
+
+        for ticker in [values[TICKER_COLUMN] for values in self._rows if values[TICKER_COLUMN] not in holdings]:
+            self.remove_ticker(ticker)
+
+        self._set_total_value(sum(metrics['position_value'] for _, metrics in holdings.values()))
+        new_rows = []
+        for ticker, (position, metrics) in holdings.items():
+            row = self.row_of(ticker)
+            if row < 0:
+                new_rows.append(self._row_values(position, metrics))
+            else:
+                self._replace_row(row, self._row_values(position, metrics))
+
+        if new_rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self._reindex(first)
+            self.endInsertRows()
+
+    def remove_ticker(self, ticker):
+        row = self.row_of(ticker)
+        if row < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._row_index[ticker]
+        self._reindex(row)
+        self.endRemoveRows()
+        return True
+
+    def update_position(self, position, total_value=None, metrics=None):
+        """Refresh one holding, signalling only the cells whose values changed"""
+        row = self.row_of(position.ticker)
+        if row < 0:
+            return False
+
+        if total_value is not None:
+            self._set_total_value(total_value)
+        self._replace_row(row, self._row_values(position, metrics or position.calculate_metrics()))
+        return True
+
+    def _replace_row(self, row, new_values):
+        old_values = self._rows[row]
+        changed = [column for column, value in enumerate(new_values) if value != old_values[column]]
+        self._rows[row] = new_values
+        if changed:
+            self.dataChanged.emit(self.index(row, min(changed)), self.index(row, max(changed)))
+
+    def _set_total_value(self, total_value):
+        """Keep the percentage column in step with the portfolio total"""
+        if total_value == self._total_value:
+            return
+        self._total_value = total_value
+        if not self._rows:
+            return
+        for values in self._rows:
+            values[PERCENTAGE_COLUMN] = (values[VALUE_COLUMN] / total_value * 100) if total_value > 0 else 0
+        self.dataChanged.emit(self.index(0, PERCENTAGE_COLUMN),
+                              self.index(len(self._rows) - 1, PERCENTAGE_COLUMN))
+
+
+class HoldingsFilterProxy(QSortFilterProxyModel):
+    """Sorts holdings on the raw column values and filters them by ticker search"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._search_text = ""
+        # Sort on numbers (Qt.UserRole), not on the formatted "$1,234.00" strings
+        self.setSortRole(Qt.UserRole)
+
+    def set_search_text(self, text):
+        self._search_text = text.strip()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        return ticker_matches(self.sourceModel().ticker_at(source_row), self._search_text)
+
+    def ticker_at(self, row):
+        return self.index(row, TICKER_COLUMN).data(Qt.UserRole)
+
+
+class HoldingsColorDelegate(QStyledItemDelegate):
+    """Paints the value-dependent text colors of the holdings table"""
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        color = cell_color(index.column(), index.data(Qt.UserRole))
+        if color is not None:
+            option.palette.setColor(QPalette.Text, color)
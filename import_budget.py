@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Startup import budget
+=====================
+
+Imports the application in a fresh interpreter with ``-X importtime`` and
+reports where the startup import time goes. Exits with status 1 when the
+total goes over the budget or when one of the heavy modules that should only
+be imported on first use gets loaded at startup.
+
+    python import_budget.py
+    python import_budget.py --budget-ms 400 --top 15
+"""
+
+import sys
+import argparse
+import subprocess
+
+# Module whose import stands for "the main window can be created"
+DEFAULT_MODULE = "main"
+
+# Cumulative import time allowed for DEFAULT_MODULE, in milliseconds
+DEFAULT_BUDGET_MS = 300
+
+# Only imported on first use (fetches, charts, reports, donate dialog)
+DEFERRED_MODULES = ('yfinance', 'pandas', 'numpy', 'requests', 'bs4', 'qrcode',
+                    'matplotlib', 'reportlab')
+
+
+def measure_imports(module):
+    """Return [(self_us, cumulative_us, module_name)] for a fresh import of module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings.append((int(self_us), int(cumulative_us), name.strip()))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the startup import time against a budget")
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="module to import (default: %(default)s)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="allowed cumulative import time in ms (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="number of slowest modules to list")
+    args = parser.parse_args()
+
+    timings = measure_imports(args.module)
+    total_ms = next(cumulative for _, cumulative, name in timings if name == args.module) / 1000
+    loaded = {name for _, _, name in timings}
+
+    print(f"Import time of '{args.module}': {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("\nSlowest modules (self time):")
+    for self_us, cumulative_us, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {cumulative_us / 1000:8.1f} ms cumulative  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    eager = [name for name in DEFERRED_MODULES if name in loaded]
+    if eager:
+        failures.append(f"imported at startup instead of on first use: {', '.join(eager)}")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\nOK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
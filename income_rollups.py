@@ -0,0 +1,142 @@
+# Imposto retido na fonte sobre dividendos americanos para investidores brasileiros
+BRL_TAX_RATE = 0.30
+
+
+class IncomeRollups:
+    """Dividend income aggregated by month and year, per ticker and for the portfolio.
+
+    Two kinds of income are rolled up:
+    - received: dividends paid on the shares held each day, from a ticker's
+      daily history (set_received). Kept as one row per ticker on a shared
+      axis of months, with annual sums materialized from those rows.
+    - projected: the income each position is expected to pay in a year at
+      its current dividend (set_projected).
+    Setting a ticker replaces its own row and moves the portfolio totals by
+    the difference, so new dividends or transactions of one ticker never
+    re-aggregate the others. Consumers read the stored arrays and totals.
+
+    numpy is only imported by the received rollups, so the projections can
+    be kept at startup (see import_budget.py).
+    """
+
+    def __init__(self):
+        self._months = None  # Sorted datetime64[M] axis shared by every received row
+        self._received = {}  # ticker -> income of each month of self._months
+        self._portfolio_received = None
+        self._annual = None  # (years, {ticker: row}, portfolio row), rebuilt on the first read after a change
+        self._projected = {}  # ticker -> projected annual income
+        self.projected_annual = 0.0
+
+    # Received income
+
+    def set_received(self, ticker, dates, daily_income):
+        """Replace the received income of a ticker by its daily income on dates"""
+        import numpy as np
+        daily_income = np.asarray(daily_income, dtype=float)
+        paid = daily_income > 0
+        keys, month_index = np.unique(np.asarray(dates, dtype='datetime64[D]')[paid].astype('datetime64[M]'),
+                                      return_inverse=True)
+        monthly = np.bincount(month_index, weights=daily_income[paid], minlength=len(keys))
+
+        self._extend_months(keys)
+        row = np.zeros(len(self._months))
+        row[np.searchsorted(self._months, keys)] = monthly
+        old = self._received.get(ticker)
+        self._received[ticker] = row
+        self._portfolio_received += row if old is None else row - old
+        self._annual = None
+
+    def remove_received(self, ticker):
+        old = self._received.pop(ticker, None)
+        if old is not None:
+            self._portfolio_received -= old
+            self._annual = None
+
+    def _extend_months(self, keys):
+        """Grow the month axis to include keys, moving the existing rows onto it"""
+        import numpy as np
+        if self._months is None:
+            self._months = np.empty(0, dtype='datetime64[M]')
+            self._portfolio_received = np.empty(0)
+        months = np.union1d(self._months, keys)
+        if len(months) == len(self._months):
+            return
+        columns = np.searchsorted(months, self._months)
+        for ticker, row in self._received.items():
+            self._received[ticker] = np.zeros(len(months))
+            self._received[ticker][columns] = row
+        portfolio = np.zeros(len(months))
+        portfolio[columns] = self._portfolio_received
+        self._months = months
+        self._portfolio_received = portfolio
+
+    def monthly(self, ticker=None):
+        """(months, income) of the months with income, for a ticker or the whole portfolio"""
+        import numpy as np
+        if self._months is None:
+            return np.empty(0, dtype='datetime64[M]'), np.empty(0)
+        row = self._portfolio_received if ticker is None else self._received.get(ticker)
+        if row is None:
+            return np.empty(0, dtype='datetime64[M]'), np.empty(0)
+        paid = row > 1e-9  # Rows emptied by remove_received() keep rounding leftovers
+        return self._months[paid], row[paid]
+
+    def annual(self, ticker=None):
+        """(years, income) of the years with income, for a ticker or the whole portfolio"""
+        import numpy as np
+        if self._months is None:
+            return np.empty(0, dtype='datetime64[Y]'), np.empty(0)
+        if self._annual is None:
+            years, starts = np.unique(self._months.astype('datetime64[Y]'), return_index=True)
+            if len(years):
+                rows = {t: np.add.reduceat(row, starts) for t, row in self._received.items()}
+                portfolio = np.add.reduceat(self._portfolio_received, starts)
+            else:
+                rows, portfolio = {}, np.empty(0)
+            self._annual = (years, rows, portfolio)
+        years, rows, portfolio = self._annual
+        row = portfolio if ticker is None else rows.get(ticker)
+        if row is None:
+            return np.empty(0, dtype='datetime64[Y]'), np.empty(0)
+        paid = row > 1e-9
+        return years[paid], row[paid]
+
+    # Projected income
+
+    def set_projected(self, ticker, annual_income):
+        self.projected_annual += annual_income - self._projected.get(ticker, 0.0)
+        self._projected[ticker] = annual_income
+
+    def remove_projected(self, ticker):
+        self.projected_annual -= self._projected.pop(ticker, 0.0)
+
+    def clear_projected(self):
+        self._projected = {}
+        self.projected_annual = 0.0
+
+    def projected(self, ticker=None):
+        """Projected annual income of a ticker, or of the whole portfolio"""
+        if ticker is None:
+            return self.projected_annual
+        return self._projected.get(ticker, 0.0)
+
+    def projection(self, usd_brl_rate, forecast=None):
+        """Portfolio income projection as shown on the summary cards and in the report.
+
+        With a dividend_calendar forecast the monthly figures are the cash
+        expected next month ('month'), not an even twelfth of the year.
+        """
+        if forecast is not None and len(forecast['total']):
+            monthly, month = float(forecast['total'][0]), forecast['months'][0]
+        else:
+            monthly, month = self.projected_annual / 12, None
+        monthly_brl = monthly * usd_brl_rate
+        return {
+            'annual': self.projected_annual,
+            'monthly': monthly,
+            'month': month,
+            'forecast': forecast,
+            'usd_brl_rate': usd_brl_rate,
+            'monthly_brl': monthly_brl,
+            'monthly_brl_after_tax': monthly_brl * (1 - BRL_TAX_RATE),
+        }
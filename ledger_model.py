@@ -0,0 +1,210 @@
+from datetime import date
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from PyQt5.QtGui import QColor
+from table_filters import ticker_matches
+
+LEDGER_COLUMNS = ["Date", "Ticker", "Type", "Shares", "Price", "Total Cost"]
+DATE_COLUMN, TICKER_COLUMN, TYPE_COLUMN, SHARES_COLUMN, PRICE_COLUMN, TOTAL_COLUMN = range(len(LEDGER_COLUMNS))
+
+TRANSACTION_TYPES = ["BUY", "SELL", "NO_COST"]
+TYPE_COLORS = [QColor("green"), QColor("red"), QColor("blue")]
+
+# Rows handed to the view per fetchMore() call
+PAGE_SIZE = 500
+
+
+class LedgerTableModel(QAbstractTableModel):
+    """Every transaction of a portfolio, kept as one numpy array per column.
+
+    Filters and sorting work on those typed arrays with vectorized
+    operations; the model only exposes the array of visible row numbers, so
+    changing a filter costs a few array passes whatever the ledger size.
+    Rows are handed to the view a page at a time through fetchMore(), and
+    cell text is only formatted for the rows being painted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tickers = []  # Ticker of each code, in alphabetical order
+        self._dates = np.empty(0, dtype='datetime64[D]')
+        self._date_order = np.empty(0, dtype=np.int64)  # All rows sorted by date (stable)
+        self._ticker_codes = np.empty(0, dtype=np.int32)
+        self._types = np.empty(0, dtype=np.int8)  # Index into TRANSACTION_TYPES
+        self._shares = np.empty(0)
+        self._prices = np.empty(0)
+        self._totals = np.empty(0)
+        self._position_index = np.empty(0, dtype=np.int64)  # Index inside the position's transactions
+        self._mask = np.empty(0, dtype=bool)
+        self._matching = np.empty(0, dtype=np.int64)  # Rows passing the filters
+        self._visible = np.empty(0, dtype=np.int64)  # Matching rows in display order
+        self._fetched = 0  # Leading rows of self._visible the view knows about
+
+        self._ticker_filter = None
+        self._search_text = ""
+        self._type_filter = None
+        self._start_date = None
+        self._end_date = None
+        # Newest transactions first, like the original table
+        self._sort_column = DATE_COLUMN
+        self._sort_order = Qt.DescendingOrder
+
+    def load(self, portfolio):
+        """Read every position's transactions into the column arrays.
+
+        Ledgers are read as plain records, so no Transaction objects are
+        created and positions that weren't loaded stay unloaded.
+        """
+        self.tickers = sorted(portfolio.positions)
+        type_codes = {name: code for code, name in enumerate(TRANSACTION_TYPES)}
+        dates, codes, types, shares, prices, indexes = [], [], [], [], [], []
+        for code, ticker in enumerate(self.tickers):
+            records = portfolio.positions[ticker].ledger_records()
+            position_dates = np.array([r['date'] for r in records], dtype='datetime64[D]')
+            # Index of each record in the position's date-sorted transactions list
+            position_index = np.empty(len(records), dtype=np.int64)
+            position_index[np.argsort(position_dates, kind='stable')] = np.arange(len(records))
+
+            dates.append(position_dates)
+            indexes.append(position_index)
+            types.extend(type_codes.get(r['type'], 2) for r in records)
+            shares.extend(r['shares'] for r in records)
+            prices.extend(r['price'] for r in records)
+            codes.append(np.full(len(records), code, dtype=np.int32))
+
+        self._dates = np.concatenate(dates) if dates else np.empty(0, dtype='datetime64[D]')
+        self._ticker_codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+        self._position_index = np.concatenate(indexes) if indexes else np.empty(0, dtype=np.int64)
+        self._types = np.array(types, dtype=np.int8)
+        self._shares = np.array(shares, dtype=float)
+        self._prices = np.array(prices, dtype=float)
+        self._totals = self._shares * self._prices
+        self._date_order = np.argsort(self._dates, kind='stable')
+        self._apply_filters()
+
+    def date_range(self):
+        """(first, last) transaction date, or None for an empty ledger"""
+        if not len(self._dates):
+            return None
+        return self._dates.min().astype(date), self._dates.max().astype(date)
+
+    def set_filters(self, ticker=None, search_text="", transaction_type=None, start_date=None, end_date=None):
+        """Show only matching rows; None (or "") disables a filter"""
+        self._ticker_filter = ticker
+        self._search_text = search_text.strip()
+        self._type_filter = transaction_type
+        self._start_date = start_date
+        self._end_date = end_date
+        self._apply_filters()
+
+    def _apply_filters(self):
+        mask = np.ones(len(self._dates), dtype=bool)
+        if self._ticker_filter or self._search_text:
+            codes = [code for code, ticker in enumerate(self.tickers)
+                     if (not self._ticker_filter or ticker == self._ticker_filter)
+                     and ticker_matches(ticker, self._search_text)]
+            mask &= np.isin(self._ticker_codes, codes)
+        if self._type_filter:
+            mask &= self._types == TRANSACTION_TYPES.index(self._type_filter)
+        if self._start_date:
+            mask &= self._dates >= np.datetime64(self._start_date, 'D')
+        if self._end_date:
+            mask &= self._dates <= np.datetime64(self._end_date, 'D')
+        self._mask = mask
+        self._matching = np.flatnonzero(mask)
+        self._apply_sort()
+
+    def totals(self):
+        """Share and cash totals per transaction type over the filtered rows"""
+        totals = {'count': len(self._matching)}
+        for code, name in enumerate(TRANSACTION_TYPES):
+            selected = self._mask & (self._types == code)
+            totals[name] = {
+                'count': int(np.count_nonzero(selected)),
+                'shares': float(self._shares[selected].sum()),
+                'amount': float(self._totals[selected].sum()),
+            }
+        return totals
+
+    def _sort_key(self, column):
+        return {
+            DATE_COLUMN: self._dates,
+            TICKER_COLUMN: self._ticker_codes,  # Codes follow alphabetical order
+            TYPE_COLUMN: self._types,
+            SHARES_COLUMN: self._shares,
+            PRICE_COLUMN: self._prices,
+            TOTAL_COLUMN: self._totals,
+        }[column]
+
+    def _apply_sort(self):
+        if self._sort_column == DATE_COLUMN:
+            # The date order is computed once at load; filtering just picks from it
+            visible = self._date_order[self._mask[self._date_order]]
+        else:
+            keys = self._sort_key(self._sort_column)[self._matching]
+            visible = self._matching[np.argsort(keys, kind='stable')]
+        if self._sort_order == Qt.DescendingOrder:
+            visible = visible[::-1]
+        self.beginResetModel()
+        self._visible = visible
+        self._fetched = min(PAGE_SIZE, len(visible))
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetched < len(self._visible)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(PAGE_SIZE, len(self._visible) - self._fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._fetched, self._fetched + count - 1)
+        self._fetched += count
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._apply_sort()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(LEDGER_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return LEDGER_COLUMNS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        row = self._visible[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == DATE_COLUMN:
+                return str(self._dates[row])
+            if column == TICKER_COLUMN:
+                return self.tickers[self._ticker_codes[row]]
+            if column == TYPE_COLUMN:
+                return TRANSACTION_TYPES[self._types[row]]
+            if column == SHARES_COLUMN:
+                return f"{self._shares[row]:.3f}"
+            if column == PRICE_COLUMN:
+                return f"${self._prices[row]:.2f}"
+            return f"${self._totals[row]:.2f}"
+        if role == Qt.TextAlignmentRole:
+            if column <= TYPE_COLUMN:
+                return Qt.AlignCenter
+            return Qt.AlignRight | Qt.AlignVCenter
+        if role == Qt.ForegroundRole and column == TYPE_COLUMN:
+            return TYPE_COLORS[self._types[row]]
+        return QVariant()
+
+    def transaction_ref(self, view_row):
+        """(index inside the position, ticker) of a displayed row"""
+        row = self._visible[view_row]
+        return int(self._position_index[row]), self.tickers[self._ticker_codes[row]]
@@ -18,6 +18,7 @@ import sys
 import os
 from reit_portfolio_app import PortfolioApp
 from theme import Theme
+from painting_cache import theme_key
 from PyQt5.QtWidgets import QApplication, QSplashScreen, QProgressBar, QVBoxLayout, QLabel, QWidget
 from PyQt5.QtCore import Qt, QTimer, QSize, QRect, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QPixmap, QFont, QIcon, QPainter, QColor, QLinearGradient, QPen, QPainterPath
@@ -65,6 +66,10 @@ class CustomSplashScreen(QSplashScreen):
         # Set the status message
         self.message = "Starting application..."
         
+        # Static layers (background, title, chart icon), drawn once per size/theme
+        self.background = None
+        self.background_key = None
+        
     def showEvent(self, event):
         """Start animations when splash is shown"""
         super().showEvent(event)
@@ -79,8 +84,15 @@ class CustomSplashScreen(QSplashScreen):
         self.message = message
         self.repaint()
         
-    def drawContents(self, painter):
-        """Draw custom splash screen content"""
+    def background_pixmap(self):
+        """Everything that doesn't change while the splash is shown, rendered once"""
+        key = (self.size(), theme_key())
+        if self.background is not None and self.background_key == key:
+            return self.background
+        
+        self.background = QPixmap(self.size())
+        painter = QPainter(self.background)
+        
         # Create a gradient background
         gradient = QLinearGradient(0, 0, 0, self.height())
         gradient.setColorAt(0, QColor(Theme.PRIMARY))
@@ -124,6 +136,18 @@ class CustomSplashScreen(QSplashScreen):
             bar_rect = QRect(x, y, bar_width, height)
             painter.fillRect(bar_rect, QColor(Theme.ACCENT))
         
+        # Draw a subtle border
+        painter.setPen(QPen(QColor(255, 255, 255, 40), 1))
+        painter.drawRect(0, 0, self.width() - 1, self.height() - 1)
+        painter.end()
+        
+        self.background_key = key
+        return self.background
+        
+    def drawContents(self, painter):
+        """Draw custom splash screen content"""
+        painter.drawPixmap(0, 0, self.background_pixmap())
+        
         # Draw status message at bottom
         status_font = QFont("Segoe UI", 10)
         painter.setFont(status_font)
@@ -139,10 +163,6 @@ class CustomSplashScreen(QSplashScreen):
         progress_width = int((self.progress_bar.value() / 100) * (self.width() - 100))
         progress_fill_rect = QRect(50, self.height() - 30, progress_width, 4)
         painter.fillRect(progress_fill_rect, QColor(Theme.ACCENT))
-        
-        # Draw a subtle border
-        painter.setPen(QPen(QColor(255, 255, 255, 40), 1))
-        painter.drawRect(0, 0, self.width() - 1, self.height() - 1)
 
 
 def main():
@@ -160,20 +180,14 @@ def main():
     # Process events to display splash screen
     app.processEvents()
     
-    # Create main application window
+    # Create main application window; it renders from the saved prices and
+    # starts its own background refresh once the event loop is running
+    splash.setMessage("Loading portfolio data...")
     main_window = PortfolioApp()
     
-    # Update splash message after a delay
-    QTimer.singleShot(1000, lambda: splash.setMessage("Loading portfolio data..."))
-    QTimer.singleShot(2000, lambda: splash.setMessage("Setting up interface..."))
-    QTimer.singleShot(2500, lambda: splash.setMessage("Almost there..."))
-    
-    # Hide splash and show main window
-    QTimer.singleShot(3000, lambda: splash.finish(main_window))
-    QTimer.singleShot(3000, main_window.show)
-    
-    # Force a data update after the window is shown
-    QTimer.singleShot(4000, main_window.update_portfolio_data)
+    # Hide splash as soon as the main window is ready
+    main_window.show()
+    splash.finish(main_window)
     
     # Start the application event loop
     sys.exit(app.exec_())
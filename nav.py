@@ -1,19 +1,130 @@
-import os
 import sys
-import json
 from datetime import datetime
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
-                             QPushButton, QTableWidget, QTableWidgetItem, QHeaderView, 
+                             QPushButton, QTableView, QHeaderView, QStyledItemDelegate,
                              QMessageBox, QProgressBar, QFrame, QFormLayout, QDateEdit,
-                             QDoubleSpinBox)
-from PyQt5.QtCore import Qt, QDate, QLocale
+                             QDoubleSpinBox, QAbstractItemView)
+from PyQt5.QtCore import (Qt, QDate, QLocale, pyqtSignal, QAbstractTableModel, QModelIndex,
+                          QSortFilterProxyModel, QVariant)
 from PyQt5.QtGui import QFont, QColor
 from theme import Theme
 
-# Constante para o arquivo de portfólio
-PORTFOLIO_FILE = "reit_portfolio.json"
+NAV_COLUMNS = ["Ticker", "Current Price ($)", "Consensus NAV ($)", "Premium/Discount"]
+TICKER_COLUMN, PRICE_COLUMN, NAV_COLUMN, PREMIUM_COLUMN = range(len(NAV_COLUMNS))
+
+TICKER_FONT = QFont("Segoe UI", 9, QFont.Bold)
+DISCOUNT_COLOR = QColor(Theme.SUCCESS)
+PREMIUM_COLOR = QColor(Theme.DANGER)
+
+
+def premium_discount(current_price, nav_value):
+    """Premium (+) or discount (-) to NAV in percent; 0.0 when there is no NAV"""
+    if nav_value <= 0:
+        return 0.0
+    return ((current_price / nav_value) - 1) * 100
+
+
+class NAVTableModel(QAbstractTableModel):
+    """Ticker, price, editable Consensus NAV and premium/discount of each holding"""
+    
+    def __init__(self, nav_data, parent=None):
+        super().__init__(parent)
+        self.nav_data = nav_data  # Shared with the dialog: edits land here directly
+        self._rows = []  # [ticker, price, nav_value, premium_discount]
+    
+    def load(self, portfolio):
+        self.beginResetModel()
+        self._rows = []
+        for ticker, position in portfolio.positions.items():
+            # Skip positions with no shares
+            if position.calculate_metrics()['shares'] <= 0:
+                continue
+            nav_value = self.nav_data.get(ticker, 0.0)
+            self._rows.append([ticker, position.current_price, nav_value,
+                               premium_discount(position.current_price, nav_value)])
+        self.endResetModel()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(NAV_COLUMNS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return NAV_COLUMNS[section]
+        return QVariant()
+    
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == NAV_COLUMN:
+            flags |= Qt.ItemIsEditable
+        return flags
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        ticker, price, nav_value, premium = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == TICKER_COLUMN:
+                return ticker
+            if column == PRICE_COLUMN:
+                return f"${price:.2f}"
+            if column == NAV_COLUMN:
+                return f"$ {nav_value:.2f}"
+            if nav_value <= 0:
+                return "N/A"
+            # Add + sign for positive premium
+            return f"+{premium:.2f}%" if premium > 0 else f"{premium:.2f}%"
+        if role in (Qt.UserRole, Qt.EditRole):
+            return self._rows[index.row()][column]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.FontRole and column == TICKER_COLUMN:
+            return TICKER_FONT
+        if role == Qt.ForegroundRole and column == PREMIUM_COLUMN and nav_value > 0:
+            # Desconto (negativo) em verde, prêmio em vermelho
+            return DISCOUNT_COLOR if premium < 0 else PREMIUM_COLOR
+        return QVariant()
+    
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or index.column() != NAV_COLUMN:
+            return False
+        row = self._rows[index.row()]
+        row[NAV_COLUMN] = float(value)
+        # Only the edited ticker's premium/discount is recomputed
+        row[PREMIUM_COLUMN] = premium_discount(row[PRICE_COLUMN], row[NAV_COLUMN])
+        self.nav_data[row[TICKER_COLUMN]] = row[NAV_COLUMN]
+        self.dataChanged.emit(index, self.index(index.row(), PREMIUM_COLUMN))
+        return True
+
+
+class NAVSpinBoxDelegate(QStyledItemDelegate):
+    """Edits Consensus NAV values with a spin box"""
+    
+    def createEditor(self, parent, option, index):
+        nav_editor = QDoubleSpinBox(parent)
+        nav_editor.setMinimum(0.0)
+        nav_editor.setMaximum(2000.0)
+        nav_editor.setPrefix("$ ")
+        nav_editor.setDecimals(2)
+        nav_editor.setSingleStep(0.5)
+        nav_editor.setLocale(QLocale('en_US'))
+        nav_editor.setAlignment(Qt.AlignCenter)
+        return nav_editor
+    
+    def setEditorData(self, editor, index):
+        editor.setValue(index.data(Qt.EditRole))
+    
+    def setModelData(self, editor, model, index):
+        editor.interpretText()
+        model.setData(index, editor.value(), Qt.EditRole)
+
 
 class NAVDialog(QDialog):
+    nav_saved = pyqtSignal()  # NAV values were committed to the portfolio
+    
     def __init__(self, parent=None, portfolio=None):
         super().__init__(parent)
         self.portfolio = portfolio
@@ -81,12 +192,20 @@ class NAVDialog(QDialog):
         instruction_label.setStyleSheet(f"color: {Theme.TEXT_SECONDARY};")
         main_layout.addWidget(instruction_label)
         
-        # Table for NAV input
-        self.nav_table = QTableWidget()
-        self.nav_table.setColumnCount(4)
-        self.nav_table.setHorizontalHeaderLabels([
-            "Ticker", "Current Price ($)", "Consensus NAV ($)", "Premium/Discount"
-        ])
+        # Table for NAV input: model + proxy for sorting + spin box delegate for editing
+        self.nav_model = NAVTableModel(self.nav_data, self)
+        self.nav_proxy = QSortFilterProxyModel(self)
+        self.nav_proxy.setSourceModel(self.nav_model)
+        self.nav_proxy.setSortRole(Qt.UserRole)
+        # Rows stay put while a value is edited; they move on the next header click
+        self.nav_proxy.setDynamicSortFilter(False)
+        
+        self.nav_table = QTableView()
+        self.nav_table.setModel(self.nav_proxy)
+        self.nav_table.setItemDelegateForColumn(NAV_COLUMN, NAVSpinBoxDelegate(self.nav_table))
+        self.nav_table.setEditTriggers(QAbstractItemView.CurrentChanged | QAbstractItemView.DoubleClicked |
+                                       QAbstractItemView.SelectedClicked | QAbstractItemView.EditKeyPressed |
+                                       QAbstractItemView.AnyKeyPressed)
         
         # Table styling
         self.nav_table.setShowGrid(True)
@@ -94,14 +213,14 @@ class NAVDialog(QDialog):
         self.nav_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.nav_table.verticalHeader().setVisible(False)
         self.nav_table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: white;
                 alternate-background-color: #F5F7FA;
                 border: 1px solid {Theme.BORDER};
                 border-radius: 6px;
                 gridline-color: #E5E9F0;
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
             }}
             QHeaderView::section {{
@@ -113,17 +232,15 @@ class NAVDialog(QDialog):
             }}
         """)
         
-        # Habilitar ordenação da tabela
-        self.nav_table.setSortingEnabled(True)
+        # Populate table with portfolio data
+        self.update_nav_table()
         
-        # Conectar o evento de clique no cabeçalho
-        self.nav_table.horizontalHeader().sectionClicked.connect(self.header_clicked)
+        # Ordenação pelo cabeçalho; começa por Premium/Discount (do mais negativo para o mais positivo)
+        self.nav_table.horizontalHeader().setSortIndicator(PREMIUM_COLUMN, Qt.AscendingOrder)
+        self.nav_table.setSortingEnabled(True)
 		
         main_layout.addWidget(self.nav_table)
         
-        # Populate table with portfolio data
-        self.update_nav_table()
-        
         # Bottom buttons
         button_layout = QHBoxLayout()
         
@@ -170,409 +287,43 @@ class NAVDialog(QDialog):
         main_layout.addLayout(button_layout)
     
     def load_nav_data(self):
-        """Load existing NAV data from the portfolio file"""
-        try:
-            if os.path.exists(PORTFOLIO_FILE):
-                with open(PORTFOLIO_FILE, 'r') as f:
-                    data = json.load(f)
-                    
-                # Extract NAV data and report date if they exist
-                if 'nav_data' in data:
-                    self.nav_data = data['nav_data']
-                if 'nav_report_date' in data:
-                    self.report_date = data['nav_report_date']
-                    
-                print(f"Loaded NAV data for {len(self.nav_data)} tickers")
-        except Exception as e:
-            print(f"Error loading NAV data: {str(e)}")
+        """Take a working copy of the NAV data held by the portfolio"""
+        if not self.portfolio or not hasattr(self.portfolio, 'nav'):
+            return
+            
+        self.nav_data = dict(self.portfolio.nav.nav_data)
+        if self.portfolio.nav.report_date:
+            self.report_date = self.portfolio.nav.report_date
+            
+        print(f"Loaded NAV data for {len(self.nav_data)} tickers")
     
     def update_nav_table(self):
         """Populate table with tickers from portfolio"""
         if not self.portfolio:
             return
-                
-        # Clear table
-        self.nav_table.setRowCount(0)
-        
-        # Coletar dados para ordenação
-        all_data = []
-        
-        # Coletar dados do portfolio
-        for ticker, position in self.portfolio.positions.items():
-            # Skip positions with no shares
-            metrics = position.calculate_metrics()
-            if metrics['shares'] <= 0:
-                continue
-                    
-            # Current Price
-            current_price = position.current_price
-                
-            # Consensus NAV (get existing value or default to 0.0)
-            nav_value = self.nav_data.get(ticker, 0.0)
-                
-            # Calculate Premium/Discount
-            premium_discount = 0.0
-            if nav_value > 0:
-                # Fórmula: ((current_price / nav_value) - 1) * 100
-                premium_discount = ((current_price / nav_value) - 1) * 100
-                    
-            all_data.append({
-                'ticker': ticker,
-                'price': current_price,
-                'nav_value': nav_value,
-                'premium_discount': premium_discount
-            })
-        
-        # Ordenar por Premium/Discount (do valor mais negativo para o mais positivo)
-        all_data.sort(key=lambda x: x['premium_discount'])
-        
-        # Preencher a tabela com dados ordenados
-        for idx, item in enumerate(all_data):
-            ticker = item['ticker']
-            current_price = item['price']
-            nav_value = item['nav_value']
-            premium_discount = item['premium_discount']
-            
-            # Inserir nova linha
-            row = self.nav_table.rowCount()
-            self.nav_table.insertRow(row)
-            
-            # Ticker (non-editable)
-            ticker_item = QTableWidgetItem(ticker)
-            ticker_item.setTextAlignment(Qt.AlignCenter)
-            ticker_item.setFont(QFont("Segoe UI", 9, QFont.Bold))
-            ticker_item.setFlags(ticker_item.flags() & ~Qt.ItemIsEditable)
-            self.nav_table.setItem(row, 0, ticker_item)
-            
-            # Current Price (non-editable)
-            price_item = QTableWidgetItem(f"${current_price:.2f}")
-            price_item.setTextAlignment(Qt.AlignCenter)
-            price_item.setFlags(price_item.flags() & ~Qt.ItemIsEditable)
-            self.nav_table.setItem(row, 1, price_item)
-            
-            # Consensus NAV (editable)
-            nav_editor = QDoubleSpinBox()
-            nav_editor.setMinimum(0.0)
-            nav_editor.setMaximum(2000.0)
-            nav_editor.setValue(nav_value)
-            nav_editor.setPrefix("$ ")
-            nav_editor.setDecimals(2)
-            nav_editor.setSingleStep(0.5)
-            nav_editor.setLocale(QLocale('en_US'))
-            nav_editor.setStyleSheet("""
-                border: none;
-                background-color: transparent;
-            """)
-            nav_editor.valueChanged.connect(lambda value, t=ticker: self.nav_value_changed(t, value))
-            self.nav_table.setCellWidget(row, 2, nav_editor)
-            
-            # Premium/Discount (calculated, non-editable)
-            if nav_value > 0:
-                premium_str = f"{premium_discount:.2f}%"
-                
-                # Add + sign for positive premium
-                if premium_discount > 0:
-                    premium_str = f"+{premium_str}"
-                    
-                premium_item = QTableWidgetItem(premium_str)
-                premium_item.setTextAlignment(Qt.AlignCenter)
-                
-                # Color based on premium/discount
-                if premium_discount < 0:  # Trading at discount (valor negativo com a nova fórmula)
-                    premium_item.setForeground(QColor(Theme.SUCCESS))
-                else:  # Trading at premium (valor positivo com a nova fórmula)
-                    premium_item.setForeground(QColor(Theme.DANGER))
-            else:
-                premium_item = QTableWidgetItem("N/A")
-                premium_item.setTextAlignment(Qt.AlignCenter)
-                
-            premium_item.setFlags(premium_item.flags() & ~Qt.ItemIsEditable)
-            self.nav_table.setItem(row, 3, premium_item)
-            
-            # Apply alternating row colors
-            bg_color = QColor("#FFFFFF") if row % 2 == 0 else QColor("#F5F7FA")
-            for col in range(self.nav_table.columnCount()):
-                item = self.nav_table.item(row, col)
-                if item:
-                    item.setBackground(bg_color)
-    
-    def nav_value_changed(self, ticker, value):
-        """Handle changes to NAV values"""
-        self.nav_data[ticker] = value
-        self.update_premium_discount(ticker)
-    
-    def update_premium_discount(self, ticker):
-        """Update the Premium/Discount calculation for a specific ticker"""
-        # Find the row for this ticker
-        for row in range(self.nav_table.rowCount()):
-            ticker_item = self.nav_table.item(row, 0)
-            if ticker_item and ticker_item.text() == ticker:
-                # Get current price
-                price_text = self.nav_table.item(row, 1).text()
-                current_price = float(price_text.replace('$', ''))
-                
-                # Get NAV value
-                nav_editor = self.nav_table.cellWidget(row, 2)
-                nav_value = nav_editor.value()
-                
-                # Calculate Premium/Discount
-                if nav_value > 0:
-                    premium_discount = ((current_price / nav_value) - 1) * 100
-                    premium_str = f"{premium_discount:.2f}%"
-                    
-                    # Add + sign for premium (discount)
-                    if premium_discount > 0:
-                        premium_str = f"+{premium_str}"
-                        
-                    premium_item = QTableWidgetItem(premium_str)
-                    premium_item.setTextAlignment(Qt.AlignCenter)
-                    
-                    # Color based on premium/discount
-                    if premium_discount < 0:  # Trading at discount (positive value)
-                        premium_item.setForeground(QColor(Theme.SUCCESS))
-                    else:  # Trading at premium (negative value)
-                        premium_item.setForeground(QColor(Theme.DANGER))
-                else:
-                    premium_item = QTableWidgetItem("N/A")
-                    premium_item.setTextAlignment(Qt.AlignCenter)
-                    
-                premium_item.setFlags(premium_item.flags() & ~Qt.ItemIsEditable)  # Make non-editable
-                self.nav_table.setItem(row, 3, premium_item)
-                break
-    
-    def header_clicked(self, section):
-        """Handle clicks on table header sections"""
-        # Verificar se clicou na coluna Premium/Discount (índice 3)
-        if section == 3:
-            print("Clicou no cabeçalho Premium/Discount - iniciando nova ordenação")
-            
-            # Coletar dados do portfolio e valores NAV atuais
-            all_data = []
-            
-            # Primeiro, salvar os valores NAV atuais da tabela
-            for row in range(self.nav_table.rowCount()):
-                ticker_item = self.nav_table.item(row, 0)
-                if ticker_item:
-                    ticker = ticker_item.text()
-                    nav_widget = self.nav_table.cellWidget(row, 2)
-                    if nav_widget:
-                        nav_value = nav_widget.value()
-                        self.nav_data[ticker] = nav_value
-            
-            # Agora, gerar a tabela do zero usando os dados do portfolio
-            for ticker, position in self.portfolio.positions.items():
-                # Skip positions with no shares
-                metrics = position.calculate_metrics()
-                if metrics['shares'] <= 0:
-                    continue
-                    
-                # Current Price
-                current_price = position.current_price
-                
-                # Consensus NAV (get existing value or default to 0.0)
-                nav_value = self.nav_data.get(ticker, 0.0)
-                
-                # Calculate Premium/Discount - FÓRMULA ALTERADA AQUI
-                premium_discount = 0.0
-                if nav_value > 0:
-                    # Nova fórmula: ((current_price / nav_value) - 1) * 100
-                    premium_discount = ((current_price / nav_value) - 1) * 100
-                    
-                all_data.append({
-                    'ticker': ticker,
-                    'price': current_price,
-                    'nav_value': nav_value,
-                    'premium_discount': premium_discount
-                })
-            
-            # Ordenar por Premium/Discount (do valor mais negativo para o mais positivo)
-            all_data.sort(key=lambda x: x['premium_discount'])
-        
-            
-            # Limpar tabela e desativar ordenação
-            self.nav_table.setRowCount(0)
-            self.nav_table.setSortingEnabled(False)
-            
-            # Preencher a tabela com dados ordenados
-            for idx, item in enumerate(all_data):
-                ticker = item['ticker']
-                current_price = item['price']
-                nav_value = item['nav_value']
-                premium_discount = item['premium_discount']  # Valor original mantido
-                
-                # Inserir nova linha
-                row = self.nav_table.rowCount()
-                self.nav_table.insertRow(row)
-                
-                # Ticker (non-editable)
-                ticker_item = QTableWidgetItem(ticker)
-                ticker_item.setTextAlignment(Qt.AlignCenter)
-                ticker_item.setFont(QFont("Segoe UI", 9, QFont.Bold))
-                ticker_item.setFlags(ticker_item.flags() & ~Qt.ItemIsEditable)
-                self.nav_table.setItem(row, 0, ticker_item)
-                
-                # Current Price (non-editable)
-                price_item = QTableWidgetItem(f"${current_price:.2f}")
-                price_item.setTextAlignment(Qt.AlignCenter)
-                price_item.setFlags(price_item.flags() & ~Qt.ItemIsEditable)
-                self.nav_table.setItem(row, 1, price_item)
-                
-                # Consensus NAV (editable)
-                nav_editor = QDoubleSpinBox()
-                nav_editor.setMinimum(0.0)
-                nav_editor.setMaximum(2000.0)
-                nav_editor.setValue(nav_value)
-                nav_editor.setPrefix("$ ")
-                nav_editor.setDecimals(2)
-                nav_editor.setSingleStep(0.5)
-                nav_editor.setLocale(QLocale('en_US'))
-                nav_editor.setStyleSheet("""
-                    border: none;
-                    background-color: transparent;
-                """)
-                nav_editor.valueChanged.connect(lambda value, t=ticker: self.nav_value_changed(t, value))
-                self.nav_table.setCellWidget(row, 2, nav_editor)
-                
-                # Premium/Discount (calculated, non-editable)
-                if nav_value > 0:
-                    premium_str = f"{premium_discount:.2f}%"
-                    
-                    # Add + sign for positive premium
-                    if premium_discount > 0:
-                        premium_str = f"+{premium_str}"
-                        
-                    premium_item = QTableWidgetItem(premium_str)
-                    premium_item.setTextAlignment(Qt.AlignCenter)
-                    
-                    # Color based on premium/discount - LÓGICA ALTERADA AQUI
-                    if premium_discount < 0:  # Trading at discount (valor negativo com a nova fórmula)
-                        premium_item.setForeground(QColor(Theme.SUCCESS))
-                    else:  # Trading at premium (valor positivo com a nova fórmula)
-                        premium_item.setForeground(QColor(Theme.DANGER))
-                else:
-                    premium_item = QTableWidgetItem("N/A")
-                    premium_item.setTextAlignment(Qt.AlignCenter)
-                    
-                premium_item.setFlags(premium_item.flags() & ~Qt.ItemIsEditable)
-                self.nav_table.setItem(row, 3, premium_item)
-                
-                # Apply alternating row colors
-                bg_color = QColor("#FFFFFF") if row % 2 == 0 else QColor("#F5F7FA")
-                for col in range(self.nav_table.columnCount()):
-                    item = self.nav_table.item(row, col)
-                    if item:
-                        item.setBackground(bg_color)
-            
-            # Manter a ordenação desativada após a recriação
-            self.nav_table.setSortingEnabled(False)
-        
-        print(f"Ordenação concluída - {len(all_data)} linhas")
-    
-    def reorder_table(self, sorted_data):
-        """Reorder the table based on the sorted data"""
-        # Criar uma tabela temporária com os mesmos dados, mas na ordem desejada
-        tmp_table = []
-        for row_idx in range(self.nav_table.rowCount()):
-            row_data = {}
-            
-            # Item 0: Ticker
-            ticker_item = self.nav_table.item(row_idx, 0)
-            row_data['ticker'] = ticker_item.clone() if ticker_item else None
-            
-            # Item 1: Price
-            price_item = self.nav_table.item(row_idx, 1)
-            row_data['price'] = price_item.clone() if price_item else None
-            
-            # Item 2: NAV (QDoubleSpinBox)
-            spinbox = self.nav_table.cellWidget(row_idx, 2)
-            row_data['nav_value'] = spinbox.value() if spinbox else 0.0
-            
-            # Item 3: Premium/Discount
-            premium_item = self.nav_table.item(row_idx, 3)
-            row_data['premium'] = premium_item.clone() if premium_item else None
-            
-            # Ticker for saving
-            ticker = ticker_item.text() if ticker_item else ""
-            row_data['ticker_text'] = ticker
-            
-            tmp_table.append(row_data)
-        
-        # Reorganizar com base na ordenação
-        for new_idx, (old_idx, ticker, _) in enumerate(sorted_data):
-            # Item 0: Ticker
-            if tmp_table[old_idx]['ticker']:
-                self.nav_table.setItem(new_idx, 0, tmp_table[old_idx]['ticker'])
-            
-            # Item 1: Price
-            if tmp_table[old_idx]['price']:
-                self.nav_table.setItem(new_idx, 1, tmp_table[old_idx]['price'])
-            
-            # Item 3: Premium
-            if tmp_table[old_idx]['premium']:
-                self.nav_table.setItem(new_idx, 3, tmp_table[old_idx]['premium'])
-            
-            # Item 2: NAV (QDoubleSpinBox)
-            nav_value = tmp_table[old_idx]['nav_value']
-            
-            # Recriar o spinbox
-            nav_editor = QDoubleSpinBox()
-            nav_editor.setMinimum(0.0)
-            nav_editor.setMaximum(2000.0)
-            nav_editor.setValue(nav_value)
-            nav_editor.setPrefix("$ ")
-            nav_editor.setDecimals(2)
-            nav_editor.setSingleStep(0.5)
-            nav_editor.setLocale(QLocale('en_US'))
-            nav_editor.setStyleSheet("""
-                border: none;
-                background-color: transparent;
-            """)
-            nav_editor.valueChanged.connect(lambda value, t=ticker: self.nav_value_changed(t, value))
-            self.nav_table.setCellWidget(new_idx, 2, nav_editor)
-            
-            # Atualizar o nav_data para este ticker
-            ticker_text = tmp_table[old_idx]['ticker_text']
-            if ticker_text:
-                self.nav_data[ticker_text] = nav_value
-            
-        # Aplicar cores alternadas de linha
-        for row in range(self.nav_table.rowCount()):
-            bg_color = QColor("#FFFFFF") if row % 2 == 0 else QColor("#F5F7FA")
-            for col in range(self.nav_table.columnCount()):
-                item = self.nav_table.item(row, col)
-                if item:
-                    item.setBackground(bg_color)    
+        self.nav_model.load(self.portfolio)
 	    
     def date_changed(self, qdate):
         """Handle changes to the report date"""
         self.report_date = qdate.toString("dd/MM/yyyy")
     
     def save_nav_data(self):
-        """Save NAV data to portfolio file"""
+        """Commit the edited NAV data to the portfolio and ask the owner to persist it"""
         try:
+            # Commit a value still being typed in the spin box
+            self.nav_table.setFocus()
             print("Salvando NAV data...")
             print(f"NAV data: {self.nav_data}")
-        
-            # Load existing portfolio data
-            if os.path.exists(PORTFOLIO_FILE):
-                print(f"Arquivo encontrado: {PORTFOLIO_FILE}")
-                with open(PORTFOLIO_FILE, 'r') as f:
-                    data = json.load(f)
             
-                # Add or update NAV data
-                data['nav_data'] = self.nav_data
-                data['nav_report_date'] = self.report_date
+            self.portfolio.nav.update(self.nav_data, self.report_date)
+            self.portfolio.update_consensus_nav(self.nav_data)
             
-                # Save back to file
-                with open(PORTFOLIO_FILE, 'w') as f:
-                    json.dump(data, f, indent=2)
+            # Persisting is done by the main window through the shared storage
+            self.nav_saved.emit()
             
-                print("Dados salvos com sucesso!")
-                self.accept()  # Aceitar o diálogo
-                QMessageBox.information(self, "Success", "NAV data saved successfully!")
-            else:
-                print(f"Arquivo não encontrado: {PORTFOLIO_FILE}")
-                QMessageBox.warning(self, "File Not Found", "Portfolio file not found. Please save your portfolio first.")
+            print("Dados salvos com sucesso!")
+            self.accept()  # Aceitar o diálogo
+            QMessageBox.information(self, "Success", "NAV data saved successfully!")
         
         except Exception as e:
             print(f"Erro ao salvar: {str(e)}")
@@ -583,6 +334,7 @@ class NAVDialog(QDialog):
 
 if __name__ == "__main__":
     from PyQt5.QtWidgets import QApplication
+    from storage import NAVRepository
     
     # Dummy portfolio for testing
     class Position:
@@ -597,9 +349,13 @@ if __name__ == "__main__":
     class Portfolio:
         def __init__(self):
             self.positions = {}
+            self.nav = NAVRepository()
             
         def add_position(self, position):
             self.positions[position.ticker] = position
+            
+        def update_consensus_nav(self, nav_data):
+            pass
     
     app = QApplication(sys.argv)
     
@@ -0,0 +1,115 @@
+from PyQt5.QtCore import Qt, QPoint, QRect, QRectF
+from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QGraphicsEffect, QGraphicsScene, QGraphicsPixmapItem, QGraphicsBlurEffect
+from theme import Theme
+
+# Blurred shadow tiles, one per corner radius, blur and color. Card sizes never
+# enter the key, so resizing a window doesn't add entries
+_shadow_cache = {}
+
+
+def theme_key():
+    """Theme colors a cached pixmap was drawn with; a change means it must be redrawn"""
+    return (Theme.PRIMARY, Theme.SECONDARY, Theme.ACCENT, Theme.CARD_BG)
+
+
+def shadow_tile(radius, blur_radius, color):
+    """Blurred rounded rectangle small enough to be drawn as a nine-patch.
+
+    The rectangle is just large enough for its corners, blur included, plus
+    one pixel of straight edge in each direction; shadow_corner() is the
+    size of the corner pieces. The blur is computed once and shared by
+    every card, whatever its size.
+    """
+    key = (radius, blur_radius, color.rgba())
+    pixmap = _shadow_cache.get(key)
+    if pixmap is not None:
+        return pixmap
+
+    corner = shadow_corner(radius, blur_radius)
+    side = 2 * corner + 1
+    image = QImage(side, side, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(color)
+    inner = side - 2 * blur_radius
+    painter.drawRoundedRect(QRectF(blur_radius, blur_radius, inner, inner), radius, radius)
+    painter.end()
+
+    # Qt only exposes its blur through graphics effects, so render it once through a scene
+    item = QGraphicsPixmapItem(QPixmap.fromImage(image))
+    blur = QGraphicsBlurEffect()
+    blur.setBlurRadius(blur_radius)
+    item.setGraphicsEffect(blur)
+    scene = QGraphicsScene()
+    scene.addItem(item)
+    rect = QRectF(0, 0, side, side)
+
+    pixmap = QPixmap(image.size())
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    scene.render(painter, rect, rect)
+    painter.end()
+
+    _shadow_cache[key] = pixmap
+    return pixmap
+
+
+def shadow_corner(radius, blur_radius):
+    """Side of a nine-patch corner: the blur outside the card, the rounded corner and the blur inside it"""
+    return radius + 2 * blur_radius
+
+
+def draw_shadow(painter, rect, radius, blur_radius, color):
+    """Draw the shadow of a rounded rect, padded by blur_radius, from its shadow_tile().
+
+    Corners are copied as they are; edges and center are stretched to the
+    size of the card.
+    """
+    tile = shadow_tile(radius, blur_radius, color)
+    target = rect.adjusted(-blur_radius, -blur_radius, blur_radius, blur_radius)
+    corner = shadow_corner(radius, blur_radius)
+    # Cards smaller than two corners get their corners shrunk to fit
+    width = min(corner, target.width() // 2)
+    height = min(corner, target.height() // 2)
+    middle = tile.width() - 2 * corner
+
+    columns = ((target.left(), width, 0, corner),
+               (target.left() + width, target.width() - 2 * width, corner, middle),
+               (target.right() + 1 - width, width, corner + middle, corner))
+    rows = ((target.top(), height, 0, corner),
+            (target.top() + height, target.height() - 2 * height, corner, middle),
+            (target.bottom() + 1 - height, height, corner + middle, corner))
+    for x, w, source_x, source_w in columns:
+        for y, h, source_y, source_h in rows:
+            if w > 0 and h > 0:
+                painter.drawPixmap(QRect(x, y, w, h), tile, QRect(source_x, source_y, source_w, source_h))
+
+
+class CachedShadowEffect(QGraphicsEffect):
+    """Drop shadow for rounded widgets that is not blurred again on every paint.
+
+    QGraphicsDropShadowEffect blurs the widget's pixels each time it is
+    painted. A card's shadow is the same blurred tile whatever its size, so
+    here it is drawn by draw_shadow() and the widget itself is drawn on top
+    unchanged.
+    """
+
+    def __init__(self, parent=None, blur_radius=15, color=QColor(0, 0, 0, 30),
+                 offset=QPoint(0, 4), radius=8):
+        super().__init__(parent)
+        self.blur_radius = blur_radius
+        self.color = QColor(color)
+        self.offset = QPoint(offset)
+        self.radius = radius
+
+    def boundingRectFor(self, rect):
+        shadow = rect.adjusted(-self.blur_radius, -self.blur_radius, self.blur_radius, self.blur_radius)
+        return rect.united(shadow.translated(self.offset))
+
+    def draw(self, painter):
+        rect = self.sourceBoundingRect(Qt.LogicalCoordinates).toRect()
+        draw_shadow(painter, rect.translated(self.offset), self.radius, self.blur_radius, self.color)
+        self.drawSource(painter)
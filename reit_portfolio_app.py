@@ -2,249 +2,31 @@ import sys
 import os
 import json
 from datetime import datetime, timedelta, date
-import requests
-import yfinance as yf
-import pandas as pd
-from bs4 import BeautifulSoup
-import qrcode
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTableWidget, QTableWidgetItem, 
                             QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QLabel, 
                             QLineEdit, QDialog, QDateEdit, QDoubleSpinBox, QSpinBox, 
                             QComboBox, QHeaderView, QMessageBox, QFrame, QToolBar, 
                             QAction, QMenu, QStatusBar, QFileDialog, QGraphicsDropShadowEffect,
-                            QSizePolicy, QMenuBar)
+                            QSizePolicy, QMenuBar, QInputDialog, QTableView)
 from PyQt5.QtCore import (Qt, QDate, pyqtSignal, QThread, QUrl, QTimer, QSize, QRect, 
                          QPoint, QPropertyAnimation, QEasingCurve, QLocale)
 from PyQt5.QtGui import QIcon, QPixmap, QFont, QColor, QPalette, QDesktopServices, QLinearGradient, QPainter, QPen, QPainterPath
 from PyQt5.QtGui import QIcon, QPixmap, QFont, QColor, QPalette, QDesktopServices, QLinearGradient, QPainter, QPen, QPainterPath
 from theme import Theme
-from split_dialog import SplitDialog
-from nav import NAVDialog
+from storage import PortfolioStorage, NAVRepository
+from schema import SCHEMA_VERSION, upgrade_position
+from holdings_model import HoldingsTableModel, HoldingsFilterProxy, HoldingsColorDelegate, VALUE_COLUMN
+from update_coalescer import UpdateCoalescer
+from aggregates import PortfolioAggregates
+from workspace import Workspace, WORKSPACE_FILE, CONSOLIDATED_VIEW
+from painting_cache import CachedShadowEffect
 
 # Constants
 PORTFOLIO_FILE = "reit_portfolio.json"
-
-class SplitDialog(QDialog):
-    def __init__(self, parent=None, ticker=""):
-        super().__init__(parent)
-        self.setWindowTitle("Stock Split")
-        self.setMinimumWidth(400)
-        self.setStyleSheet(f"""
-            QDialog {{
-                background-color: {Theme.BACKGROUND};
-            }}
-            QLabel {{
-                font-size: 13px;
-                color: {Theme.TEXT_PRIMARY};
-            }}
-            QLineEdit, QComboBox, QSpinBox, QDoubleSpinBox {{
-                border: 1px solid {Theme.BORDER};
-                border-radius: 4px;
-                padding: 8px;
-                background-color: white;
-                min-height: 20px;
-            }}
-            QLineEdit:focus, QComboBox:focus, QSpinBox:focus, QDoubleSpinBox:focus {{
-                border: 1px solid {Theme.SECONDARY};
-            }}
-        """)
-        
-        layout = QVBoxLayout(self)
-        layout.setSpacing(15)
-        layout.setContentsMargins(20, 20, 20, 20)
-        
-        # Title
-        title_label = QLabel("Stock Split / Reverse Split")
-        title_label.setStyleSheet("""
-            font-size: 18px;
-            font-weight: bold;
-            margin-bottom: 10px;
-        """)
-        layout.addWidget(title_label)
-        
-        # Form container with white background
-        form_container = QFrame()
-        form_container.setStyleSheet(f"""
-            background-color: {Theme.CARD_BG};
-            border-radius: 8px;
-            padding: 15px;
-        """)
-        form_layout = QVBoxLayout(form_container)
-        form_layout.setSpacing(15)
-        
-        # Explanation label
-        explanation = QLabel(
-            "A stock split changes the number of shares and their price. "
-            "For example, in a 2:1 split, 1 share becomes 2 shares at half the price."
-        )
-        explanation.setWordWrap(True)
-        explanation.setStyleSheet(f"color: {Theme.TEXT_SECONDARY};")
-        form_layout.addWidget(explanation)
-        
-        # Ticker selector
-        ticker_layout = QHBoxLayout()
-        ticker_layout.addWidget(QLabel("Ticker:"))
-        self.ticker_edit = QLineEdit()
-        self.ticker_edit.setText(ticker)
-        self.ticker_edit.setMinimumHeight(36)
-        self.ticker_edit.setPlaceholderText("Enter REIT ticker symbol")
-        ticker_layout.addWidget(self.ticker_edit)
-        form_layout.addLayout(ticker_layout)
-        
-        # Split ratio
-        ratio_layout = QHBoxLayout()
-        ratio_layout.addWidget(QLabel("Split Ratio:"))
-        
-        ratio_container = QHBoxLayout()
-        ratio_container.setSpacing(5)
-        
-        self.new_shares_spin = QSpinBox()
-        self.new_shares_spin.setMinimum(1)
-        self.new_shares_spin.setMaximum(100)
-        self.new_shares_spin.setValue(2)
-        self.new_shares_spin.setMinimumHeight(36)
-        
-        ratio_container.addWidget(self.new_shares_spin)
-        ratio_container.addWidget(QLabel(":"))
-        
-        self.old_shares_spin = QSpinBox()
-        self.old_shares_spin.setMinimum(1)
-        self.old_shares_spin.setMaximum(100)
-        self.old_shares_spin.setValue(1)
-        self.old_shares_spin.setMinimumHeight(36)
-        
-        ratio_container.addWidget(self.old_shares_spin)
-        ratio_layout.addLayout(ratio_container)
-        form_layout.addLayout(ratio_layout)
-        
-        # Add a date selector for the split date
-        date_layout = QHBoxLayout()
-        date_layout.addWidget(QLabel("Split Date:"))
-        self.date_edit = QDateEdit()
-        self.date_edit.setCalendarPopup(True)
-        self.date_edit.setDate(QDate.currentDate())
-        self.date_edit.setMinimumHeight(36)
-        date_layout.addWidget(self.date_edit)
-        form_layout.addLayout(date_layout)
-        
-        # Add form to main layout
-        layout.addWidget(form_container)
-        
-        # Preview section
-        preview_container = QFrame()
-        preview_container.setStyleSheet(f"""
-            background-color: {Theme.CARD_BG};
-            border-radius: 8px;
-            padding: 15px;
-            margin-top: 10px;
-        """)
-        preview_layout = QVBoxLayout(preview_container)
-        
-        preview_title = QLabel("Effect Preview:")
-        preview_title.setStyleSheet("font-weight: bold;")
-        preview_layout.addWidget(preview_title)
-        
-        self.preview_label = QLabel(
-            "2:1 split means: 10 shares at $100 → 20 shares at $50"
-        )
-        self.preview_label.setWordWrap(True)
-        preview_layout.addWidget(self.preview_label)
-        
-        layout.addWidget(preview_container)
-        
-        # Buttons
-        button_layout = QHBoxLayout()
-        button_layout.addStretch()
-        
-        self.cancel_button = QPushButton("Cancel")
-        self.cancel_button.setMinimumWidth(100)
-        self.cancel_button.setMinimumHeight(36)
-        self.cancel_button.clicked.connect(self.reject)
-        self.cancel_button.setStyleSheet(f"""
-            QPushButton {{
-                background-color: #f0f0f0;
-                color: {Theme.TEXT_PRIMARY};
-                border: none;
-                border-radius: 4px;
-                padding: 8px 16px;
-            }}
-            QPushButton:hover {{
-                background-color: #e0e0e0;
-            }}
-        """)
-        button_layout.addWidget(self.cancel_button)
-        
-        self.ok_button = QPushButton("Apply Split")
-        self.ok_button.setMinimumWidth(100)
-        self.ok_button.setMinimumHeight(36)
-        self.ok_button.clicked.connect(self.accept)
-        self.ok_button.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {Theme.PRIMARY};
-                color: white;
-                border: none;
-                border-radius: 4px;
-                padding: 8px 16px;
-                font-weight: bold;
-            }}
-            QPushButton:hover {{
-                background-color: {Theme.SECONDARY};
-            }}
-        """)
-        button_layout.addWidget(self.ok_button)
-        
-        layout.addLayout(button_layout)
-        
-        # Connect signals for previews
-        self.new_shares_spin.valueChanged.connect(self.update_preview)
-        self.old_shares_spin.valueChanged.connect(self.update_preview)
-        
-        # Initial preview update
-        self.update_preview()
-    
-    def update_preview(self):
-        """Update the preview text based on current split ratio"""
-        new_shares = self.new_shares_spin.value()
-        old_shares = self.old_shares_spin.value()
-        
-        # Calculate the price factor
-        price_factor = old_shares / new_shares
-        
-        # Set up example values
-        example_shares = 10
-        example_price = 100
-        
-        # Calculate new values
-        new_example_shares = example_shares * (new_shares / old_shares)
-        new_example_price = example_price * price_factor
-        
-        # Format the preview text
-        if new_shares > old_shares:
-            split_type = "split"
-        elif new_shares < old_shares:
-            split_type = "reverse split"
-        else:
-            split_type = "1:1 ratio (no effect)"
-        
-        preview_text = f"{new_shares}:{old_shares} {split_type} means: "\
-                       f"{example_shares} shares at ${example_price:.2f} → "\
-                       f"{new_example_shares:.2f} shares at ${new_example_price:.2f}"
-        
-        self.preview_label.setText(preview_text)
-    
-    def get_split_info(self):
-        """Return the split information"""
-        ticker = self.ticker_edit.text().strip().upper()
-        new_shares = self.new_shares_spin.value()
-        old_shares = self.old_shares_spin.value()
-        split_date = self.date_edit.date().toPyDate()  # Get as datetime.date
-        
-        return {
-            'ticker': ticker,
-            'new_shares': new_shares,
-            'old_shares': old_shares,
-            'split_date': split_date
-        }
+# Store each position's transactions in its own ledger file and load it on first use
+LAZY_TRANSACTIONS = True
+# Used for the BRL card until (or if) the USD/BRL quote can be fetched
+DEFAULT_USD_BRL_RATE = 5.0
 
 # Custom button style with hover effect
 class StyledButton(QPushButton):
@@ -301,11 +83,8 @@ class ModernCard(QFrame):
         self.setObjectName("modernCard")
         self.setCursor(Qt.PointingHandCursor if clickable else Qt.ArrowCursor)
         
-        # Set up shadow effect
-        shadow = QGraphicsDropShadowEffect(self)
-        shadow.setBlurRadius(15)
-        shadow.setColor(QColor(0, 0, 0, 30))
-        shadow.setOffset(0, 4)
+        # Set up shadow effect (blurred once per card size, not on every repaint)
+        shadow = CachedShadowEffect(self, blur_radius=15, color=QColor(0, 0, 0, 30), offset=QPoint(0, 4))
         self.setGraphicsEffect(shadow)
         
         # Modern styling
@@ -342,7 +121,12 @@ class StockDataFetcher(QThread):
             company_name = ""
             dividend_growth_3y = 0.0
             dividend_growth_5y = 0.0
+            dividend_ledger = []
                     
+            # yfinance/pandas are only imported once a fetch actually runs
+            import yfinance as yf
+            import pandas as pd
+            
             # Use yfinance to get data for the ticker
             stock = yf.Ticker(self.ticker)
             
@@ -399,6 +183,11 @@ class StockDataFetcher(QThread):
                     dividends = dividend_history[dividend_history['Dividends'] > 0]['Dividends']
                     
                     if not dividends.empty:
+                        # Últimos pagamentos, guardados no cache para a previsão de dividendos
+                        from dividend_calendar import LEDGER_DAYS
+                        recent = dividends[dividends.index >= dividends.index[-1] - pd.Timedelta(days=LEDGER_DAYS)]
+                        dividend_ledger = [(day.strftime('%Y-%m-%d'), float(amount)) for day, amount in recent.items()]
+                        
                         # Identificar se o pagamento é mensal ou trimestral
                         # Usamos o índice que contém as datas dos pagamentos
                         dates = dividends.index
@@ -511,7 +300,8 @@ class StockDataFetcher(QThread):
                 'company_name': company_name,
                 'annual_dividend': annual_dividend,
                 'dividend_growth_3y': dividend_growth_3y,
-                'dividend_growth_5y': dividend_growth_5y
+                'dividend_growth_5y': dividend_growth_5y,
+                'dividends': dividend_ledger
             }
             self.data_fetched.emit(result)
             
@@ -545,6 +335,7 @@ class AlreitsScoreFetcher(QThread):
             # Buscar a página
             print(f"  Fazendo requisição para: {url}")
             try:
+                import requests
                 response = requests.get(url, timeout=10)
                 print(f"  Status da resposta: {response.status_code}")
             except Exception as req_error:
@@ -583,6 +374,29 @@ class AlreitsScoreFetcher(QThread):
     def stop(self):
         self.running = False
 
+class ExchangeRateFetcher(QThread):
+    """Obtém a cotação USD/BRL em segundo plano, usando apenas o yfinance"""
+    rate_fetched = pyqtSignal(float)
+    
+    def run(self):
+        try:
+            import yfinance as yf
+            # Ticker USDBRL=X representa a cotação do dólar em reais
+            ticker = yf.Ticker("USDBRL=X")
+            data = ticker.history(period="1d")
+            
+            if not data.empty:
+                # Obtém o último preço de fechamento
+                rate = data['Close'].iloc[-1]
+                if rate and rate > 0:
+                    print(f"Cotação USD/BRL obtida via yfinance: {rate}")
+                    self.rate_fetched.emit(float(rate))
+                    return
+        except Exception as e:
+            print(f"Erro ao obter cotação do dólar via yfinance: {str(e)}")
+        
+        print(f"Usando taxa padrão USD/BRL: {DEFAULT_USD_BRL_RATE}")
+
 class Transaction:
     def __init__(self, date, transaction_type, ticker, shares, price=0.0):
         # Ensure date is always a datetime.date object
@@ -607,7 +421,7 @@ class Transaction:
     @classmethod
     def from_dict(cls, data):
         return cls(
-            date=datetime.strptime(data['date'], '%Y-%m-%d').date(),  # Ensure it's date, not datetime
+            date=date.fromisoformat(data['date']),  # Ensure it's date, not datetime
             transaction_type=data['type'],
             ticker=data['ticker'],
             shares=data['shares'],
@@ -618,7 +432,9 @@ class Position:
     def __init__(self, ticker, name=""):
         self.ticker = ticker
         self.name = name
-        self.transactions = []
+        self._transactions = []
+        self._summary = None  # Cached {'shares', 'total_cost'} used while transactions aren't loaded
+        self._ledger_loader = None  # Callable returning the transaction dicts for a ticker
         self.current_price = 0.0
         self.dividend_yield = 0.0
         self.annual_dividend = 0.0
@@ -628,6 +444,32 @@ class Position:
         self.dividend_growth_3y = 0.0  # Nova propriedade
         self.dividend_growth_5y = 0.0  # Nova propriedade
         
+    @property
+    def transactions(self):
+        # Lazy positions load their ledger the first time it is needed
+        if self._transactions is None:
+            self._load_transactions()
+        return self._transactions
+    
+    @transactions.setter
+    def transactions(self, transactions):
+        self._transactions = transactions
+    
+    def transactions_loaded(self):
+        return self._transactions is not None
+    
+    def ledger_records(self):
+        """Transaction dicts of the position, read without loading the ledger into it"""
+        if self._transactions is not None:
+            return [t.to_dict() for t in self._transactions]
+        return self._ledger_loader(self.ticker) if self._ledger_loader else []
+    
+    def _load_transactions(self):
+        records = self._ledger_loader(self.ticker) if self._ledger_loader else []
+        self._transactions = [Transaction.from_dict(t) for t in records]
+        self._transactions.sort(key=lambda x: x.date)
+        self.normalize_transaction_dates()
+        
     def normalize_transaction_dates(self):
         """Ensures all transaction dates are datetime.date type"""
         for transaction in self.transactions:
@@ -642,8 +484,12 @@ class Position:
         self.transactions.append(transaction)
         self.transactions.sort(key=lambda x: x.date)
         
-    def calculate_metrics(self):
-        # Calculate shares and average cost using FIFO
+    def cost_basis(self):
+        """Return (remaining shares, total cost) of the position using FIFO"""
+        # Use the cached summary row while the ledger hasn't been loaded
+        if self._transactions is None and self._summary is not None:
+            return float(self._summary['shares']), float(self._summary['total_cost'])
+            
         fifo_queue = []
         for transaction in self.transactions:
             if transaction.type == "BUY":
@@ -666,6 +512,19 @@ class Position:
         # Calculate remaining shares and total cost
         total_shares = sum(shares for shares, _ in fifo_queue)
         total_cost = sum(shares * price for shares, price in fifo_queue)
+        return total_shares, total_cost
+    
+    def summary(self):
+        """Per-position aggregate row persisted next to the ledger"""
+        total_shares, total_cost = self.cost_basis()
+        return {
+            'shares': total_shares,
+            'total_cost': total_cost
+        }
+        
+    def calculate_metrics(self):
+        # Calculate shares and average cost using FIFO
+        total_shares, total_cost = self.cost_basis()
         
         # Calculate average cost
         average_cost = total_cost / total_shares if total_shares > 0 else 0
@@ -713,11 +572,11 @@ class Position:
 			'premium_discount': premium_discount        
         }
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_transactions=True):
+        data = {
             'ticker': self.ticker,
             'name': self.name,
-            'transactions': [t.to_dict() for t in self.transactions],
+            'summary': self.summary(),
             'current_price': self.current_price,
             'dividend_yield': self.dividend_yield,
             'annual_dividend': self.annual_dividend,
@@ -726,27 +585,43 @@ class Position:
             'dividend_growth_3y': self.dividend_growth_3y,  # Adicionar ao dicionário
             'dividend_growth_5y': self.dividend_growth_5y   # Adicionar ao dicionário
         }
+        if include_transactions:
+            data['transactions'] = [t.to_dict() for t in self.transactions]
+        return data
     
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, ledger_loader=None):
+        # Missing fields get their defaults from the schema
+        data = upgrade_position(data)
         position = cls(data['ticker'], data['name'])
-        position.current_price = data.get('current_price', 0.0)
-        position.dividend_yield = data.get('dividend_yield', 0.0)
-        position.annual_dividend = data.get('annual_dividend', 0.0)
-        position.alreits_score = data.get('alreits_score', 0)
-        position.consensus_nav = data.get('consensus_nav', 0.0)
-        position.dividend_growth_3y = data.get('dividend_growth_3y', 0.0)  # Recuperar do dicionário
-        position.dividend_growth_5y = data.get('dividend_growth_5y', 0.0)  # Recuperar do dicionário
-        position.transactions = [Transaction.from_dict(t) for t in data.get('transactions', [])]
-        
-        # Normalize date types to avoid comparison problems
-        position.normalize_transaction_dates()
+        position.current_price = data['current_price']
+        position.dividend_yield = data['dividend_yield']
+        position.annual_dividend = data['annual_dividend']
+        position.alreits_score = data['alreits_score']
+        position.consensus_nav = data['consensus_nav']
+        position.dividend_growth_3y = data['dividend_growth_3y']
+        position.dividend_growth_5y = data['dividend_growth_5y']
+        
+        if 'transactions' in data or 'summary' not in data:
+            position.transactions = [Transaction.from_dict(t) for t in data.get('transactions', [])]
+            
+            # Normalize date types to avoid comparison problems
+            position.normalize_transaction_dates()
+            # FIFO and the ledger views expect date order, as in _load_transactions()
+            position.transactions.sort(key=lambda x: x.date)
+        else:
+            # Ledger is stored separately: keep only the summary row until it's needed
+            position._transactions = None
+            position._summary = data['summary']
+            position._ledger_loader = ledger_loader
         
         return position
 
 class Portfolio:
     def __init__(self):
         self.positions = {}  # ticker -> Position
+        self.nav = NAVRepository()  # Consensus NAV values and report date
+        self.last_refresh = ""  # ISO timestamp of the last complete price refresh
         
     def add_position(self, position):
         self.positions[position.ticker] = position
@@ -792,7 +667,6 @@ class Portfolio:
         # Dividend yield is already a percentage, no need to multiply by 100
         portfolio_yield = (total_annual_income / total_value) * 100 if total_value > 0 else 0
         portfolio_yield_on_cost = (total_annual_income / total_cost) * 100 if total_cost > 0 else 0
-        portfolio_beta = 1.03  # Placeholder - would need to calculate based on holdings
         
         # Calcular CAGR médio ponderado
         weighted_dg_3y = 0
@@ -820,31 +694,24 @@ class Portfolio:
             'weighted_dg_5y': weighted_dg_5y
         }
         
-    def to_dict(self):
+    def to_dict(self, include_transactions=True):
         data = {
-            'positions': {ticker: position.to_dict() for ticker, position in self.positions.items()}
-       }
-    
-        # Preserve nav_data and nav_report_date if they exist in the file
-        try:
-            if os.path.exists(PORTFOLIO_FILE):
-                with open(PORTFOLIO_FILE, 'r') as f:
-                    existing_data = json.load(f)
-                    # Copy existing nav data if present
-                    if 'nav_data' in existing_data:
-                        data['nav_data'] = existing_data['nav_data']
-                    if 'nav_report_date' in existing_data:
-                        data['nav_report_date'] = existing_data['nav_report_date']
-        except:
-            pass
-        
+            'schema_version': SCHEMA_VERSION,
+            'positions': {ticker: position.to_dict(include_transactions)
+                          for ticker, position in self.positions.items()}
+        }
+        data.update(self.nav.to_dict())
+        data['last_refresh'] = self.last_refresh
         return data
     
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, ledger_loader=None):
         portfolio = cls()
         for ticker, position_data in data.get('positions', {}).items():
-            portfolio.positions[ticker] = Position.from_dict(position_data)
+            portfolio.positions[ticker] = Position.from_dict(position_data, ledger_loader)
+        portfolio.nav = NAVRepository.from_dict(data)
+        portfolio.update_consensus_nav(portfolio.nav.nav_data)
+        portfolio.last_refresh = data.get('last_refresh', '')
         return portfolio
 		
     def apply_stock_split(self, ticker, new_shares, old_shares, split_date):
@@ -1089,13 +956,109 @@ class TransactionDialog(QDialog):
 class PortfolioApp(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.portfolio = Portfolio()
+        # Every account is kept open; PORTFOLIO_FILE backs the default one
+        self.workspace = Workspace.load(WORKSPACE_FILE, PORTFOLIO_FILE, lazy_transactions=LAZY_TRANSACTIONS)
+        self.consolidated_portfolio = None  # Set while the "All Accounts" view is shown
         self.fetcher_threads = []  # Store references to thread objects
+        self.snapshot_pending = False  # True until the current refresh has been recorded
+        self.quoted_accounts = set()  # Accounts that got at least one quote in the current refresh
+        self.update_coalescer = UpdateCoalescer(self.apply_fetch_updates, parent=self)
+        self.aggregates = PortfolioAggregates()  # Totals shown on the summary cards
+        # Next 12 months of dividends from the cached ledgers; numpy only loads once the window is up
+        self.income_forecast = None
+        self.forecast_coalescer = UpdateCoalescer(self.update_income_forecast, parent=self)
+        self.usd_brl_rate = None  # Last USD/BRL quote, refreshed in the background
+        self.rate_fetcher = None
         self.show_alreits_score = False
         self.valid_alreits_scores_found = False
         self.init_ui()
+        # Holdings and cards are drawn right away from the prices saved last time
         self.load_portfolio()
-        self.update_portfolio_data()
+        self.update_stale_indicator()
+        # The network refresh starts once the window is up, in the background
+        QTimer.singleShot(0, self.update_portfolio_data)
+
+    @property
+    def portfolio(self):
+        """Portfolio being displayed: the active account or the consolidated view"""
+        if self.consolidated_portfolio is not None:
+            return self.consolidated_portfolio
+        return self.workspace.active.portfolio
+
+    @portfolio.setter
+    def portfolio(self, portfolio):
+        self.workspace.active.portfolio = portfolio
+
+    @property
+    def storage(self):
+        return self.workspace.active.storage
+
+    @property
+    def history_store(self):
+        # There is no recorded history for the consolidated view
+        if self.consolidated_portfolio is not None:
+            return None
+        return self.workspace.active.history_store
+
+    def is_consolidated_view(self):
+        return self.consolidated_portfolio is not None
+
+    def check_account_selected(self):
+        """Warn and return False when the read-only consolidated view is shown"""
+        if not self.is_consolidated_view():
+            return True
+        QMessageBox.information(self, "Read-only View",
+                                f"'{CONSOLIDATED_VIEW}' is read-only. Select an account to make changes.")
+        return False
+
+    def switch_account(self, name):
+        """Show another account (or the consolidated view) without fetching again"""
+        if not name:
+            return
+        if name == CONSOLIDATED_VIEW:
+            self.consolidated_portfolio = Portfolio.from_dict(
+                self.workspace.consolidated_data(),
+                ledger_loader=self.workspace.consolidated_ledger
+            )
+        else:
+            self.consolidated_portfolio = None
+            self.workspace.active_name = name
+            self.save_workspace()
+        self.refresh_ui()
+        self.update_stale_indicator()
+        self.statusBar.showMessage(f"Showing {name}", 3000)
+
+    def new_account(self):
+        name, ok = QInputDialog.getText(self, "New Account", "Account name:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        try:
+            account = self.workspace.add_account(name)
+        except ValueError as e:
+            QMessageBox.warning(self, "New Account", str(e))
+            return
+        account.portfolio = self.load_account_portfolio(account)
+        self.workspace.active_name = name
+        self.save_workspace()
+        self.update_account_combo()
+
+    def update_account_combo(self):
+        self.account_combo.blockSignals(True)
+        self.account_combo.clear()
+        self.account_combo.addItems(list(self.workspace.accounts))
+        if len(self.workspace.accounts) > 1:
+            self.account_combo.addItem(CONSOLIDATED_VIEW)
+        current = CONSOLIDATED_VIEW if self.is_consolidated_view() else self.workspace.active_name
+        self.account_combo.setCurrentText(current)
+        self.account_combo.blockSignals(False)
+        self.switch_account(current)
+
+    def save_workspace(self):
+        try:
+            self.workspace.save()
+        except Exception as e:
+            print(f"Error saving workspace: {str(e)}")
         
     def fetch_alreits_scores(self):
         """Busca os scores do alreits para todos os REITs no portfólio"""
@@ -1111,7 +1074,8 @@ class PortfolioApp(QMainWindow):
         self.valid_alreits_scores_found = False  # Adicione esta linha
         print("  Resetando valid_alreits_scores_found para False")
     
-        for ticker in self.portfolio.positions:
+        # Cada ticker é buscado uma única vez, mesmo que esteja em várias contas
+        for ticker in self.workspace.tickers():
             # Crie uma thread para buscar o score deste ticker
             fetcher = AlreitsScoreFetcher(ticker)
             fetcher.score_fetched.connect(self.update_alreits_score)
@@ -1131,27 +1095,8 @@ class PortfolioApp(QMainWindow):
             print(f"  Score é válido, atualizando valid_alreits_scores_found para True")
             self.valid_alreits_scores_found = True  # Adicione esta linha
 		
-        position = self.portfolio.get_position(ticker)
-        if position:
-            position.alreits_score = score
-            self.save_portfolio()
-        
-            # Atualiza a interface para este ticker
-            for row in range(self.holdings_table.rowCount()):
-                if self.holdings_table.item(row, 0).text() == ticker:
-                    score_item = QTableWidgetItem(f"{score}")
-                    score_item.setTextAlignment(Qt.AlignCenter)
-                    
-                    # Colorir com base no score
-                    if score >= 80:
-                        score_item.setForeground(QColor(Theme.SUCCESS))
-                    elif score >= 50:
-                        score_item.setForeground(QColor(Theme.ACCENT))
-                    else:
-                        score_item.setForeground(QColor(Theme.DANGER))
-                
-                    self.holdings_table.setItem(row, 12, score_item)
-                    break    
+        # Aplicado junto com as cotações no próximo lote do coalescer
+        self.update_coalescer.add(('score', ticker), score)
 	
     def check_score_column_visibility(self):
         """Verifica se algum score válido foi encontrado e atualiza a visibilidade da coluna"""
@@ -1176,26 +1121,31 @@ class PortfolioApp(QMainWindow):
                 print("  Ocultando coluna de score")
                 self.holdings_table.setColumnHidden(12, True)  # Atualizar índice para 12
 	
-    def get_usd_to_brl_rate(self):
-        """Obtém a cotação atual do dólar para real brasileiro usando apenas o yfinance"""
+    def fetch_usd_brl_rate(self):
+        """Busca a cotação do dólar em segundo plano; os cards são atualizados quando ela chegar"""
+        if self.rate_fetcher is not None and self.rate_fetcher.isRunning():
+            return
+        self.rate_fetcher = ExchangeRateFetcher()
+        self.rate_fetcher.rate_fetched.connect(self.on_usd_brl_rate_fetched)
+        self.rate_fetcher.start()
+    
+    def on_usd_brl_rate_fetched(self, rate):
+        self.usd_brl_rate = rate
+        self.update_summary_cards()
+    
+    def income_projection(self):
+        """Projected income of the displayed portfolio, from the rolled-up totals and the dividend calendar"""
+        return self.aggregates.income.projection(self.usd_brl_rate or DEFAULT_USD_BRL_RATE, self.income_forecast)
+    
+    def update_income_forecast(self, updates=None):
+        """Recompute the dividend calendar of the displayed positions from the cached ledgers"""
         try:
-            # Ticker USDBRL=X representa a cotação do dólar em reais
-            ticker = yf.Ticker("USDBRL=X")
-            data = ticker.history(period="1d")
-            
-            if not data.empty:
-                # Obtém o último preço de fechamento
-                rate = data['Close'].iloc[-1]
-                if rate and rate > 0:
-                    print(f"Cotação USD/BRL obtida via yfinance: {rate}")
-                    return rate
+            from dividend_calendar import portfolio_forecast
+            self.income_forecast = portfolio_forecast(self.aggregates.holdings(), self.workspace.price_cache)
         except Exception as e:
-            print(f"Erro ao obter cotação do dólar via yfinance: {str(e)}")
-        
-        # Valor padrão caso falhe
-        default_rate = 5.0
-        print(f"Usando taxa padrão USD/BRL: {default_rate}")
-        return default_rate
+            print(f"Erro ao calcular a previsão de dividendos: {str(e)}")
+            self.income_forecast = None
+        self.update_summary_cards()
 	
     def init_ui(self):
         self.setWindowTitle("REIT Portfolio Tracker")
@@ -1214,7 +1164,7 @@ class PortfolioApp(QMainWindow):
             QLabel {{
                 color: {Theme.TEXT_PRIMARY};
             }}
-            QTableWidget {{
+            QTableWidget, QTableView {{
                 background-color: white;
                 alternate-background-color: #F5F7FA;
                 border: 1px solid {Theme.BORDER};
@@ -1223,7 +1173,7 @@ class PortfolioApp(QMainWindow):
                 selection-background-color: {Theme.SECONDARY};
                 selection-color: white;
             }}
-            QTableWidget::item {{
+            QTableWidget::item, QTableView::item {{
                 padding: 6px;
             }}
             QHeaderView::section {{
@@ -1276,6 +1226,8 @@ class PortfolioApp(QMainWindow):
         # Criar a barra de cabeçalho
         header_widget = QWidget()
         header_widget.setObjectName("header_widget")
+        self.header_widget = header_widget  # Used by paintEvent
+        self.primary_color = QColor(Theme.PRIMARY)
         header_widget.setStyleSheet(f"background-color: {Theme.PRIMARY};")
         header_layout = QVBoxLayout(header_widget)
         header_layout.setContentsMargins(0, 0, 0, 0)
@@ -1408,6 +1360,12 @@ class PortfolioApp(QMainWindow):
         
         file_menu.addSeparator()
         
+        new_account_action = QAction("New Account...", self)
+        new_account_action.triggered.connect(self.new_account)
+        file_menu.addAction(new_account_action)
+        
+        file_menu.addSeparator()
+        
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
@@ -1543,6 +1501,13 @@ class PortfolioApp(QMainWindow):
         search_actions_layout = QHBoxLayout()
         search_actions_layout.addWidget(search_widget, 1)  # 1 is the stretch factor
         
+        # Account selector (the consolidated view appears once there are several accounts)
+        self.account_combo = QComboBox()
+        self.account_combo.setMinimumWidth(160)
+        self.account_combo.setToolTip("Account")
+        self.account_combo.currentTextChanged.connect(self.switch_account)
+        search_actions_layout.addWidget(self.account_combo)
+        
         # Modern action button
         self.actions_button = StyledButton("Actions ▼")
         actions_menu = QMenu(self)
@@ -1566,14 +1531,17 @@ class PortfolioApp(QMainWindow):
         
         content_layout.addLayout(search_actions_layout)
         
-        # Create modern table
-        self.holdings_table = QTableWidget()
-        self.holdings_table.setColumnCount(13)  # Updated to include Percentage column
-        self.holdings_table.setHorizontalHeaderLabels([
-            "Ticker", "Shares", "Price", "Position Value", "Average Cost", 
-            "Profit/Loss", "Dividend Yield", "Yield on Cost", 
-            "Annual Income", "Percentage (%)", "DG 3y CAGR", "DG 5y CAGR", "Score by alreits"  # Added Percentage column
-        ])
+        # Create modern table (rows come from the holdings model; colors from the delegate)
+        self.holdings_model = HoldingsTableModel(self)
+        self.holdings_table = QTableView()
+        self.holdings_proxy = HoldingsFilterProxy(self)
+        self.holdings_proxy.setSourceModel(self.holdings_model)
+        self.holdings_table.setModel(self.holdings_proxy)
+        self.holdings_table.setItemDelegate(HoldingsColorDelegate(self.holdings_table))
+        self.holdings_table.setEditTriggers(QTableView.NoEditTriggers)
+        # Clicking a header sorts the proxy on raw values; rows start ordered by position value
+        self.holdings_table.horizontalHeader().setSortIndicator(VALUE_COLUMN, Qt.DescendingOrder)
+        self.holdings_table.setSortingEnabled(True)
         
         # Modern table styling
         self.holdings_table.setShowGrid(True)
@@ -1582,13 +1550,13 @@ class PortfolioApp(QMainWindow):
         self.holdings_table.verticalHeader().setVisible(False)
         self.holdings_table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.holdings_table.customContextMenuRequested.connect(self.show_holdings_context_menu)
-        self.holdings_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.holdings_table.setSelectionBehavior(QTableView.SelectRows)
         self.holdings_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 border-radius: 8px;
                 padding: 5px;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 10px 5px;
             }
         """)
@@ -1600,6 +1568,11 @@ class PortfolioApp(QMainWindow):
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage("Portfolio loaded")
         
+        # Age of the prices on screen, kept at the right of the status bar
+        self.stale_label = QLabel()
+        self.stale_label.setStyleSheet(f"color: {Theme.TEXT_SECONDARY}; padding-right: 8px;")
+        self.statusBar.addPermanentWidget(self.stale_label)
+        
         self.holdings_table.setColumnHidden(12, True)
         
         # Configurar arrastar a janela a partir do título
@@ -1611,22 +1584,15 @@ class PortfolioApp(QMainWindow):
     def paintEvent(self, event):
         super().paintEvent(event)
         
-        # Criar um pintor para desenhar na janela
-        painter = QPainter(self)
-        
-        # Encontrar a altura do cabeçalho
-        header_height = 0
-        for child in self.findChildren(QWidget):
-            if child.objectName() == "header_widget":
-                header_height = child.height()
-                break
+        # Retângulo que começa no final do cabeçalho e avança para a área de conteúdo;
+        # só a parte que precisa ser repintada é desenhada
+        band = QRect(0, self.header_widget.height(), self.width(), 50).intersected(event.rect())
+        if band.isEmpty():
+            return
         
         # Desenhar a barra decorativa
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(QColor(Theme.PRIMARY))
-        
-        # Desenhar retângulo que começa no final do cabeçalho e avança para a área de conteúdo
-        painter.drawRect(0, header_height, self.width(), 50)
+        painter = QPainter(self)
+        painter.fillRect(band, self.primary_color)
 	
     def header_mouse_press_event(self, event):
         self.old_pos = event.globalPos()
@@ -1703,6 +1669,7 @@ class PortfolioApp(QMainWindow):
         
         # Store value label to update later
         card.value_label = value_label
+        card.value_color = Theme.TEXT_PRIMARY
         
         # Add an indicator bar at bottom (optional visual enhancement)
         indicator = QFrame()
@@ -1726,11 +1693,30 @@ class PortfolioApp(QMainWindow):
         if title == "PORTFOLIO VALUE":
             self.show_portfolio_sector_allocation()
         elif title == "NET MONTHLY INCOME (BRL)":
-            QMessageBox.information(
-                self,
-                "NET MONTHLY INCOME (BRL)",
-                "The value of the annual income is converted to Brazilian reais based on the current USD/BRL exchange rate and then divided by 12 to determine the monthly amount. After this calculation, a 30% tax is applied, resulting in the final net amount to be received."
-            )
+            income = self.income_projection()
+            if income['forecast'] is None:
+                QMessageBox.information(
+                    self,
+                    "NET MONTHLY INCOME (BRL)",
+                    "The value of the annual income is converted to Brazilian reais based on the current USD/BRL exchange rate and then divided by 12 to determine the monthly amount. After this calculation, a 30% tax is applied, resulting in the final net amount to be received."
+                )
+                return
+            from dividend_calendar import month_label
+            from income_rollups import BRL_TAX_RATE
+            forecast = income['forecast']
+            net = (1 - BRL_TAX_RATE) * income['usd_brl_rate']
+            lines = [f"{month_label(month)}:  ${total:,.2f}  (R$ {total * net:,.2f} net)"
+                     for month, total in zip(forecast['months'], forecast['total'])]
+            text = ("The card shows the dividends expected next month, converted to Brazilian reais at the "
+                    "current USD/BRL rate, after the 30% tax. Each REIT is projected from its recent "
+                    "dividends: how often it pays, the months it pays in and its last amount.\n\n"
+                    + "\n".join(lines)
+                    + f"\n\nNext 12 months: ${forecast['annual']:,.2f}")
+            if forecast['estimated'].any():
+                estimated = [t for t, e in zip(forecast['tickers'], forecast['estimated']) if e]
+                text += (f"\n\nNo dividend history yet for {', '.join(estimated)}; "
+                         f"their annual dividend is spread evenly over the months.")
+            QMessageBox.information(self, "NET MONTHLY INCOME (BRL)", text)
         # Add other card handlers here if needed
     
     def get_icon(self, name):
@@ -1770,133 +1756,61 @@ class PortfolioApp(QMainWindow):
         print(f"ERROR: {message}")  # Log to console for debugging
         
     def update_position_data(self, data):
-        ticker = data['ticker']
-        price = data['price']
-        dividend_yield = data['dividend_yield']
-        company_name = data.get('company_name', '')
-        annual_dividend = data.get('annual_dividend', 0.0)
-        dividend_growth_3y = data.get('dividend_growth_3y', 0.0)
-        dividend_growth_5y = data.get('dividend_growth_5y', 0.0)
-        
-        position = self.portfolio.get_position(ticker)
-        if position:
-            position.current_price = price
-            # Atualizar o dividend_yield com base no preço atual e no annual_dividend
-            if annual_dividend > 0 and price > 0:
-                position.dividend_yield = (annual_dividend / price) * 100
+        # Fetch results arrive in bursts; they are applied together every few ms
+        self.update_coalescer.add(('quote', data['ticker']), data)
+    
+    def apply_fetch_updates(self, updates):
+        """Apply a batch of quotes and scores with a single save, recompute and repaint"""
+        accounts = {}
+        displayed = []
+        for (kind, ticker), value in updates.items():
+            if kind == 'quote':
+                # One quote serves every account holding the ticker
+                self.workspace.market_data.update_quote(value)
+                if value.get('dividends'):
+                    self.workspace.price_cache.store_dividends(ticker, value['dividends'])
             else:
-                # Fallback para o valor fornecido pela API
-                position.dividend_yield = dividend_yield
-            
-            # Update company name if empty
-            if not position.name and company_name:
-                position.name = company_name
-            
-            # Update other fields if needed
-            if annual_dividend:
-                position.annual_dividend = annual_dividend
-                
-            # Atualizar campos de crescimento de dividendos
-            position.dividend_growth_3y = dividend_growth_3y
-            position.dividend_growth_5y = dividend_growth_5y
-            
-            self.save_portfolio()
-            
-            # Get updated portfolio metrics for percentage calculation
-            portfolio_metrics = self.portfolio.calculate_portfolio_metrics()
-            total_portfolio_value = portfolio_metrics['total_value']
-            
-            # Update UI for just this position
-            for row in range(self.holdings_table.rowCount()):
-                if self.holdings_table.item(row, 0).text() == ticker:
-                    # Update price cell
-                    price_item = QTableWidgetItem(f"${price:.2f}")
-                    price_item.setTextAlignment(Qt.AlignCenter)
-                    self.holdings_table.setItem(row, 2, price_item)
-                    
-                    # Update other metrics
-                    metrics = position.calculate_metrics()
-                    
-                    # Update position value
-                    position_value = metrics['position_value']
-                    value_item = QTableWidgetItem(f"${position_value:.2f}")
-                    value_item.setTextAlignment(Qt.AlignCenter)
-                    value_item.setFont(QFont("Segoe UI", 9, QFont.Bold))
-                    self.holdings_table.setItem(row, 3, value_item)
-                    
-                    # Update dividend yield cell
-                    div_yield_item = QTableWidgetItem(f"{position.dividend_yield:.2f}%")
-                    div_yield_item.setTextAlignment(Qt.AlignCenter)
-                    self.holdings_table.setItem(row, 6, div_yield_item)
-                    
-                    # Update profit/loss
-                    profit_loss = metrics['profit_loss']
-                    pl_item = QTableWidgetItem(f"${profit_loss:.2f}")
-                    pl_item.setTextAlignment(Qt.AlignCenter)
-                    if profit_loss < 0:
-                        pl_item.setForeground(QColor(Theme.DANGER))
-                    else:
-                        pl_item.setForeground(QColor(Theme.SUCCESS))
-                    self.holdings_table.setItem(row, 5, pl_item)
-                    
-                    # Update yield on cost
-                    yoc = metrics['yield_on_cost']
-                    yoc_item = QTableWidgetItem(f"{yoc:.2f}%")
-                    yoc_item.setTextAlignment(Qt.AlignCenter)
-                    self.holdings_table.setItem(row, 7, yoc_item)
-                    
-                    # Update annual income
-                    annual_income = metrics['annual_income']
-                    income_item = QTableWidgetItem(f"${annual_income:.2f}")
-                    income_item.setTextAlignment(Qt.AlignCenter)
-                    self.holdings_table.setItem(row, 8, income_item)
-                    
-                    # Update percentage column
-                    percentage = (position_value / total_portfolio_value * 100) if total_portfolio_value > 0 else 0
-                    percentage_item = QTableWidgetItem(f"{percentage:.2f}%")
-                    percentage_item.setTextAlignment(Qt.AlignCenter)
-                    self.holdings_table.setItem(row, 9, percentage_item)
-                    
-                    # Update DG 3y CAGR
-                    dg_3y_item = QTableWidgetItem(f"{dividend_growth_3y:.2f}%")
-                    dg_3y_item.setTextAlignment(Qt.AlignCenter)
-                    # Colorir com base no crescimento
-                    if dividend_growth_3y > 5:
-                        dg_3y_item.setForeground(QColor(Theme.SUCCESS))
-                    elif dividend_growth_3y <= 0:
-                        dg_3y_item.setForeground(QColor(Theme.DANGER))
-                    elif dividend_growth_3y > 0:
-                        dg_3y_item.setForeground(QColor(Theme.ACCENT))
-                    self.holdings_table.setItem(row, 10, dg_3y_item)
-                    
-                    # Update DG 5y CAGR
-                    dg_5y_item = QTableWidgetItem(f"{dividend_growth_5y:.2f}%")
-                    dg_5y_item.setTextAlignment(Qt.AlignCenter)
-                    # Colorir com base no crescimento
-                    if dividend_growth_5y > 5:
-                        dg_5y_item.setForeground(QColor(Theme.SUCCESS))
-                    elif dividend_growth_5y <= 0:
-                        dg_5y_item.setForeground(QColor(Theme.DANGER))
-                    elif dividend_growth_5y > 0:
-                        dg_5y_item.setForeground(QColor(Theme.ACCENT))
-                    self.holdings_table.setItem(row, 11, dg_5y_item)
-                    
-                    # Apply background color based on row number for consistent styling
-                    bg_color = QColor("#FFFFFF") if row % 2 == 0 else QColor("#F5F7FA")
-                    for col in range(self.holdings_table.columnCount()):
-                        item = self.holdings_table.item(row, col)
-                        if item:
-                            item.setBackground(bg_color)
-                    
-                    break
+                # O score vale para todas as contas que têm o ticker
+                self.workspace.market_data.update_score(ticker, value)
+            for account, account_position in self.workspace.positions_for(ticker):
+                self.workspace.market_data.apply_cached(account_position)
+                accounts[account.name] = account
+                # Sem preço a cotação falhou; não conta como refresh da conta
+                if kind == 'quote' and value.get('price'):
+                    self.quoted_accounts.add(account.name)
             
-            # Also update summary cards
-            self.update_summary_cards()
+            position = self.portfolio.get_position(ticker)
+            if position:
+                if self.is_consolidated_view():
+                    self.workspace.market_data.apply_cached(position)
+                displayed.append(position)
+        
+        self.save_accounts(list(accounts.values()))
+        if not displayed:
+            return
+        
+        # Running totals are adjusted by each position's change, not recomputed
+        position_metrics = []
+        for position in displayed:
+            metrics = position.calculate_metrics()
+            self.aggregates.update_position(position, metrics)
+            position_metrics.append((position, metrics))
+            self.forecast_coalescer.add(position.ticker, True)
+        total_portfolio_value = self.aggregates.total_value
+        
+        # Only the cells of the holdings that changed are repainted
+        for position, metrics in position_metrics:
+            self.holdings_model.update_position(position, total_portfolio_value, metrics)
+        
+        # Also update summary cards
+        self.update_summary_cards()
     
     def update_portfolio_data(self):
         """Atualiza todos os dados do portfólio, incluindo preços e dividend yields"""
         self.statusBar.showMessage("Atualizando dados do portfólio...")
+        self.fetch_usd_brl_rate()
         self.fetch_stock_data()
+        self.update_stale_indicator()
         self.fetch_alreits_scores()
 		
         # Programar uma atualização da interface após um pequeno atraso para dar tempo às threads terminarem
@@ -1924,154 +1838,73 @@ class PortfolioApp(QMainWindow):
             fetcher.wait()  # Wait for thread to finish
             
         self.fetcher_threads = []  # Clear the list
+        self.snapshot_pending = bool(self.workspace.tickers())
+        self.quoted_accounts = set()
         
-        for ticker in self.portfolio.positions:
+        # Tickers held in several accounts are fetched once
+        for ticker in self.workspace.tickers():
             # Create a thread to fetch data for this ticker
             fetcher = StockDataFetcher(ticker)
             fetcher.data_fetched.connect(self.update_position_data)
             fetcher.error_occurred.connect(self.show_error_message)
+            fetcher.finished.connect(self.on_stock_fetch_finished)
             self.fetcher_threads.append(fetcher)  # Store the reference
             fetcher.start()
+
+    def on_stock_fetch_finished(self):
+        """Grava o snapshot do dia quando todas as cotações do refresh chegaram"""
+        # Threads interrompidas de um refresh anterior também emitem finished
+        if not self.snapshot_pending or not all(f.isFinished() for f in self.fetcher_threads):
+            return
+        self.snapshot_pending = False
+        # O snapshot precisa das últimas cotações ainda no coalescer
+        self.update_coalescer.flush()
+        # Só as contas que receberam cotações ganham um novo horário; as outras seguem como estavam
+        refreshed = [account for account in self.workspace.loaded_accounts()
+                     if account.name in self.quoted_accounts]
+        if not refreshed:
+            print("Nenhuma cotação recebida; mantendo o horário do último refresh")
+            self.update_stale_indicator()
+            return
+        refreshed_at = datetime.now().isoformat(timespec='seconds')
+        for account in refreshed:
+            account.portfolio.last_refresh = refreshed_at
+            try:
+                if account.history_store.record_snapshot(account.portfolio):
+                    print(f"Snapshot de {date.today().isoformat()} gravado em {account.history_store.path}")
+            except Exception as e:
+                print(f"Erro ao gravar snapshot diário de {account.name}: {str(e)}")
+        self.save_accounts(refreshed)
+        if self.is_consolidated_view():
+            self.consolidated_portfolio.last_refresh = refreshed_at
+        self.update_stale_indicator()
+    
+    def update_stale_indicator(self):
+        """Show how old the prices on screen are"""
+        last_refresh = self.portfolio.last_refresh if self.portfolio else ""
+        if last_refresh:
+            text = f"Prices as of {datetime.fromisoformat(last_refresh).strftime('%Y-%m-%d %H:%M')}"
+        else:
+            text = "Prices not refreshed yet"
+        if self.snapshot_pending:
+            # Ainda mostrando os preços salvos enquanto o refresh roda
+            text = f"{text} (stale, refreshing...)" if last_refresh else "Refreshing prices..."
+        self.stale_label.setText(text)
     
     def update_holdings_table(self):
-        self.holdings_table.setRowCount(0)
-        
-        # Primeiro calcular o valor total do portfólio para referência
-        portfolio_metrics = self.portfolio.calculate_portfolio_metrics()
-        total_portfolio_value = portfolio_metrics['total_value']
-        
-        # Criar uma lista de posições ordenadas por valor da posição (decrescente)
-        positions_list = []
-        for ticker, position in self.portfolio.positions.items():
-            metrics = position.calculate_metrics()
-            shares = metrics['shares']
-            
-            if shares <= 0:
-                continue
-            
-            position_value = metrics['position_value']
-            positions_list.append((ticker, position, position_value))
-        
-        # Ordenar a lista por valor da posição (decrescente)
-        positions_list.sort(key=lambda x: x[2], reverse=True)
-        
-        # Preencher a tabela com as posições ordenadas
-        row = 0
-        for ticker, position, _ in positions_list:
-            metrics = position.calculate_metrics()
-            shares = metrics['shares']
-            
-            self.holdings_table.insertRow(row)
-            
-            # Ticker
-            ticker_item = QTableWidgetItem(ticker)
-            ticker_item.setTextAlignment(Qt.AlignCenter)
-            ticker_item.setFont(QFont("Segoe UI", 9, QFont.Bold))
-            self.holdings_table.setItem(row, 0, ticker_item)
-            
-            # Shares
-            shares_item = QTableWidgetItem(f"{int(shares) if shares.is_integer() else shares}")
-            shares_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 1, shares_item)
-            
-            # Current Price
-            price_item = QTableWidgetItem(f"${position.current_price:.2f}")
-            price_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 2, price_item)
-                      
-            # Average Cost
-            avg_cost = metrics['average_cost']
-            avg_cost_item = QTableWidgetItem(f"${avg_cost:.2f}")
-            avg_cost_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 4, avg_cost_item)
-            
-            # Profit/Loss
-            profit_loss = metrics['profit_loss']
-            pl_item = QTableWidgetItem(f"${profit_loss:.2f}")
-            pl_item.setTextAlignment(Qt.AlignCenter)
-            pl_item.setForeground(QColor("red") if profit_loss < 0 else QColor("green"))
-            self.holdings_table.setItem(row, 5, pl_item)
-            
-            # Dividend Yield - usando o valor já calculado na posição
-            div_yield = position.dividend_yield
-            div_yield_item = QTableWidgetItem(f"{div_yield:.2f}%")    
-            div_yield_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 6, div_yield_item)
-            
-            # Yield on Cost - já é porcentagem, exibir diretamente
-            # Garantir que estamos exibindo o valor correto (não multiplicado por 100)
-            yoc = metrics['yield_on_cost'] 
-            yoc_item = QTableWidgetItem(f"{yoc:.2f}%")
-            yoc_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 7, yoc_item)
-            
-            # Annual Income
-            annual_income = metrics['annual_income']
-            income_item = QTableWidgetItem(f"${annual_income:.2f}")
-            income_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 8, income_item)
-			
-            # Update position value
-            position_value = metrics['position_value']
-            value_item = QTableWidgetItem(f"${position_value:.2f}")
-            value_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 3, value_item)
-			
-			# Porcentagem do portfolio
-            position_value = metrics['position_value']
-            percentage = (position_value / total_portfolio_value * 100) if total_portfolio_value > 0 else 0
-            percentage_item = QTableWidgetItem(f"{percentage:.2f}%")
-            percentage_item.setTextAlignment(Qt.AlignCenter)
-            self.holdings_table.setItem(row, 9, percentage_item)
-			
-            # DG 3y CAGR
-            dg_3y = position.dividend_growth_3y
-            dg_3y_item = QTableWidgetItem(f"{dg_3y:.2f}%")
-            dg_3y_item.setTextAlignment(Qt.AlignCenter)
-            # Colorir com base no crescimento (verde para positivo, vermelho para negativo)
-            if dg_3y > 5:
-                dg_3y_item.setForeground(QColor(Theme.SUCCESS))
-            elif dg_3y <= 0:
-                dg_3y_item.setForeground(QColor(Theme.DANGER))
-            elif dg_3y > 0:
-                dg_3y_item.setForeground(QColor(Theme.ACCENT))
-            self.holdings_table.setItem(row, 10, dg_3y_item)
-            
-            # DG 5y CAGR
-            dg_5y = position.dividend_growth_5y
-            dg_5y_item = QTableWidgetItem(f"{dg_5y:.2f}%")
-            dg_5y_item.setTextAlignment(Qt.AlignCenter)
-            # Colorir com base no crescimento
-            if dg_5y > 5:
-                dg_5y_item.setForeground(QColor(Theme.SUCCESS))
-            elif dg_5y <= 0:
-                dg_5y_item.setForeground(QColor(Theme.DANGER))
-            elif dg_5y > 0:
-                dg_5y_item.setForeground(QColor(Theme.ACCENT))
-            self.holdings_table.setItem(row, 11, dg_5y_item)
-            
-            # Adicionar a coluna de score
-            score = position.alreits_score
-            score_item = QTableWidgetItem(f"{score}")
-            score_item.setTextAlignment(Qt.AlignCenter)
-            # Colorir com base no score
-            if score >= 80:
-                score_item.setForeground(QColor(Theme.SUCCESS))
-            elif score >= 50:
-                score_item.setForeground(QColor(Theme.ACCENT))
-            else:
-                score_item.setForeground(QColor(Theme.DANGER))
-            self.holdings_table.setItem(row, 12, score_item)
-			
-            row += 1
+        # Inserts, removes and updates rows in place instead of rebuilding the table
+        self.holdings_model.sync_portfolio(self.portfolio)
+        self.aggregates.rebuild(self.portfolio)
+        self.forecast_coalescer.add(None, True)
     
     def update_summary_cards(self):
-        metrics = self.portfolio.calculate_portfolio_metrics()
+        metrics = self.aggregates.metrics()
+        income = self.income_projection()
         
         # Update cards
-        self.portfolio_yield_card.value_label.setText(f"{metrics['portfolio_yield']:.2f}%")
-        self.yield_on_cost_card.value_label.setText(f"{metrics['portfolio_yield_on_cost']:.2f}%")
-        self.annual_income_card.value_label.setText(f"${metrics['total_annual_income']:.2f}")
+        self.set_card_text(self.portfolio_yield_card, f"{metrics['portfolio_yield']:.2f}%")
+        self.set_card_text(self.yield_on_cost_card, f"{metrics['portfolio_yield_on_cost']:.2f}%")
+        self.set_card_text(self.annual_income_card, f"${income['annual']:.2f}")
     
         # Calculate profit/loss and format it
         profit_loss = metrics['total_profit_loss']
@@ -2083,91 +1916,59 @@ class PortfolioApp(QMainWindow):
     
         # Create HTML structure with just the main value and profit/loss
         full_text = f"{main_value}<span style='font-size:14px; color:{profit_loss_color};'>{pl_display}</span>"
+        self.set_card_text(self.portfolio_value_card, full_text, rich=True)
         
-        # Set rich text to the value label
-        self.portfolio_value_card.value_label.setText(full_text)
-        self.portfolio_value_card.value_label.setTextFormat(Qt.RichText)
-        
-        # Calculate monthly income in BRL
-        usd_brl_rate = self.get_usd_to_brl_rate()
-        monthly_income_usd = metrics['total_annual_income'] / 12
-        monthly_income_brl = monthly_income_usd * usd_brl_rate * 0.7
-    
-        # Update monthly income BRL card
-        usd_brl_text = f"<span style='font-size:14px; color:{Theme.TEXT_SECONDARY};'> ($ 1 = R$ {usd_brl_rate:.2f})</span>"
-        self.monthly_income_brl_card.value_label.setText(f"R$ {monthly_income_brl:.2f}{usd_brl_text}")
-        self.monthly_income_brl_card.value_label.setTextFormat(Qt.RichText)
+        # Update monthly income BRL card (the rate is fetched once per refresh, off the UI thread)
+        usd_brl_text = f"<span style='font-size:14px; color:{Theme.TEXT_SECONDARY};'> ($ 1 = R$ {income['usd_brl_rate']:.2f})</span>"
+        self.set_card_text(self.monthly_income_brl_card, f"R$ {income['monthly_brl_after_tax']:.2f}{usd_brl_text}", rich=True)
         
         # Atualizar novos cards de crescimento de dividendos
-        self.dg_3y_card.value_label.setText(f"{metrics['weighted_dg_3y']:.2f}%")
-        self.dg_5y_card.value_label.setText(f"{metrics['weighted_dg_5y']:.2f}%")
+        self.set_card_text(self.dg_3y_card, f"{metrics['weighted_dg_3y']:.2f}%")
+        self.set_card_text(self.dg_5y_card, f"{metrics['weighted_dg_5y']:.2f}%")
         
         # Definir cores para os cards de DG baseado no valor
-        dg_3y_value = metrics['weighted_dg_3y']
-        if dg_3y_value > 5:
-            self.dg_3y_card.value_label.setStyleSheet(f"""
-                font-size: 24px;
-                font-weight: bold;
-                color: {Theme.SUCCESS};
-                padding-top: 5px;
-            """)
-        elif dg_3y_value <= 0:
-            self.dg_3y_card.value_label.setStyleSheet(f"""
-                font-size: 24px;
-                font-weight: bold;
-                color: {Theme.DANGER};
-                padding-top: 5px;
-            """)
-        else:
-            self.dg_3y_card.value_label.setStyleSheet(f"""
-                font-size: 24px;
-                font-weight: bold;
-                color: {Theme.TEXT_PRIMARY};
-                padding-top: 5px;
-            """)
-            
-        dg_5y_value = metrics['weighted_dg_5y']
-        if dg_5y_value > 5:
-            self.dg_5y_card.value_label.setStyleSheet(f"""
-                font-size: 24px;
-                font-weight: bold;
-                color: {Theme.SUCCESS};
-                padding-top: 5px;
-            """)
-        elif dg_5y_value <= 0:
-            self.dg_5y_card.value_label.setStyleSheet(f"""
-                font-size: 24px;
-                font-weight: bold;
-                color: {Theme.DANGER};
-                padding-top: 5px;
-            """)
-        else:
-            self.dg_5y_card.value_label.setStyleSheet(f"""
-                font-size: 24px;
-                font-weight: bold;
-                color: {Theme.TEXT_PRIMARY};
-                padding-top: 5px;
-            """)
+        self.set_card_color(self.dg_3y_card, self.dg_color(metrics['weighted_dg_3y']))
+        self.set_card_color(self.dg_5y_card, self.dg_color(metrics['weighted_dg_5y']))
+    
+    def set_card_text(self, card, text, rich=False):
+        """Change a card's value only when the displayed text is different"""
+        if card.value_label.text() == text:
+            return
+        if rich:
+            card.value_label.setTextFormat(Qt.RichText)
+        card.value_label.setText(text)
+    
+    def dg_color(self, value):
+        if value > 5:
+            return Theme.SUCCESS
+        if value <= 0:
+            return Theme.DANGER
+        return Theme.TEXT_PRIMARY
+    
+    def set_card_color(self, card, color):
+        """Restyle a card's value only when its color bucket changes (restyling re-polishes the widget)"""
+        if getattr(card, 'value_color', None) == color:
+            return
+        card.value_color = color
+        card.value_label.setStyleSheet(f"""
+            font-size: 24px;
+            font-weight: bold;
+            color: {color};
+            padding-top: 5px;
+        """)
     
     def filter_holdings(self):
-        search_text = self.search_edit.text().lower()
-        
-        for row in range(self.holdings_table.rowCount()):
-            ticker = self.holdings_table.item(row, 0).text().lower()
-            
-            if search_text in ticker:
-                self.holdings_table.setRowHidden(row, False)
-            else:
-                self.holdings_table.setRowHidden(row, True)
+        # Prefix/fuzzy ticker search, done by the proxy
+        self.holdings_proxy.set_search_text(self.search_edit.text())
     
     def show_holdings_context_menu(self, position):
         # Get the selected row
-        row = self.holdings_table.currentRow()
+        row = self.holdings_table.currentIndex().row()
         if row < 0:
             return
             
         # Get the ticker
-        ticker = self.holdings_table.item(row, 0).text()
+        ticker = self.holdings_proxy.ticker_at(row)
         
         # Create menu
         menu = QMenu(self)
@@ -2212,6 +2013,8 @@ class PortfolioApp(QMainWindow):
         dialog.exec_()
     
     def add_transaction(self, transaction_type="BUY", ticker=""):
+        if not self.check_account_selected():
+            return
         dialog = TransactionDialog(self, transaction_type, ticker)
         if dialog.exec_():
             transaction = dialog.get_transaction()
@@ -2225,6 +2028,8 @@ class PortfolioApp(QMainWindow):
             self.statusBar.showMessage(f"{transaction_type} transaction added for {transaction.ticker}")
     
     def delete_transaction(self, index, ticker):
+        if not self.check_account_selected():
+            return
         position = self.portfolio.get_position(ticker)
         if position and 0 <= index < len(position.transactions):
             # Remove the transaction
@@ -2233,6 +2038,11 @@ class PortfolioApp(QMainWindow):
             # Check if position is now empty
             if not position.transactions:
                 self.portfolio.remove_position(ticker)
+                self.aggregates.remove_position(ticker)
+            else:
+                self.aggregates.update_position(position)
+            # Os cards mudam já, sem esperar pelo refresh das cotações
+            self.update_summary_cards()
                 
             # Save and update
             self.save_portfolio()
@@ -2240,6 +2050,8 @@ class PortfolioApp(QMainWindow):
             self.statusBar.showMessage(f"Transaction deleted for {ticker}")
     
     def new_portfolio(self):
+        if not self.check_account_selected():
+            return
         reply = QMessageBox.question(
             self, 
             "New Portfolio", 
@@ -2255,40 +2067,41 @@ class PortfolioApp(QMainWindow):
             self.statusBar.showMessage("New portfolio created")
     
     def load_portfolio(self):
-        if os.path.exists(PORTFOLIO_FILE):
+        """Load every account of the workspace"""
+        for account in self.workspace.accounts.values():
+            account.portfolio = self.load_account_portfolio(account)
+        self.update_account_combo()
+    
+    def load_account_portfolio(self, account):
+        storage = account.storage
+        if storage.exists():
             try:
-                with open(PORTFOLIO_FILE, 'r') as f:
-                    data = json.load(f)
-                    self.portfolio = Portfolio.from_dict(data)
-                    
-                    # Carregar dados de NAV (se existirem)
-                    if 'nav_data' in data:
-                        self.nav_data = data['nav_data']
-                        self.nav_report_date = data.get('nav_report_date', '')
-                    
-                        # Atualizar valores de NAV para cada posição
-                        for ticker, nav_value in self.nav_data.items():
-                            position = self.portfolio.get_position(ticker)
-                            if position:
-                                position.consensus_nav = nav_value
-                    
-                self.statusBar.showMessage("Portfolio loaded successfully")
+                # Older files are upgraded in place before being loaded
+                if storage.needs_migration():
+                    self.migrate_portfolio_file(storage.path, storage)
+                data = storage.read()
+                portfolio = Portfolio.from_dict(data, ledger_loader=storage.read_ledger)
+                self.statusBar.showMessage(f"Portfolio '{account.name}' loaded successfully")
+                return portfolio
             except Exception as e:
                 self.statusBar.showMessage(f"Error loading portfolio: {str(e)}")
                 # Create a backup of the corrupted file
-                if os.path.exists(PORTFOLIO_FILE):
-                    backup_file = f"{PORTFOLIO_FILE}.bak"
-                    try:
-                        os.rename(PORTFOLIO_FILE, backup_file)
-                        self.statusBar.showMessage(f"Corrupted file backed up as {backup_file}")
-                    except:
-                        pass
-        else:
-            # Criar um portfólio vazio, sem amostras
-            self.create_sample_portfolio()
-            self.save_portfolio()
+                try:
+                    backup_file = storage.backup()
+                    self.statusBar.showMessage(f"Corrupted file backed up as {backup_file}")
+                except:
+                    pass
+            return Portfolio()
+        
+        # Criar um portfólio vazio, sem amostras
+        portfolio = Portfolio()
+        storage.save(portfolio)
+        self.create_sample_portfolio()
+        return portfolio
     
     def load_portfolio_dialog(self):
+        if not self.check_account_selected():
+            return
         file_path, _ = QFileDialog.getOpenFileName(
             self, 
             "Load Portfolio", 
@@ -2298,38 +2111,70 @@ class PortfolioApp(QMainWindow):
         
         if file_path:
             try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    self.portfolio = Portfolio.from_dict(data)
+                storage = PortfolioStorage(file_path)
+                migration_dir = None
+                if storage.needs_migration():
+                    # Legacy files are upgraded in a temporary copy; the account's own files
+                    # are only written by the next save, as with any other loaded file
+                    import tempfile
+                    migration_dir = tempfile.mkdtemp(prefix="reit_migration_")
+                    storage = PortfolioStorage(os.path.join(migration_dir, os.path.basename(file_path)))
+                    self.migrate_portfolio_file(file_path, storage)
+                try:
+                    data = storage.read()
+                    portfolio = Portfolio.from_dict(data, ledger_loader=storage.read_ledger)
+                    # Ledgers of an imported file live next to that file, so bring them into memory
+                    for position in portfolio.positions.values():
+                        position.transactions
+                finally:
+                    if migration_dir is not None:
+                        import shutil
+                        shutil.rmtree(migration_dir, ignore_errors=True)
+                self.portfolio = portfolio
                 self.update_portfolio_data()
                 self.statusBar.showMessage(f"Portfolio loaded from {file_path}")
             except Exception as e:
                 self.statusBar.showMessage(f"Error loading portfolio: {str(e)}")
     
+    def migrate_portfolio_file(self, source_path, storage):
+        """Upgrade a portfolio file to the current schema, streaming it into storage"""
+        self.statusBar.showMessage(f"Migrating {os.path.basename(source_path)} to schema v{SCHEMA_VERSION}...")
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            stats = storage.migrate_from(
+                source_path,
+                summarize=lambda record: Position.from_dict(record).summary()
+            )
+        finally:
+            QApplication.restoreOverrideCursor()
+        print(stats.summary())
+        self.statusBar.showMessage(stats.summary(), 10000)
+    
+    def save_consolidated_nav(self, shown):
+        """Store NAV values edited in the consolidated view in the accounts holding those tickers.
+
+        Only values that differ from what the dialog showed are copied, so an
+        account keeps its own NAV for tickers the user didn't touch.
+        """
+        nav = self.consolidated_portfolio.nav
+        edited = {ticker: value for ticker, value in nav.nav_data.items() if shown.get(ticker) != value}
+        self.workspace.apply_nav(edited, nav.report_date)
+        self.save_portfolio()
+
     def save_portfolio(self):
+        # The consolidated view has no file of its own: save every account instead
+        if self.is_consolidated_view():
+            self.save_accounts(self.workspace.loaded_accounts())
+        else:
+            self.save_accounts([self.workspace.active])
+    
+    def save_accounts(self, accounts):
         try:
-            # Get existing data to preserve nav_data
-            existing_data = {}
-            if os.path.exists(PORTFOLIO_FILE):
-                try:
-                    with open(PORTFOLIO_FILE, 'r') as f:
-                        existing_data = json.load(f)
-                except:
-                    pass
-        
-            # Get portfolio data
-            portfolio_data = self.portfolio.to_dict()
-        
-            # Preserve nav_data if it exists in file
-            if 'nav_data' in existing_data:
-                portfolio_data['nav_data'] = existing_data['nav_data']
-            if 'nav_report_date' in existing_data:
-                portfolio_data['nav_report_date'] = existing_data['nav_report_date']
-        
-            # Save back to file
-            with open(PORTFOLIO_FILE, 'w') as f:
-                json.dump(portfolio_data, f, indent=2)
-            self.statusBar.showMessage("Portfolio saved")
+            # NAV data lives in the portfolio model, so a single write per account covers everything
+            for account in accounts:
+                account.storage.save(account.portfolio)
+            if accounts:
+                self.statusBar.showMessage("Portfolio saved")
         except Exception as e:
             self.statusBar.showMessage(f"Error saving portfolio: {str(e)}")
     
@@ -2433,12 +2278,18 @@ class PortfolioApp(QMainWindow):
             
             from data_visualization import PortfolioAnalyticsDialog
             
-            dialog = PortfolioAnalyticsDialog(self, self.portfolio)
+            dialog = PortfolioAnalyticsDialog(self, self.portfolio, self.history_store,
+                                              self.workspace.price_cache, self.workspace.benchmark)
             
             # Restaurar cursor normal
             QApplication.restoreOverrideCursor()
             
             dialog.exec_()
+            
+            # O benchmark escolhido na aba Risk vale também para o relatório
+            if dialog.benchmark != self.workspace.benchmark:
+                self.workspace.benchmark = dialog.benchmark
+                self.save_workspace()
         except Exception as e:
             # Restaurar cursor normal em caso de erro
             QApplication.restoreOverrideCursor()
@@ -2486,7 +2337,14 @@ class PortfolioApp(QMainWindow):
             # Mostrar cursor de espera
             QApplication.setOverrideCursor(Qt.WaitCursor)
         
+            from nav import NAVDialog
             dialog = NAVDialog(self, self.portfolio)
+            if self.is_consolidated_view():
+                # The consolidated portfolio is rebuilt on every switch: edits must reach the accounts
+                shown = dict(self.portfolio.nav.nav_data)
+                dialog.nav_saved.connect(lambda: self.save_consolidated_nav(shown))
+            else:
+                dialog.nav_saved.connect(self.save_portfolio)
         
             # Restaurar cursor normal
             QApplication.restoreOverrideCursor()
@@ -2504,6 +2362,9 @@ class PortfolioApp(QMainWindow):
 
     def apply_stock_split(self, ticker=""):
         """Show dialog to apply a stock split to a specific ticker"""
+        if not self.check_account_selected():
+            return
+        from split_dialog import SplitDialog
         dialog = SplitDialog(self, ticker)
     
         if dialog.exec_():
@@ -2710,7 +2571,17 @@ class PortfolioApp(QMainWindow):
         for fetcher in self.fetcher_threads:
             fetcher.stop()
             fetcher.wait()  # Wait for thread to finish
+        if self.rate_fetcher is not None:
+            self.rate_fetcher.wait()
             
         # Save portfolio before closing
-        self.save_portfolio()
+        self.update_coalescer.flush()
+        self.save_accounts(self.workspace.loaded_accounts())
+        self.save_workspace()
+        # Analytics loaders stopped without waiting may still be writing to the price cache
+        analytics = sys.modules.get('data_visualization')
+        if analytics is not None and not analytics.wait_for_retired_loaders():
+            print("Downloads de histórico ainda em andamento; o cache será fechado com o processo")
+        else:
+            self.workspace.close()
         event.accept()
@@ -1,5 +1,6 @@
 import os
-from datetime import datetime
+import math
+from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -72,6 +73,14 @@ class ReportSectionsDialog(QDialog):
         self.nav_check.setChecked(True)
         sections_layout.addWidget(self.nav_check)
         
+        self.risk_check = QCheckBox("Risk Analysis")
+        self.risk_check.setChecked(True)
+        sections_layout.addWidget(self.risk_check)
+        
+        self.calendar_check = QCheckBox("Dividend Calendar")
+        self.calendar_check.setChecked(True)
+        sections_layout.addWidget(self.calendar_check)
+        
         layout.addWidget(sections_group)
         
         # Botões
@@ -88,7 +97,9 @@ class ReportSectionsDialog(QDialog):
             'holdings': self.holdings_check.isChecked(),
             'allocation': self.allocation_check.isChecked(),
             'dividend': self.dividend_check.isChecked(),
-            'nav': self.nav_check.isChecked()
+            'nav': self.nav_check.isChecked(),
+            'risk': self.risk_check.isChecked(),
+            'calendar': self.calendar_check.isChecked()
         }
 
 class PortfolioReportGenerator:
@@ -202,7 +213,9 @@ class PortfolioReportGenerator:
                 'holdings': True,
                 'allocation': True,
                 'dividend': True,
-                'nav': True
+                'nav': True,
+                'risk': True,
+                'calendar': True
             }
         
         # Definir margens mais profissionais
@@ -251,6 +264,14 @@ class PortfolioReportGenerator:
         if sections.get('nav', True):
             self.add_nav_analysis(elements)
         
+        # Adicionar análise de risco
+        if sections.get('risk', True):
+            self.add_risk_analysis(elements)
+        
+        # Adicionar calendário de dividendos dos próximos 12 meses
+        if sections.get('calendar', True):
+            self.add_dividend_calendar(elements)
+        
         # Criar o PDF com numeração de página
         doc.build(elements, onFirstPage=self.add_page_number, onLaterPages=self.add_page_number)
         
@@ -297,8 +318,9 @@ class PortfolioReportGenerator:
         """Resumo do portfólio com layout em colunas e indicadores visuais"""
         elements.append(Paragraph("Portfolio Summary", self.heading2_style))
         
-        # Obter métricas do portfólio
-        metrics = self.portfolio.calculate_portfolio_metrics()
+        # Obter métricas do portfólio (totais mantidos pelo app)
+        metrics = self.app.aggregates.metrics()
+        income = self.app.income_projection()
         
         # Introdução com informações gerais
         active_positions = len([p for p in self.portfolio.positions.values() if p.calculate_metrics()['shares'] > 0])
@@ -352,33 +374,30 @@ class PortfolioReportGenerator:
         
         data.append([
             Paragraph(profit_loss_text, self.normal_style),
-            Paragraph(f"Annual Income: <b>${metrics['total_annual_income']:,.2f}</b>", self.normal_style)
+            Paragraph(f"Annual Income: <b>${income['annual']:,.2f}</b>", self.normal_style)
         ])
         
-        # Renda mensal
-        monthly_income_usd = metrics['total_annual_income'] / 12
+        # Renda mensal, a mesma dos cards de resumo: a do próximo mês quando há calendário de dividendos
+        if income['month'] is not None:
+            from dividend_calendar import month_label
+            monthly_label = f"Income in {month_label(income['month'])}"
+        else:
+            monthly_label = "Monthly Income"
         data.append([
             Paragraph("", self.normal_style),  # Célula vazia formatada corretamente
-            Paragraph(f"Monthly Income: <b>${monthly_income_usd:,.2f}</b>", self.normal_style)
+            Paragraph(f"{monthly_label}: <b>${income['monthly']:,.2f}</b>", self.normal_style)
         ])
         
-        # Se disponível, adicione a conversão para BRL
-        try:
-            usd_brl_rate = self.app.get_usd_to_brl_rate()
-            monthly_income_brl = monthly_income_usd * usd_brl_rate
-            after_tax_monthly_income_brl = monthly_income_brl * 0.7  # 30% imposto
-            
-            data.append([
-                Paragraph("", self.normal_style),
-                Paragraph(f"Monthly Income (BRL): <b>R$ {monthly_income_brl:,.2f}</b>", self.normal_style)
-            ])
-            
-            data.append([
-                Paragraph("", self.normal_style),
-                Paragraph(f"After-tax Monthly Income (BRL): <b>R$ {after_tax_monthly_income_brl:,.2f}</b>", self.normal_style)
-            ])
-        except:
-            pass
+        # Conversão para BRL
+        data.append([
+            Paragraph("", self.normal_style),
+            Paragraph(f"{monthly_label} (BRL): <b>R$ {income['monthly_brl']:,.2f}</b>", self.normal_style)
+        ])
+        
+        data.append([
+            Paragraph("", self.normal_style),
+            Paragraph(f"After-tax {monthly_label} (BRL): <b>R$ {income['monthly_brl_after_tax']:,.2f}</b>", self.normal_style)
+        ])
         
         # Criar e estilizar a tabela
         available_width = 160*mm
@@ -1563,27 +1582,17 @@ class PortfolioReportGenerator:
                                          ('ALIGN', (0, 0), (0, 0), 'CENTER')])))
         elements.append(Spacer(1, 30*mm))
         
-        # Informações resumidas
-        metrics = self.portfolio.calculate_portfolio_metrics()
+        # Informações resumidas (totais mantidos pelo app)
+        metrics = self.app.aggregates.metrics()
+        income = self.app.income_projection()
         
         # Formatar valores para exibição destacada
         portfolio_value = f"${metrics['total_value']:,.2f}"
-        portfolio_income = f"${metrics['total_annual_income']:,.2f}"
+        portfolio_income = f"${income['annual']:,.2f}"
         portfolio_yoc = f"{metrics['portfolio_yield_on_cost']:.2f}%"
         
-        # Calcular renda mensal após impostos em BRL
-        monthly_income_usd = metrics['total_annual_income'] / 12
-        usd_brl_rate = 0
-        
-        try:
-            usd_brl_rate = self.app.get_usd_to_brl_rate()
-        except:
-            # Fallback para taxa padrão se não conseguir obter
-            usd_brl_rate = 5.0  # Taxa padrão
-        
-        monthly_income_brl = monthly_income_usd * usd_brl_rate
-        after_tax_monthly_income_brl = monthly_income_brl * 0.7  # 30% imposto
-        after_tax_monthly_brl = f"R$ {after_tax_monthly_income_brl:,.2f}"
+        # Renda mensal após impostos em BRL
+        after_tax_monthly_brl = f"R$ {income['monthly_brl_after_tax']:,.2f}"
         
         # Estilos para textos
         summary_style = ParagraphStyle(
@@ -1673,35 +1682,181 @@ class PortfolioReportGenerator:
         elements.append(Paragraph("CONFIDENTIAL DOCUMENT", confidential_style))
         elements.append(Paragraph("For personal investment planning purposes only", confidential_style))
 		
+    def add_risk_analysis(self, elements):
+        """Adiciona volatilidade, beta, drawdown e correlações das posições ao relatório"""
+        elements.append(PageBreak())
+        elements.append(Paragraph("Risk Analysis", self.heading2_style))
+        
+        from data_visualization import load_histories
+        from risk_engine import risk_report, most_correlated_pairs, benchmark_baskets, basket_history, basket_name
+        
+        # Três anos de preços diários, lidos do cache local sempre que possível
+        baskets = benchmark_baskets(self.app.workspace.benchmark) or [["VNQ"]]
+        benchmark = basket_name(baskets[0])
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=3*365)
+        jobs = []
+        weights = {}
+        for ticker, position in self.portfolio.positions.items():
+            metrics = position.calculate_metrics()
+            if metrics['shares'] > 0:
+                jobs.append((ticker, position.current_price, position.dividend_yield))
+                weights[ticker] = position.current_price * metrics['shares']
+        for ticker in baskets[0]:
+            if ticker not in weights:
+                jobs.append((ticker, 0.0, 0.0))
+        
+        risk = None
+        try:
+            histories = load_histories(jobs, start_date, end_date, self.app.workspace.price_cache)
+            # Históricos simulados não têm risco de verdade
+            histories = {ticker: history for ticker, history in histories.items() if not history.get('simulated')}
+            risk = risk_report(histories, weights, basket_history(histories, baskets[0]))
+        except Exception as e:
+            print(f"Error computing risk figures: {str(e)}")
+        
+        if risk is None:
+            elements.append(Paragraph(
+                "No market price history is available for the holdings, so risk figures could not be computed.",
+                self.normal_style
+            ))
+            return
+        
+        elements.append(Paragraph(
+            f"Figures are computed from daily returns between <b>{risk['start']}</b> and <b>{risk['end']}</b>. "
+            f"Volatility is annualized, beta is measured against <b>{benchmark}</b> and max drawdown is the "
+            f"largest fall from a previous high. The portfolio holds each REIT at its current weight.",
+            self.normal_style
+        ))
+        elements.append(Spacer(1, 8*mm))
+        
+        def beta_text(beta):
+            return "n/a" if math.isnan(beta) else f"{beta:.2f}"  # Sem histórico do benchmark
+        
+        # Tabela de risco: portfólio primeiro, depois as posições por peso
+        portfolio = risk['portfolio']
+        table_data = [["Ticker", "Weight", "Volatility", f"Beta ({benchmark})", "Max Drawdown"]]
+        table_data.append(["PORTFOLIO", "100.0%", f"{portfolio['volatility'] * 100:.1f}%",
+                           beta_text(portfolio['beta']), f"-{portfolio['max_drawdown'] * 100:.1f}%"])
+        for i in sorted(range(len(risk['tickers'])), key=lambda i: risk['weights'][i], reverse=True):
+            table_data.append([
+                risk['tickers'][i],
+                f"{risk['weights'][i] * 100:.1f}%",
+                f"{risk['volatility'][i] * 100:.1f}%",
+                beta_text(risk['beta'][i]),
+                f"-{risk['max_drawdown'][i] * 100:.1f}%"
+            ])
+        
+        available_width = 160*mm
+        risk_table = Table(table_data, colWidths=[available_width*0.2] * 5)
+        risk_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), self.brand_primary),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, 1), (-1, 1), self.brand_light_bg),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(risk_table)
+        elements.append(Spacer(1, 8*mm))
+        
+        # Pares mais correlacionados, em vez da matriz inteira
+        pairs = most_correlated_pairs(risk)
+        if pairs:
+            elements.append(Paragraph("Most Correlated Holdings", self.heading3_style))
+            elements.append(Paragraph(
+                "Holdings that move together add less diversification than their number suggests.",
+                self.normal_style
+            ))
+            elements.append(Spacer(1, 4*mm))
+            pair_data = [["Holding", "Holding", "Correlation"]]
+            pair_data += [[first, second, f"{correlation:.2f}"] for first, second, correlation in pairs]
+            pair_table = Table(pair_data, colWidths=[available_width/3.0] * 3)
+            pair_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), self.brand_primary),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ]))
+            elements.append(pair_table)
+    
+    def add_dividend_calendar(self, elements):
+        """Adiciona a previsão de dividendos mês a mês dos próximos 12 meses"""
+        elements.append(PageBreak())
+        elements.append(Paragraph("Dividend Calendar", self.heading2_style))
+        
+        from dividend_calendar import portfolio_forecast, portfolio_holdings, month_label
+        from income_rollups import BRL_TAX_RATE
+        
+        try:
+            forecast = portfolio_forecast(portfolio_holdings(self.portfolio), self.app.workspace.price_cache)
+        except Exception as e:
+            print(f"Error computing dividend forecast: {str(e)}")
+            forecast = None
+        
+        if forecast is None or not forecast['annual']:
+            elements.append(Paragraph("No dividends are expected from the current holdings.", self.normal_style))
+            return
+        
+        usd_brl_rate = self.app.income_projection()['usd_brl_rate']
+        elements.append(Paragraph(
+            f"Dividends expected in the next 12 months: <b>${forecast['annual']:,.2f}</b>. "
+            f"Each REIT is projected from its recent dividends (how often it pays, the months it pays in "
+            f"and its last amount) on the shares held today. Net amounts in BRL use a rate of "
+            f"<b>R$ {usd_brl_rate:.2f}</b> and a {BRL_TAX_RATE * 100:.0f}% tax.",
+            self.normal_style
+        ))
+        if forecast['estimated'].any():
+            estimated = [ticker for ticker, flag in zip(forecast['tickers'], forecast['estimated']) if flag]
+            elements.append(Paragraph(
+                f"<i>No dividend history is cached yet for {', '.join(estimated)}; "
+                f"their annual dividend is spread evenly over the months.</i>",
+                self.caption_style
+            ))
+        elements.append(Spacer(1, 8*mm))
+        
+        # Uma linha por mês, com os REITs que pagam nele, do maior para o menor valor
+        table_data = [["Month", "Income (USD)", "Net Income (BRL)", "Paid by"]]
+        income = forecast['income']
+        for column, month in enumerate(forecast['months']):
+            total = forecast['total'][column]
+            payers = [forecast['tickers'][i] for i in income[:, column].argsort()[::-1] if income[i, column] > 0]
+            paid_by = ", ".join(payers[:6]) + (f" +{len(payers) - 6} more" if len(payers) > 6 else "")
+            table_data.append([
+                month_label(month),
+                f"${total:,.2f}",
+                f"R$ {total * usd_brl_rate * (1 - BRL_TAX_RATE):,.2f}",
+                Paragraph(paid_by, self.normal_style)
+            ])
+        table_data.append(["TOTAL", f"${forecast['annual']:,.2f}",
+                           f"R$ {forecast['annual'] * usd_brl_rate * (1 - BRL_TAX_RATE):,.2f}", ""])
+        
+        available_width = 160*mm
+        calendar_table = Table(table_data, colWidths=[available_width*0.15, available_width*0.18,
+                                                      available_width*0.2, available_width*0.47])
+        calendar_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), self.brand_primary),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), self.brand_light_bg),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('ALIGN', (0, 0), (2, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(calendar_table)
+    
     def add_nav_analysis(self, elements):
         """Adiciona seção de análise de NAV (Net Asset Value) ao relatório"""
         elements.append(PageBreak())
         elements.append(Paragraph("NAV Analysis", self.heading2_style))
         
-        # Verificar se temos dados de NAV para análise
-        nav_data = {}
-        nav_report_date = ""
-        
-        # Verificar se a aplicação tem dados de NAV
-        if hasattr(self.app, 'nav_data') and self.app.nav_data:
-            nav_data = self.app.nav_data
-            if hasattr(self.app, 'nav_report_date'):
-                nav_report_date = self.app.nav_report_date
-        else:
-            # Tentar carregar do arquivo diretamente
-            try:
-                import os
-                import json
-                portfolio_file = "reit_portfolio.json"
-                if os.path.exists(portfolio_file):
-                    with open(portfolio_file, 'r') as f:
-                        data = json.load(f)
-                    if 'nav_data' in data:
-                        nav_data = data['nav_data']
-                    if 'nav_report_date' in data:
-                        nav_report_date = data['nav_report_date']
-            except:
-                pass
+        # Os dados de NAV fazem parte do modelo do portfólio
+        nav_data = self.portfolio.nav.nav_data
+        nav_report_date = self.portfolio.nav.report_date
         
         # Se não há dados de NAV, exibir mensagem e retornar
         if not nav_data:
@@ -0,0 +1,225 @@
+import numpy as np
+
+# Used to annualize daily volatility
+TRADING_DAYS = 252
+
+# Common daily returns needed before a beta or a correlation is reported
+MIN_OVERLAP = 20
+
+
+def aligned_closes(histories, tickers):
+    """(dates, closes) with one column per ticker on the union of their dates.
+
+    A ticker keeps its last close on days it has no point, and is NaN
+    before its first one.
+    """
+    dates = np.unique(np.concatenate([histories[ticker]['dates'] for ticker in tickers]))
+    closes = np.full((len(dates), len(tickers)), np.nan)
+    for column, ticker in enumerate(tickers):
+        history = histories[ticker]
+        closes[np.searchsorted(dates, history['dates']), column] = history['price']
+
+    # Forward fill: every cell takes the row of the last valid close above it
+    rows = np.where(np.isnan(closes), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return dates, closes[rows, np.arange(len(tickers))]
+
+
+def daily_returns(closes):
+    """Simple daily returns of each column; NaN where a close is missing"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return closes[1:] / closes[:-1] - 1.0
+
+
+def pairwise_moments(x, y):
+    """(count, covariance, variance of x, variance of y) for every column pair.
+
+    x is (days x n) and y (days x m), with NaN where there is no return.
+    Each pair uses the days both columns have, and everything comes out of
+    a few matrix products, so n x m pairs cost about as much as one.
+    """
+    x_valid = ~np.isnan(x)
+    y_valid = ~np.isnan(y)
+    x0 = np.where(x_valid, x, 0.0)
+    y0 = np.where(y_valid, y, 0.0)
+    xv = x_valid.astype(float)
+    yv = y_valid.astype(float)
+
+    count = xv.T @ yv
+    sum_x = x0.T @ yv
+    sum_y = xv.T @ y0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = sum_x / count
+        mean_y = sum_y / count
+        covariance = (x0.T @ y0 - count * mean_x * mean_y) / (count - 1)
+        variance_x = ((x0 * x0).T @ yv - count * mean_x ** 2) / (count - 1)
+        variance_y = (xv.T @ (y0 * y0) - count * mean_y ** 2) / (count - 1)
+    return count, covariance, variance_x, variance_y
+
+
+def correlation_matrix(returns):
+    """Pairwise correlation of the return columns; NaN with too few common days"""
+    count, covariance, variance_x, variance_y = pairwise_moments(returns, returns)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.sqrt(variance_x * variance_y)
+    correlation[count < MIN_OVERLAP] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def betas(returns, benchmark_returns):
+    """Beta of each return column against a benchmark return series"""
+    count, covariance, _, variance = pairwise_moments(returns, benchmark_returns[:, None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = (covariance / variance)[:, 0]
+    beta[count[:, 0] < MIN_OVERLAP] = np.nan
+    return beta
+
+
+def volatility(returns):
+    """Annualized volatility of each return column"""
+    valid = ~np.isnan(returns)
+    count = valid.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(valid, returns, 0.0).sum(axis=0) / count
+        squares = np.where(valid, (returns - mean) ** 2, 0.0).sum(axis=0)
+        daily = np.sqrt(squares / (count - 1))
+    return np.where(count > 1, daily * np.sqrt(TRADING_DAYS), np.nan)
+
+
+def max_drawdown(closes):
+    """Largest fall from a previous peak of each column, as a fraction (0.25 = -25%)"""
+    peaks = np.fmax.accumulate(closes, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = 1.0 - closes / peaks
+    drawdowns[np.isnan(drawdowns)] = 0.0
+    return drawdowns.max(axis=0) if len(drawdowns) else np.zeros(closes.shape[1])
+
+
+def weighted_returns(returns, weights):
+    """Daily returns of a portfolio holding the columns in fixed weights.
+
+    On days a column has no return its weight is spread over the others.
+    """
+    valid = ~np.isnan(returns)
+    weight_sum = valid @ weights
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(weight_sum > 0, np.where(valid, returns, 0.0) @ weights / weight_sum, np.nan)
+
+
+def risk_report(histories, weights, benchmark_history=None):
+    """Volatility, beta, drawdown and correlations of the holdings and the portfolio.
+
+    histories maps a ticker to its {'dates', 'price'} arrays and weights a
+    ticker to its current value; the portfolio is the holdings in those
+    weights. Betas are measured against benchmark_history when given.
+    Returns None when no holding has enough history.
+    """
+    tickers = [ticker for ticker in weights
+               if ticker in histories and len(histories[ticker]['dates']) > 1]
+    if not tickers:
+        return None
+    columns = dict(histories)
+    has_benchmark = benchmark_history is not None and len(benchmark_history['dates']) > 1
+    if has_benchmark:
+        columns[None] = benchmark_history
+    dates, closes = aligned_closes(columns, tickers + ([None] if has_benchmark else []))
+    returns = daily_returns(closes)
+
+    holding_weights = np.array([weights[ticker] for ticker in tickers], dtype=float)
+    holding_returns = returns[:, :len(tickers)]
+    portfolio_returns = weighted_returns(holding_returns, holding_weights)
+    portfolio_index = np.concatenate([[1.0], np.cumprod(1.0 + np.nan_to_num(portfolio_returns))])
+
+    if has_benchmark:
+        all_betas = betas(np.column_stack([holding_returns, portfolio_returns]), returns[:, -1])
+    else:
+        all_betas = np.full(len(tickers) + 1, np.nan)
+
+    return {
+        'tickers': tickers,
+        'start': dates[0],
+        'end': dates[-1],
+        'weights': holding_weights / holding_weights.sum() if holding_weights.sum() > 0 else holding_weights,
+        'volatility': volatility(holding_returns),
+        'beta': all_betas[:-1],
+        'max_drawdown': max_drawdown(closes[:, :len(tickers)]),
+        'correlation': correlation_matrix(holding_returns),
+        'portfolio': {
+            'volatility': float(volatility(portfolio_returns[:, None])[0]),
+            'beta': float(all_betas[-1]),
+            'max_drawdown': float(max_drawdown(portfolio_index[:, None])[0]),
+        },
+    }
+
+
+def most_correlated_pairs(report, count=10):
+    """[(ticker_a, ticker_b, correlation)] of the most correlated holdings"""
+    correlation = report['correlation']
+    rows, columns = np.triu_indices(len(report['tickers']), k=1)
+    values = correlation[rows, columns]
+    keep = ~np.isnan(values)
+    rows, columns, values = rows[keep], columns[keep], values[keep]
+    order = np.argsort(values)[::-1][:count]
+    return [(report['tickers'][rows[i]], report['tickers'][columns[i]], float(values[i])) for i in order]
+
+
+def benchmark_baskets(spec):
+    """Benchmarks of a spec like "VNQ, SCHH, O+PLD+SPG", as one ticker list each.
+
+    Commas separate benchmarks; tickers joined by '+' form an equal-weight
+    basket that is compared as a single index.
+    """
+    baskets = []
+    for part in spec.split(','):
+        tickers = [ticker.strip().upper() for ticker in part.split('+') if ticker.strip()]
+        if tickers and tickers not in baskets:
+            baskets.append(tickers)
+    return baskets
+
+
+def basket_name(tickers):
+    return '+'.join(tickers)
+
+
+def basket_history(histories, tickers):
+    """{'dates', 'price'} of a benchmark basket; None when none of its tickers has history.
+
+    A single ticker is its own history. Several tickers are held in equal
+    weights, rebalanced daily, as an index starting at 100.
+    """
+    tickers = [ticker for ticker in tickers if ticker in histories and len(histories[ticker]['dates']) > 1]
+    if not tickers:
+        return None
+    if len(tickers) == 1:
+        return histories[tickers[0]]
+    dates, closes = aligned_closes(histories, tickers)
+    returns = weighted_returns(daily_returns(closes), np.ones(len(tickers)))
+    index = 100.0 * np.concatenate([[1.0], np.cumprod(1.0 + np.nan_to_num(returns))])
+    return {'dates': dates, 'price': index}
+
+
+def compare_to_benchmark(dates, returns, benchmark):
+    """Cumulative return of a portfolio and of a benchmark on the portfolio's dates.
+
+    returns are the portfolio's daily returns on dates; the first date is
+    the base of the comparison. The benchmark's closes are carried onto the
+    same dates, so both series share one date index. The tracking error is
+    the annualized volatility of the daily return difference.
+    """
+    position = np.searchsorted(benchmark['dates'], dates, side='right') - 1
+    closes = np.where(position >= 0, benchmark['price'][np.maximum(position, 0)], np.nan)
+    benchmark_returns = daily_returns(closes[:, None])[:, 0]
+
+    portfolio_growth = np.concatenate([[0.0], np.cumprod(1.0 + np.nan_to_num(returns[1:])) - 1.0])
+    valid = np.flatnonzero(~np.isnan(closes))
+    base = closes[valid[0]] if len(valid) else np.nan
+    benchmark_growth = closes / base - 1.0
+
+    active = returns[1:] - benchmark_returns
+    tracking_error = volatility(active[:, None])[0] if len(active) else np.nan
+    return {
+        'portfolio': portfolio_growth,
+        'benchmark': benchmark_growth,
+        'relative': portfolio_growth[-1] - benchmark_growth[-1],
+        'tracking_error': float(tracking_error),
+    }
@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Versions of the portfolio file format:
+#   1 - legacy files without a version field (transactions inline)
+#   2 - 'schema_version' field, per-position 'summary' rows and top-level NAV data
+SCHEMA_VERSION = 2
+
+# Default value for every position field that older files may be missing
+POSITION_DEFAULTS = {
+    'name': '',
+    'current_price': 0.0,
+    'dividend_yield': 0.0,
+    'annual_dividend': 0.0,
+    'alreits_score': 0,
+    'consensus_nav': 0.0,
+    'dividend_growth_3y': 0.0,
+    'dividend_growth_5y': 0.0,
+}
+
+
+def upgrade_position(record):
+    """Return a copy of a position record with every current field present"""
+    upgraded = dict(POSITION_DEFAULTS)
+    upgraded.update(record)
+    for key, default in POSITION_DEFAULTS.items():
+        if upgraded[key] is None:
+            upgraded[key] = default
+    return upgraded
+
+
+def read_version(path):
+    """Read the schema version of a portfolio file without loading it"""
+    if ijson is None:
+        with open(path, 'r') as f:
+            return json.load(f).get('schema_version', 1)
+
+    with open(path, 'rb') as f:
+        # The version is written before the positions, so this usually stops early
+        for prefix, event, value in ijson.parse(f):
+            if prefix == 'schema_version' and event == 'number':
+                return int(value)
+    return 1
+
+
+class MigrationStats:
+    """Counters collected while migrating a file"""
+
+    def __init__(self, source_bytes):
+        self.source_bytes = source_bytes
+        self.positions = 0
+        self.transactions = 0
+        self.seconds = 0.0
+
+    def summary(self):
+        seconds = max(self.seconds, 1e-6)
+        megabytes = self.source_bytes / (1024 * 1024)
+        return (f"Migrated {self.positions} positions / {self.transactions:,} transactions "
+                f"({megabytes:.1f} MB) in {self.seconds:.2f} s - "
+                f"{megabytes / seconds:.1f} MB/s, {self.transactions / seconds:,.0f} transactions/s")
+
+
+class StreamingMigrator:
+    """Upgrade a portfolio file to the current schema one position at a time.
+
+    The source is parsed incrementally with ijson and the result is written
+    as it goes, so memory use is bounded by the largest single position rather
+    than the size of the file.
+    """
+
+    def __init__(self, source_path):
+        self.source_path = source_path
+
+    def records(self):
+        """Yield ('position', ticker, record) and ('meta', key, value) tuples"""
+        if ijson is None:
+            with open(self.source_path, 'r') as f:
+                data = json.load(f)
+            for key, value in data.items():
+                if key == 'positions':
+                    for ticker, record in value.items():
+                        yield 'position', ticker, record
+                else:
+                    yield 'meta', key, value
+            return
+
+        # Positions are built one at a time by ijson's native backend
+        with open(self.source_path, 'rb') as f:
+            for ticker, record in ijson.kvitems(f, 'positions', use_float=True):
+                yield 'position', ticker, record
+
+        # Every other top-level value is small; they are rebuilt in one more pass that skips 'positions'
+        with open(self.source_path, 'rb') as f:
+            key, builder = None, None
+            for prefix, event, value in ijson.parse(f, use_float=True):
+                if prefix == '':
+                    # A new top-level key (or the end of the file) completes the previous value
+                    if builder is not None and event in ('map_key', 'end_map'):
+                        yield 'meta', key, builder.value
+                    if event == 'map_key':
+                        key = value
+                        builder = None if key == 'positions' else ijson.ObjectBuilder()
+                    continue
+                if builder is not None:
+                    builder.event(event, value)
+
+    def migrate(self, dest_path, summarize=None, ledger_writer=None):
+        """Write the upgraded portfolio to dest_path and return MigrationStats.
+
+        summarize(record) returns the summary row for a position. When
+        ledger_writer(ticker, transactions) is given, transactions are handed
+        to it instead of being written inline.
+        """
+        stats = MigrationStats(os.path.getsize(self.source_path))
+        start_time = time.perf_counter()
+        meta = {}
+        tmp_path = f"{dest_path}.migrating"
+
+        with open(tmp_path, 'w') as out:
+            out.write('{\n  "schema_version": %d,\n  "positions": {' % SCHEMA_VERSION)
+            first = True
+            for kind, key, value in self.records():
+                if kind == 'meta':
+                    meta[key] = value
+                    continue
+
+                record = upgrade_position(value)
+                transactions = record.get('transactions', [])
+                if summarize is not None:
+                    record['summary'] = summarize(record)
+                if ledger_writer is not None:
+                    ledger_writer(key, record.pop('transactions', []))
+
+                out.write(('' if first else ',') + '\n    ' + json.dumps(key) + ': ' + json.dumps(record))
+                first = False
+                stats.positions += 1
+                stats.transactions += len(transactions)
+
+            out.write('\n  }')
+            meta.pop('schema_version', None)
+            for key, value in meta.items():
+                out.write(',\n  ' + json.dumps(key) + ': ' + json.dumps(value, indent=2))
+            out.write('\n}\n')
+
+        os.replace(tmp_path, dest_path)
+        stats.seconds = time.perf_counter() - start_time
+        return stats
+
+
+if __name__ == "__main__":
+    # Upgrade a portfolio file from the command line:
+    #   python schema.py legacy_portfolio.json upgraded_portfolio.json
+    if len(sys.argv) != 3:
+        print("Usage: python schema.py <source.json> <destination.json>")
+        sys.exit(1)
+
+    print(f"Source schema version: {read_version(sys.argv[1])}")
+    migration_stats = StreamingMigrator(sys.argv[1]).migrate(sys.argv[2])
+    print(migration_stats.summary())
@@ -0,0 +1,134 @@
+import os
+import json
+import shutil
+import threading
+from schema import SCHEMA_VERSION, StreamingMigrator, read_version
+
+
+class NAVRepository:
+    """In-memory owner of the Consensus NAV values and their report date"""
+
+    def __init__(self, nav_data=None, report_date=""):
+        self.nav_data = dict(nav_data or {})
+        self.report_date = report_date or ""
+
+    def get(self, ticker, default=0.0):
+        return self.nav_data.get(ticker, default)
+
+    def has_data(self):
+        return bool(self.nav_data)
+
+    def update(self, nav_data, report_date=None):
+        """Replace the NAV values (and optionally the report date)"""
+        self.nav_data = dict(nav_data)
+        if report_date is not None:
+            self.report_date = report_date
+
+    def to_dict(self):
+        return {
+            'nav_data': dict(self.nav_data),
+            'nav_report_date': self.report_date
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('nav_data', {}), data.get('nav_report_date', ''))
+
+
+class PortfolioStorage:
+    """Single point of access to the portfolio file on disk.
+
+    Every read and write of the portfolio file goes through this class, so
+    concurrent saves are serialized and the file is always replaced atomically.
+
+    With lazy_transactions enabled, each position's transactions are kept in
+    its own ledger file and the portfolio file only stores per-position
+    summary rows, so loading no longer depends on the size of the ledger.
+    """
+
+    def __init__(self, path, lazy_transactions=False):
+        self.path = path
+        self.lazy_transactions = lazy_transactions
+        self.ledger_dir = f"{os.path.splitext(path)[0]}_ledger"
+        self._lock = threading.RLock()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def read(self):
+        """Read and parse the portfolio file"""
+        with self._lock:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+
+    def write(self, data):
+        """Write the data to a temporary file and atomically swap it in"""
+        with self._lock:
+            self._write_json(self.path, data, indent=2)
+
+    def save(self, portfolio):
+        with self._lock:
+            if not self.lazy_transactions:
+                self.write(portfolio.to_dict())
+                return
+
+            # Only ledgers that were loaded can have changed
+            for ticker, position in portfolio.positions.items():
+                if position.transactions_loaded():
+                    self.write_ledger(ticker, [t.to_dict() for t in position.transactions])
+            self._remove_stale_ledgers(portfolio.positions.keys())
+            self.write(portfolio.to_dict(include_transactions=False))
+
+    def ledger_path(self, ticker):
+        safe_ticker = ticker.replace(os.sep, '_').replace('/', '_')
+        return os.path.join(self.ledger_dir, f"{safe_ticker}.json")
+
+    def read_ledger(self, ticker):
+        """Return the transaction dicts stored for a ticker"""
+        path = self.ledger_path(ticker)
+        with self._lock:
+            if not os.path.exists(path):
+                return []
+            with open(path, 'r') as f:
+                return json.load(f)
+
+    def write_ledger(self, ticker, transactions):
+        with self._lock:
+            os.makedirs(self.ledger_dir, exist_ok=True)
+            self._write_json(self.ledger_path(ticker), transactions)
+
+    def _remove_stale_ledgers(self, tickers):
+        if not os.path.isdir(self.ledger_dir):
+            return
+        keep = {os.path.basename(self.ledger_path(ticker)) for ticker in tickers}
+        for file_name in os.listdir(self.ledger_dir):
+            if file_name.endswith('.json') and file_name not in keep:
+                os.remove(os.path.join(self.ledger_dir, file_name))
+
+    def _write_json(self, path, data, indent=None):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=indent)
+        os.replace(tmp_path, path)
+
+    def needs_migration(self, path=None):
+        return read_version(path or self.path) < SCHEMA_VERSION
+
+    def migrate_from(self, source_path, summarize):
+        """Stream a (possibly legacy) portfolio file into this storage.
+
+        Returns the MigrationStats with the throughput of the migration.
+        """
+        ledger_writer = self.write_ledger if self.lazy_transactions else None
+        with self._lock:
+            if os.path.abspath(source_path) == os.path.abspath(self.path):
+                # Upgrading in place: keep the original file around
+                shutil.copyfile(source_path, f"{self.path}.v{read_version(source_path)}.bak")
+            return StreamingMigrator(source_path).migrate(self.path, summarize, ledger_writer)
+
+    def backup(self):
+        """Move the current file aside (used when it can't be parsed)"""
+        backup_file = f"{self.path}.bak"
+        with self._lock:
+            os.replace(self.path, backup_file)
+        return backup_file
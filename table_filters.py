@@ -0,0 +1,10 @@
+def ticker_matches(ticker, text):
+    """Fuzzy ticker search: the letters typed must appear in the ticker in order.
+
+    Prefixes and substrings match as well ("rea" and "alt" both find "REALTY"),
+    and so do abbreviations such as "rty" for "REALTY".
+    """
+    if not text:
+        return True
+    remaining = iter(ticker.lower())
+    return all(char in remaining for char in text.lower())
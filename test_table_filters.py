@@ -0,0 +1,13 @@
+from table_filters import ticker_matches
+
+
+def test_ticker_matches_docstring_examples():
+    assert ticker_matches("REALTY", "rea")
+    assert ticker_matches("REALTY", "alt")
+    assert ticker_matches("REALTY", "rty")
+
+
+def test_ticker_matches_needs_letters_in_order():
+    assert not ticker_matches("REALTY", "o")
+    assert not ticker_matches("REALTY", "ytr")
+    assert ticker_matches("REALTY", "")
@@ -1,10 +1,10 @@
 import sys
 from datetime import datetime
-from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableWidget,
-                            QTableWidgetItem, QPushButton, QHeaderView, QLabel,
-                            QComboBox, QApplication)
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QTableView,
+                            QPushButton, QHeaderView, QLabel, QLineEdit,
+                            QComboBox, QDateEdit, QApplication)
 from PyQt5.QtCore import Qt, QDate, pyqtSignal, QTimer
-from PyQt5.QtGui import QColor
+from ledger_model import LedgerTableModel, DATE_COLUMN
 
 class TransactionHistoryDialog(QDialog):
     transaction_deleted = pyqtSignal(int, str)  # index, ticker
@@ -15,6 +15,8 @@ class TransactionHistoryDialog(QDialog):
         self.setMinimumSize(800, 500)
         self.portfolio = portfolio
         
+        self.date_filters_set = False
+        
         # Create UI
         self.init_ui()
         self.load_transactions()
@@ -34,26 +36,52 @@ class TransactionHistoryDialog(QDialog):
         self.ticker_combo.currentTextChanged.connect(self.filter_transactions)
         filter_layout.addWidget(self.ticker_combo)
         
+        filter_layout.addWidget(QLabel("Search:"))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Ticker")
+        self.search_edit.setMaximumWidth(120)
+        self.search_edit.textChanged.connect(self.filter_transactions)
+        filter_layout.addWidget(self.search_edit)
+        
         filter_layout.addWidget(QLabel("Filter by type:"))
         self.type_combo = QComboBox()
         self.type_combo.addItems(["All", "BUY", "SELL", "NO_COST"])
         self.type_combo.currentTextChanged.connect(self.filter_transactions)
         filter_layout.addWidget(self.type_combo)
         
+        filter_layout.addWidget(QLabel("From:"))
+        self.start_date_edit = QDateEdit()
+        self.start_date_edit.setCalendarPopup(True)
+        self.start_date_edit.setDisplayFormat("yyyy-MM-dd")
+        self.start_date_edit.dateChanged.connect(self.filter_transactions)
+        filter_layout.addWidget(self.start_date_edit)
+        
+        filter_layout.addWidget(QLabel("To:"))
+        self.end_date_edit = QDateEdit()
+        self.end_date_edit.setCalendarPopup(True)
+        self.end_date_edit.setDisplayFormat("yyyy-MM-dd")
+        self.end_date_edit.dateChanged.connect(self.filter_transactions)
+        filter_layout.addWidget(self.end_date_edit)
+        
         filter_layout.addStretch()
         
         layout.addLayout(filter_layout)
         
-        # Transactions table
-        self.transactions_table = QTableWidget()
-        self.transactions_table.setColumnCount(6)
-        self.transactions_table.setHorizontalHeaderLabels([
-            "Date", "Ticker", "Type", "Shares", "Price", "Total Cost"
-        ])
+        # Transactions table (rows come from the ledger model, sorted and filtered there)
+        self.transactions_model = LedgerTableModel(self)
+        self.transactions_table = QTableView()
+        self.transactions_table.setModel(self.transactions_model)
         self.transactions_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.transactions_table.horizontalHeader().setSortIndicator(DATE_COLUMN, Qt.DescendingOrder)
+        self.transactions_table.setSortingEnabled(True)
         self.transactions_table.verticalHeader().setVisible(False)
+        self.transactions_table.setSelectionBehavior(QTableView.SelectRows)
         layout.addWidget(self.transactions_table)
         
+        # Totals of the filtered transactions
+        self.totals_label = QLabel()
+        layout.addWidget(self.totals_label)
+        
         # Buttons
         button_layout = QHBoxLayout()
         
@@ -72,83 +100,45 @@ class TransactionHistoryDialog(QDialog):
         self.setLayout(layout)
         
     def load_transactions(self):
-        self.transactions = []
-        self.transactions_table.setRowCount(0)
-        
         if not self.portfolio:
             return
-            
-        # Collect all transactions from all positions
-        for ticker, position in self.portfolio.positions.items():
-            for i, transaction in enumerate(position.transactions):
-                self.transactions.append((i, ticker, transaction))
-        
-        # Sort by date, newest first
-        self.transactions.sort(key=lambda x: x[2].date, reverse=True)
         
-        # Add to table
-        self.add_transactions_to_table(self.transactions)
-            
-    def add_transactions_to_table(self, transactions):
-        self.transactions_table.setRowCount(0)
-        
-        for row, (idx, ticker, transaction) in enumerate(transactions):
-            self.transactions_table.insertRow(row)
-            
-            # Date
-            date_item = QTableWidgetItem(transaction.date.strftime('%Y-%m-%d'))
-            date_item.setTextAlignment(Qt.AlignCenter)
-            self.transactions_table.setItem(row, 0, date_item)
-            
-            # Ticker
-            ticker_item = QTableWidgetItem(ticker)
-            ticker_item.setTextAlignment(Qt.AlignCenter)
-            self.transactions_table.setItem(row, 1, ticker_item)
-            
-            # Type
-            type_item = QTableWidgetItem(transaction.type)
-            type_item.setTextAlignment(Qt.AlignCenter)
-            if transaction.type == "BUY":
-                type_item.setForeground(QColor("green"))
-            elif transaction.type == "SELL":
-                type_item.setForeground(QColor("red"))
-            else:
-                type_item.setForeground(QColor("blue"))
-            self.transactions_table.setItem(row, 2, type_item)
-            
-            # Shares
-            shares_item = QTableWidgetItem(f"{transaction.shares:.3f}")
-            shares_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.transactions_table.setItem(row, 3, shares_item)
-            
-            # Price
-            price_item = QTableWidgetItem(f"${transaction.price:.2f}")
-            price_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.transactions_table.setItem(row, 4, price_item)
-            
-            # Total
-            total = transaction.price * transaction.shares
-            total_item = QTableWidgetItem(f"${total:.2f}")
-            total_item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.transactions_table.setItem(row, 5, total_item)
-            
-            # Store the transaction index
-            for col in range(6):
-                item = self.transactions_table.item(row, col)
-                item.setData(Qt.UserRole, (idx, ticker))
+        self.transactions_model.load(self.portfolio)
+        
+        # The date filters start out covering the whole ledger
+        date_range = self.transactions_model.date_range()
+        if date_range and not self.date_filters_set:
+            self.date_filters_set = True
+            for date_edit in (self.start_date_edit, self.end_date_edit):
+                date_edit.blockSignals(True)
+                date_edit.setDateRange(QDate(date_range[0]), QDate(date_range[1]))
+                date_edit.blockSignals(False)
+            self.start_date_edit.setDate(QDate(date_range[0]))
+            self.end_date_edit.setDate(QDate(date_range[1]))
+        self.filter_transactions()
     
     def filter_transactions(self):
         ticker_filter = self.ticker_combo.currentText()
         type_filter = self.type_combo.currentText()
         
-        filtered_transactions = []
-        
-        for idx, ticker, transaction in self.transactions:
-            if (ticker_filter == "All" or ticker == ticker_filter) and \
-               (type_filter == "All" or transaction.type == type_filter):
-                filtered_transactions.append((idx, ticker, transaction))
-        
-        self.add_transactions_to_table(filtered_transactions)
+        self.transactions_model.set_filters(
+            ticker=None if ticker_filter == "All" else ticker_filter,
+            search_text=self.search_edit.text(),
+            transaction_type=None if type_filter == "All" else type_filter,
+            start_date=self.start_date_edit.date().toPyDate(),
+            end_date=self.end_date_edit.date().toPyDate()
+        )
+        self.update_totals()
+    
+    def update_totals(self):
+        totals = self.transactions_model.totals()
+        buy, sell, no_cost = totals['BUY'], totals['SELL'], totals['NO_COST']
+        self.totals_label.setText(
+            f"{totals['count']:,} transactions  |  "
+            f"Bought {buy['shares']:,.3f} shares for ${buy['amount']:,.2f}  |  "
+            f"Sold {sell['shares']:,.3f} shares for ${sell['amount']:,.2f}  |  "
+            f"No cost {no_cost['shares']:,.3f} shares"
+        )
     
     def delete_transaction(self):
         selected_rows = self.transactions_table.selectedIndexes()
@@ -159,18 +149,15 @@ class TransactionHistoryDialog(QDialog):
         rows = set(index.row() for index in selected_rows)
         
         # Collect transaction indices and tickers
-        to_delete = []
-        for row in rows:
-            idx_ticker = self.transactions_table.item(row, 0).data(Qt.UserRole)
-            to_delete.append(idx_ticker)
+        to_delete = [self.transactions_model.transaction_ref(row) for row in rows]
         
-        # Signal to parent to delete these transactions
-        for idx, ticker in to_delete:
+        # Signal to parent to delete these transactions (highest index first, so
+        # the remaining indices of the same position stay valid)
+        for idx, ticker in sorted(to_delete, reverse=True):
             self.transaction_deleted.emit(idx, ticker)
         
         # Reload transactions
         self.load_transactions()
-        self.filter_transactions()
 
 if __name__ == "__main__":
     # Test the dialog
@@ -0,0 +1,36 @@
+from PyQt5.QtCore import QObject, QTimer
+
+# Roughly three frames at 60 Hz: short enough to feel immediate
+DEFAULT_INTERVAL_MS = 50
+
+
+class UpdateCoalescer(QObject):
+    """Collects updates that arrive in bursts and applies them in one batch.
+
+    Updates are keyed (for example by ticker), so a newer value replaces one
+    still waiting. The first update of a batch starts a single-shot timer;
+    when it fires, apply_batch(updates) is called once with everything that
+    was collected in the meantime.
+    """
+
+    def __init__(self, apply_batch, interval_ms=DEFAULT_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.apply_batch = apply_batch
+        self._pending = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def add(self, key, value):
+        self._pending[key] = value
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """Apply whatever is pending right away"""
+        self._timer.stop()
+        if not self._pending:
+            return
+        updates, self._pending = self._pending, {}
+        self.apply_batch(updates)
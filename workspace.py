@@ -0,0 +1,215 @@
+import os
+import re
+import json
+from storage import PortfolioStorage
+from history_store import SnapshotStore, PriceHistoryCache
+
+WORKSPACE_FILE = "reit_workspace.json"
+
+# Name shown for the read-only view that aggregates every account
+CONSOLIDATED_VIEW = "All Accounts"
+
+# Daily prices shared by every account, next to the workspace file
+PRICE_CACHE_FILE = "reit_price_history.db"
+
+# Index that betas and benchmark comparisons are measured against
+DEFAULT_BENCHMARK = "VNQ"
+
+
+class MarketDataCache:
+    """Quotes, dividends and scores shared by every account, keyed by ticker"""
+
+    def __init__(self):
+        self.quotes = {}  # ticker -> last data dict emitted by StockDataFetcher
+        self.scores = {}  # ticker -> alreits score
+
+    def update_quote(self, data):
+        self.quotes[data['ticker']] = dict(data)
+
+    def update_score(self, ticker, score):
+        self.scores[ticker] = score
+
+    @staticmethod
+    def apply_quote(position, data):
+        """Copy a fetched quote into a position"""
+        price = data['price']
+        annual_dividend = data.get('annual_dividend', 0.0)
+        position.current_price = price
+        # Atualizar o dividend_yield com base no preço atual e no annual_dividend
+        if annual_dividend > 0 and price > 0:
+            position.dividend_yield = (annual_dividend / price) * 100
+        else:
+            # Fallback para o valor fornecido pela API
+            position.dividend_yield = data['dividend_yield']
+
+        company_name = data.get('company_name', '')
+        if not position.name and company_name:
+            position.name = company_name
+        if annual_dividend:
+            position.annual_dividend = annual_dividend
+
+        position.dividend_growth_3y = data.get('dividend_growth_3y', 0.0)
+        position.dividend_growth_5y = data.get('dividend_growth_5y', 0.0)
+
+    def apply_cached(self, position):
+        """Bring a position up to date with whatever is already cached"""
+        if position.ticker in self.quotes:
+            self.apply_quote(position, self.quotes[position.ticker])
+        if position.ticker in self.scores:
+            position.alreits_score = self.scores[position.ticker]
+
+
+class Account:
+    """One portfolio of the workspace together with its files"""
+
+    def __init__(self, name, path, lazy_transactions=False):
+        self.name = name
+        self.path = path
+        self.storage = PortfolioStorage(path, lazy_transactions=lazy_transactions)
+        self.history_store = SnapshotStore.for_portfolio(path)
+        self.portfolio = None  # Loaded by the application
+
+    def to_dict(self):
+        return {'name': self.name, 'file': self.path}
+
+
+class Workspace:
+    """Several accounts open at once, sharing a single market data cache.
+
+    The list of accounts is kept in WORKSPACE_FILE. Without that file the
+    workspace holds a single account backed by the default portfolio file,
+    so existing installs keep working unchanged.
+    """
+
+    def __init__(self, path=WORKSPACE_FILE, lazy_transactions=False):
+        self.path = path
+        self.lazy_transactions = lazy_transactions
+        self.accounts = {}  # name -> Account, in display order
+        self.active_name = None
+        self.market_data = MarketDataCache()
+        self.benchmark = DEFAULT_BENCHMARK
+        self._price_cache = None
+
+    @classmethod
+    def load(cls, path, default_file, lazy_transactions=False):
+        workspace = cls(path, lazy_transactions)
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Error reading workspace file {path}: {str(e)}")
+
+        for entry in data.get('accounts', []):
+            workspace.add_account(entry['name'], entry['file'])
+        if not workspace.accounts:
+            workspace.add_account("Main", default_file)
+
+        workspace.benchmark = data.get('benchmark') or DEFAULT_BENCHMARK
+        active = data.get('active')
+        workspace.active_name = active if active in workspace.accounts else next(iter(workspace.accounts))
+        return workspace
+
+    def save(self):
+        data = {
+            'accounts': [account.to_dict() for account in self.accounts.values()],
+            'active': self.active_name,
+            'benchmark': self.benchmark
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add_account(self, name, path=None):
+        if name in self.accounts or name == CONSOLIDATED_VIEW:
+            raise ValueError(f"Account '{name}' already exists")
+        if path is None:
+            slug = re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_') or 'account'
+            path = f"reit_portfolio_{slug}.json"
+        account = Account(name, path, self.lazy_transactions)
+        self.accounts[name] = account
+        return account
+
+    @property
+    def price_cache(self):
+        """PriceHistoryCache of the workspace, opened on first use"""
+        if self._price_cache is None:
+            path = os.path.join(os.path.dirname(self.path), PRICE_CACHE_FILE)
+            self._price_cache = PriceHistoryCache(path)
+        return self._price_cache
+
+    @property
+    def active(self):
+        return self.accounts.get(self.active_name)
+
+    def loaded_accounts(self):
+        return [account for account in self.accounts.values() if account.portfolio is not None]
+
+    def tickers(self):
+        """Every ticker held by any loaded account, each listed once"""
+        tickers = {}
+        for account in self.loaded_accounts():
+            tickers.update(dict.fromkeys(account.portfolio.positions))
+        return list(tickers)
+
+    def positions_for(self, ticker):
+        """Yield (account, position) for every account holding the ticker"""
+        for account in self.loaded_accounts():
+            position = account.portfolio.get_position(ticker)
+            if position:
+                yield account, position
+
+    def consolidated_data(self):
+        """Portfolio dict aggregating every account from their summary rows.
+
+        Only the cached summaries are added up, so no ledger is loaded and
+        nothing is fetched again. Transactions stay with their accounts.
+        """
+        positions = {}
+        nav_data = {}
+        report_date = ""
+        last_refresh = []
+        for account in self.loaded_accounts():
+            portfolio = account.portfolio
+            nav_data.update(portfolio.nav.nav_data)
+            report_date = max(report_date, portfolio.nav.report_date or "")
+            last_refresh.append(portfolio.last_refresh)
+            for ticker, position in portfolio.positions.items():
+                record = position.to_dict(include_transactions=False)
+                if ticker in positions:
+                    merged = positions[ticker]['summary']
+                    merged['shares'] += record['summary']['shares']
+                    merged['total_cost'] += record['summary']['total_cost']
+                else:
+                    positions[ticker] = record
+        # Prices are only as fresh as the stalest account
+        return {'positions': positions, 'nav_data': nav_data, 'nav_report_date': report_date,
+                'last_refresh': min(last_refresh, default="")}
+
+    def apply_nav(self, nav_data, report_date=None):
+        """Copy NAV values edited in the consolidated view to every account holding those tickers"""
+        for account in self.loaded_accounts():
+            portfolio = account.portfolio
+            edited = {ticker: value for ticker, value in nav_data.items() if ticker in portfolio.positions}
+            if not edited:
+                continue
+            merged = dict(portfolio.nav.nav_data)
+            merged.update(edited)
+            portfolio.nav.update(merged, report_date)
+            portfolio.update_consensus_nav(edited)
+
+    def consolidated_ledger(self, ticker):
+        """Transaction dicts of a ticker across all accounts, for read-only views"""
+        records = []
+        for _, position in self.positions_for(ticker):
+            # Records are read without loading each account's ledger into its position
+            records.extend(position.ledger_records())
+        return records
+
+    def close(self):
+        for account in self.accounts.values():
+            account.history_store.close()
+        if self._price_cache is not None:
+            self._price_cache.close()